@@ -4,34 +4,40 @@ from pydantic import BaseModel
 from typing import Optional
 import jwt
 # Note: Install PyJWT package: pip install PyJWT
-import os
-from pathlib import Path
-from dotenv import load_dotenv
 from datetime import datetime, timedelta
-from passlib.context import CryptContext
-from sqlalchemy.orm import Session
 import uuid
+import logging
 
-# Load .env file from backend directory
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path, override=True)
+from app.config import SECRET_KEY
 
-from app.database import get_db, UserProfile, ExperienceLevel
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 security = HTTPBearer(auto_error=False)
 
-SECRET_KEY = os.getenv("BETTER_AUTH_SECRET", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 
-# Password hashing configuration
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# SQLAlchemy and passlib are imported on first use to keep app startup fast
+_pwd_context = None
+
+def get_pwd_context():
+    """Password hashing configuration, created on first use"""
+    global _pwd_context
+    if _pwd_context is None:
+        from passlib.context import CryptContext
+        _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    return _pwd_context
 
 def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+    return get_pwd_context().verify(plain_password, hashed_password)
 
 def get_password_hash(password):
-    return pwd_context.hash(password)
+    return get_pwd_context().hash(password)
+
+def get_db():
+    """Database session dependency (imports app.database on first request)"""
+    from app.database import get_db as _get_db
+    yield from _get_db()
 
 class User(BaseModel):
     id: str
@@ -56,15 +62,14 @@ def verify_token(token: str) -> Optional[dict]:
         return payload
     except jwt.ExpiredSignatureError:
         return None
-    except jwt.JWTError:
+    except jwt.PyJWTError:
         return None
 
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> dict:
     """Get current user from JWT token"""
-    token = credentials.credentials
-    payload = verify_token(token)
+    payload = verify_token(credentials.credentials) if credentials else None
     if payload is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -103,8 +108,9 @@ class AuthResponse(BaseModel):
     user: dict
 
 @router.post("/signup", response_model=AuthResponse)
-async def signup(request: SignupRequest, db: Session = Depends(get_db)):
+async def signup(request: SignupRequest, db=Depends(get_db)):
     """User signup with background questionnaire"""
+    from app.database import UserProfile, ExperienceLevel
     if not db:
         raise HTTPException(status_code=503, detail="Database not available")
 
@@ -161,8 +167,9 @@ async def signup(request: SignupRequest, db: Session = Depends(get_db)):
     )
 
 @router.post("/signin", response_model=AuthResponse)
-async def signin(request: SigninRequest, db: Session = Depends(get_db)):
+async def signin(request: SigninRequest, db=Depends(get_db)):
     """User signin"""
+    from app.database import UserProfile
     try:
         if not db:
             raise HTTPException(status_code=503, detail="Database not available")
@@ -201,9 +208,7 @@ async def signin(request: SigninRequest, db: Session = Depends(get_db)):
         raise
     except Exception as e:
         # Log the error and return a proper JSON error
-        import traceback
-        print(f"Error in signin endpoint: {e}")
-        traceback.print_exc()
+        logger.exception("Error in signin endpoint: %s", e)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
@@ -0,0 +1,160 @@
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import HTTPException
+
+from app import metrics
+from app.conversation import conversation_store
+from app.deadline import DeadlineExceeded
+from app.extractive import is_eligible, build_answer
+from app.model_router import route, record_latency
+from app.models import ChatRequest, ChatResponse
+from app.openai_client import get_embeddings, generate_chat_response, stream_chat_response
+from app.qdrant_client import get_qdrant_client, search_vectors
+from app.rerank import rerank, RETRIEVAL_CANDIDATES
+from app.scheduler import RateLimited
+
+logger = logging.getLogger(__name__)
+
+async def answer_chat(
+    request: ChatRequest,
+    current_user: Optional[dict] = None,
+    on_delta: Optional[Callable[[str], Awaitable[None]]] = None
+) -> ChatResponse:
+    """The RAG chat pipeline behind POST /api/chat and /ws/chat.
+
+    With on_delta, the answer is also streamed to it piece by piece as it is generated.
+    """
+    msg_preview = request.message[:50] if request.message else 'None'
+    logger.debug("🔍 Chat request: message=%r, context=%s", msg_preview, bool(request.context))
+    try:
+        # Get embeddings for query (with fallback)
+        context_text = ""
+        rag_used = False
+        try:
+            query_embedding = await get_embeddings(request.message or request.context)
+            
+            if query_embedding and len(query_embedding) > 0:
+                # Search Qdrant for relevant chunks
+                try:
+                    qdrant_client = await get_qdrant_client()
+                    candidates = await search_vectors(qdrant_client, query_embedding, limit=RETRIEVAL_CANDIDATES)
+                    # Rerank a wider candidate set locally and keep only what fits the prompt budget
+                    search_results = rerank(request.message or request.context, candidates)
+                    
+                    if search_results and len(search_results) > 0:
+                        # Build context from search results
+                        context_text = "\n\n".join([result["text"] for result in search_results])
+                        rag_used = True
+                        logger.info(
+                            "✅ RAG active: kept %d of %d chunks, top score %s, %d context chars",
+                            len(search_results), len(candidates), search_results[0].get('score'), len(context_text)
+                        )
+                    else:
+                        logger.warning("⚠️  Qdrant search returned no results, using fallback context")
+                except Exception as e:
+                    logger.error("⚠️  Qdrant search failed, using fallback context: %s", e)
+            else:
+                logger.warning("⚠️  No embeddings available, using fallback context")
+        except (RateLimited, DeadlineExceeded):
+            # Out of embedding quota or time: answering from the fallback context would hide it behind a 200
+            raise
+        except Exception as e:
+            logger.error("⚠️  Embedding generation failed, using fallback context: %s", e)
+        
+        top_score = search_results[0].get("score") if rag_used else None
+        
+        # Fallback context if no vector search results
+        if not context_text:
+            context_text = "This is a textbook about Physical AI & Humanoid Robotics covering ROS 2, Gazebo, NVIDIA Isaac, and Vision-Language-Action systems."
+        
+        # Add selected text context if provided
+        if request.context:
+            context_text = f"{request.context}\n\n{context_text}"
+        
+        # Bounded conversation memory: recent turns verbatim, older ones summarized
+        user_id = current_user.get("id") if current_user else None
+        conversation = await conversation_store.get(request.conversation_id, user_id)
+        memory = conversation.prompt_block()
+        memory_text = f"\n\nConversation so far:\n{memory}\n" if memory else ""
+        
+        # High-confidence definitional hits are answered from the top chunk without the LLM
+        response = None
+        if not request.elaborate and is_eligible(request.message, request.context, top_score, bool(memory)):
+            response = build_answer(request.message, search_results[0])
+        extractive = response is not None
+        
+        if extractive:
+            metrics.incr("chat.answer.extractive")
+            logger.info("⚡ Answered extractively from %s (score %s)", search_results[0].get("section"), top_score)
+            if on_delta is not None:
+                await on_delta(response)
+        else:
+            # Generate response using OpenAI
+            system_prompt = f"""You are an AI assistant helping students learn about Physical AI & Humanoid Robotics. 
+Use the following context from the textbook to answer questions accurately. If the context doesn't contain 
+the answer, you can use your general knowledge but indicate when you're doing so.
+
+Context from textbook:
+{context_text}
+{memory_text}
+Answer the question based on the context provided. Be helpful, clear, and educational."""
+            
+            # Route to the fastest adequate model tier (local features only)
+            tier, models = route(request.message, request.context, top_score)
+            
+            # Generate response using Gemini
+            try:
+                generation_started = time.perf_counter()
+                if on_delta is None:
+                    response = await generate_chat_response(
+                        user_message=request.message or request.context,
+                        system_context=system_prompt,
+                        models=models
+                    )
+                else:
+                    response = await stream_chat_response(
+                        user_message=request.message or request.context,
+                        on_delta=on_delta,
+                        system_context=system_prompt,
+                        models=models
+                    )
+                record_latency(tier, time.perf_counter() - generation_started)
+            except (RateLimited, DeadlineExceeded):
+                raise
+            except Exception as e:
+                logger.error("Error generating chat response: %s", e)
+                raise HTTPException(
+                    status_code=500, 
+                    detail=f"Failed to generate response. Please check GEMINI_API_KEY is set correctly. Error: {str(e)}"
+                )
+            
+            metrics.incr("chat.answer.llm")
+        
+        conversation.add_turn(request.message or request.context, response)
+        conversation_store.save(conversation, user_id)
+        
+        # Store chat history if user is logged in
+        if current_user and current_user.get("id"):
+            try:
+                from app.database import save_chat_history
+                await save_chat_history(
+                    user_id=current_user["id"],
+                    message=request.message or request.context,
+                    response=response,
+                    context=request.context,
+                    conversation_id=conversation.id
+                )
+            except Exception as e:
+                logger.warning("Could not save chat history: %s", e)
+                # Continue even if history save fails
+        
+        return ChatResponse(response=response, conversation_id=conversation.id, extractive=extractive)
+        
+    except (HTTPException, RateLimited, DeadlineExceeded):
+        # Re-raise HTTP, rate-limit and deadline exceptions
+        raise
+    except Exception as e:
+        logger.exception("Unexpected error in chat endpoint: %s", e)
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
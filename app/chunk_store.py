@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# content_chunks is the source of truth for chunk text; Qdrant payloads only carry IDs and filter fields.
+# app.database (SQLAlchemy) and numpy are imported inside the functions that need them, keeping app import light.
+LOAD_BATCH_SIZE = 1000
+# Longest section label content_chunks.section holds (see migration 0007)
+SECTION_MAX_CHARS = 300
+
+class ChunkStore:
+    """Chunk text by point ID, preloaded from content_chunks at startup.
+
+    Preloaded texts live in one UTF-8 buffer with an offset array instead of one
+    str object per chunk; chunks seeded after startup are fetched on first use.
+    """
+
+    def __init__(self):
+        self._rows: Dict[str, int] = {}
+        self._buffer = b""
+        # numpy int64 array of len(_rows) + 1 byte offsets into _buffer, set by load()
+        self._offsets = None
+        # Texts fetched after the preload (e.g. a reseed while the app is running)
+        self._late: Dict[str, str] = {}
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self._rows) + len(self._late)
+
+    def load(self):
+        """Read every chunk from the database (blocking; run it off the event loop)"""
+        import numpy as np
+        from app.database import ContentChunk, SessionLocal
+        if SessionLocal is None:
+            raise Exception("Database engine not configured. Please set DATABASE_URL in .env file")
+        started = time.perf_counter()
+        rows: Dict[str, int] = {}
+        parts: List[bytes] = []
+        offsets = [0]
+        db = SessionLocal()
+        try:
+            for chunk_id, content in db.query(ContentChunk.id, ContentChunk.content).yield_per(LOAD_BATCH_SIZE):
+                encoded = content.encode("utf-8")
+                rows[chunk_id] = len(parts)
+                parts.append(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+        finally:
+            db.close()
+        with self._lock:
+            self._rows = rows
+            self._buffer = b"".join(parts)
+            self._offsets = np.asarray(offsets, dtype=np.int64)
+            self._late = {}
+            self.loaded = True
+        logger.info(
+            "Loaded %d chunks (%.1f MB of text) in %.2fs",
+            len(rows), len(self._buffer) / 1e6, time.perf_counter() - started
+        )
+
+    def get(self, chunk_id: str) -> Optional[str]:
+        row = self._rows.get(chunk_id)
+        if row is None:
+            return self._late.get(chunk_id)
+        return self._buffer[self._offsets[row]:self._offsets[row + 1]].decode("utf-8")
+
+    def _fetch(self, chunk_ids: List[str]) -> Dict[str, str]:
+        """Load chunks missing from the preload straight from the database (blocking)"""
+        found = fetch_chunks(chunk_ids)
+        with self._lock:
+            self._late.update(found)
+        return found
+
+    async def resolve(
+        self,
+        hits: List[Dict],
+        payload_texts: Optional[Callable[[List[str]], Awaitable[Dict[str, str]]]] = None
+    ) -> List[Dict]:
+        """Fill in the text of search hits; hits with no text anywhere are dropped.
+
+        payload_texts, if given, loads text by ID from the vector payloads, for points
+        seeded before content_chunks existed.
+        """
+        missing = [hit["id"] for hit in hits if not hit.get("text") and self.get(hit["id"]) is None]
+        if missing:
+            metrics.incr("chunks.miss", len(missing))
+            try:
+                await asyncio.to_thread(self._fetch, missing)
+            except Exception as e:
+                logger.warning("Could not load %d chunks from the database: %s", len(missing), e)
+
+        for hit in hits:
+            if not hit.get("text"):
+                hit["text"] = self.get(hit["id"])
+        unresolved = [hit["id"] for hit in hits if not hit["text"]]
+        if unresolved and payload_texts is not None:
+            try:
+                legacy = await payload_texts(unresolved)
+            except Exception as e:
+                logger.warning("Could not load %d chunk texts from vector payloads: %s", len(unresolved), e)
+                legacy = {}
+            for hit in hits:
+                if not hit["text"]:
+                    hit["text"] = legacy.get(hit["id"])
+
+        resolved = []
+        for hit in hits:
+            if hit["text"]:
+                resolved.append(hit)
+            else:
+                logger.warning("No text for chunk %s; reseed with scripts/seed_vectors.py", hit["id"])
+        return resolved
+
+    def stats(self) -> Dict:
+        return {"chunks": len(self), "bytes": len(self._buffer), "late": len(self._late), "loaded": self.loaded}
+
+def fetch_chunks(chunk_ids: List[str]) -> Dict[str, str]:
+    """Text of the given chunks that exist in content_chunks (blocking)"""
+    from app.database import ContentChunk, SessionLocal
+    if SessionLocal is None or not chunk_ids:
+        return {}
+    db = SessionLocal()
+    try:
+        rows = db.query(ContentChunk.id, ContentChunk.content).filter(ContentChunk.id.in_(chunk_ids)).all()
+    finally:
+        db.close()
+    return {row.id: row.content for row in rows}
+
+def save_chunks(chunks: Iterable[Dict]):
+    """Insert or replace chunks (id, text, module, section) in one transaction (blocking)"""
+    from app.database import ContentChunk, SessionLocal
+    chunks = list(chunks)
+    if SessionLocal is None or not chunks:
+        return
+    db = SessionLocal()
+    try:
+        ids = [chunk["id"] for chunk in chunks]
+        db.query(ContentChunk).filter(ContentChunk.id.in_(ids)).delete(synchronize_session=False)
+        db.bulk_insert_mappings(ContentChunk, [
+            {
+                "id": chunk["id"],
+                "content": chunk["text"],
+                "module": chunk.get("module"),
+                "section": (chunk.get("section") or "")[:SECTION_MAX_CHARS] or None,
+                "embedding_id": chunk["id"],
+            }
+            for chunk in chunks
+        ])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def prune_chunks(keep_ids: Set[str]) -> int:
+    """Delete chunks no retained collection references any more; returns how many (blocking)"""
+    from app.database import ContentChunk, SessionLocal
+    if SessionLocal is None:
+        return 0
+    db = SessionLocal()
+    try:
+        stale = [row.id for row in db.query(ContentChunk.id) if row.id not in keep_ids]
+        for start in range(0, len(stale), 500):
+            db.query(ContentChunk).filter(
+                ContentChunk.id.in_(stale[start:start + 500])
+            ).delete(synchronize_session=False)
+        db.commit()
+        return len(stale)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+chunk_store = ChunkStore()
@@ -0,0 +1,126 @@
+import asyncio
+import gzip
+from typing import Dict, List, Optional
+
+from app.config import env_int
+
+# Brotli is optional; without it clients are offered gzip only
+try:
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+# Responses smaller than this are sent as-is (compression would not pay for itself)
+COMPRESS_MIN_BYTES = env_int("COMPRESS_MIN_BYTES", 1024)
+GZIP_LEVEL = env_int("GZIP_LEVEL", 6)
+# Low brotli qualities are much faster and still beat gzip on text
+BROTLI_QUALITY = env_int("BROTLI_QUALITY", 4)
+# Bodies above this are compressed in a worker thread instead of on the event loop
+COMPRESS_THREAD_BYTES = env_int("COMPRESS_THREAD_BYTES", 256 * 1024)
+
+_COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "application/xml")
+
+def parse_accept_encoding(header: str) -> Dict[str, float]:
+    """Map each coding in an Accept-Encoding header to its q-value"""
+    codings: Dict[str, float] = {}
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        codings[coding.strip().lower()] = quality
+    return codings
+
+def choose_encoding(header: str) -> Optional[str]:
+    """Best supported coding the client accepts: br, then gzip"""
+    codings = parse_accept_encoding(header)
+    wildcard = codings.get("*", 0.0)
+    options = [("br", codings.get("br", wildcard))] if brotli is not None else []
+    options.append(("gzip", codings.get("gzip", wildcard)))
+    best = max(options, key=lambda option: option[1])
+    return best[0] if best[1] > 0 else None
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+class CompressionMiddleware:
+    """Negotiated gzip/brotli compression of JSON and text responses.
+
+    Compressible bodies are buffered and compressed once complete; server-sent
+    events, already-encoded or small responses, and WebSockets pass through untouched.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope.get("headers") or [])
+        encoding = choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[dict] = None
+        buffering = False
+        chunks: List[bytes] = []
+
+        async def send_wrapper(message):
+            nonlocal start_message, buffering
+            if message["type"] == "http.response.start":
+                names = {name.lower(): value for name, value in message.get("headers", [])}
+                content_type = names.get(b"content-type", b"").decode("latin-1")
+                length = names.get(b"content-length")
+                buffering = (
+                    b"content-encoding" not in names
+                    and content_type.startswith(_COMPRESSIBLE_TYPES)
+                    and not content_type.startswith("text/event-stream")
+                    and (length is None or int(length) >= self.minimum_size)
+                )
+                if buffering:
+                    start_message = message
+                else:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or not buffering:
+                await send(message)
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+            body = b"".join(chunks)
+            response_headers: List = list(start_message.get("headers", []))
+            if len(body) < self.minimum_size:
+                await send(start_message)
+                await send({"type": "http.response.body", "body": body})
+                return
+
+            if len(body) > COMPRESS_THREAD_BYTES:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            vary = [v for n, v in response_headers if n.lower() == b"vary"]
+            if not any(b"accept-encoding" in v.lower() for v in vary):
+                vary.append(b"Accept-Encoding")
+            response_headers = [(n, v) for n, v in response_headers if n.lower() not in (b"content-length", b"vary")]
+            response_headers += [
+                (b"content-encoding", encoding.encode()),
+                (b"content-length", str(len(compressed)).encode()),
+                (b"vary", b", ".join(vary)),
+            ]
+            await send({**start_message, "headers": response_headers})
+            await send({"type": "http.response.body", "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,51 @@
+import os
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load .env file from backend directory once, before anything reads the environment
+BACKEND_ROOT = Path(__file__).parent.parent
+env_path = BACKEND_ROOT / '.env'
+load_dotenv(dotenv_path=env_path, override=True)
+
+def env_str(name: str, default: str = "") -> str:
+    """Read a string setting, stripping stray whitespace and quotes"""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().strip("'\"")
+
+def env_int(name: str, default: int) -> int:
+    """Read an integer setting, falling back to default on bad values"""
+    try:
+        return int(env_str(name, str(default)))
+    except ValueError:
+        return default
+
+def env_float(name: str, default: float) -> float:
+    """Read a float setting, falling back to default on bad values"""
+    try:
+        return float(env_str(name, str(default)))
+    except ValueError:
+        return default
+
+def env_bool(name: str, default: bool = False) -> bool:
+    """Read a boolean setting ("1", "true", "yes", "on" are truthy)"""
+    value = env_str(name, "")
+    if not value:
+        return default
+    return value.lower() in ("1", "true", "yes", "on")
+
+# API keys and backends
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+DATABASE_URL = os.getenv("DATABASE_URL")
+QDRANT_URL = os.getenv("QDRANT_URL", "https://your-cluster.qdrant.io")
+QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "")
+SECRET_KEY = os.getenv("BETTER_AUTH_SECRET", "your-secret-key-change-in-production")
+
+# Startup: DB and Qdrant are initialized concurrently, each bounded by its own timeout
+STARTUP_DB_TIMEOUT = env_float("STARTUP_DB_TIMEOUT", 15.0)
+STARTUP_QDRANT_TIMEOUT = env_float("STARTUP_QDRANT_TIMEOUT", 15.0)
+QDRANT_TIMEOUT = env_int("QDRANT_TIMEOUT", 10)
+
+# Worker processes (read by uvicorn itself too); above 1 the caches default to the shared SQLite backend
+WEB_CONCURRENCY = max(1, env_int("WEB_CONCURRENCY", 1))
@@ -0,0 +1,150 @@
+import logging
+import re
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from app.config import env_int
+from app.shared_cache import get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Turns kept verbatim; older turns are folded into the running summary
+CONVERSATION_RECENT_TURNS = env_int("CONVERSATION_RECENT_TURNS", 4)
+# Upper bounds that keep the multi-turn part of the prompt bounded
+CONVERSATION_TURN_CHARS = env_int("CONVERSATION_TURN_CHARS", 2000)
+CONVERSATION_SUMMARY_CHARS = env_int("CONVERSATION_SUMMARY_CHARS", 1500)
+# In-process store limits (with a shared cache backend, conversations live there instead)
+CONVERSATION_MAX_ACTIVE = env_int("CONVERSATION_MAX_ACTIVE", 5000)
+CONVERSATION_TTL_SECONDS = env_int("CONVERSATION_TTL_SECONDS", 6 * 3600)
+# Turns reloaded from chat_history when a conversation is not in memory
+CONVERSATION_RELOAD_TURNS = env_int("CONVERSATION_RELOAD_TURNS", 20)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?؟۔])\s+")
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join((text or "").split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + "…"
+
+def _first_sentences(text: str, count: int, limit: int) -> str:
+    sentences = _SENTENCE_END.split(" ".join((text or "").split()))
+    return _clip(" ".join(sentences[:count]), limit)
+
+def summarize_turn(message: str, response: str) -> str:
+    """Compact, locally built summary line for one turn (no model call)"""
+    return f"- Student asked: {_first_sentences(message, 1, 160)} Answer: {_first_sentences(response, 2, 280)}"
+
+class Conversation:
+    """Last few turns verbatim plus a bounded running summary of everything older"""
+
+    def __init__(self, conversation_id: str):
+        self.id = conversation_id
+        self.turns: Deque[Tuple[str, str]] = deque()
+        self.summary_lines: Deque[str] = deque()
+        self.summary_chars = 0
+        self.updated = time.monotonic()
+
+    def add_turn(self, message: str, response: str):
+        self.turns.append((_clip(message, CONVERSATION_TURN_CHARS), _clip(response, CONVERSATION_TURN_CHARS)))
+        while len(self.turns) > CONVERSATION_RECENT_TURNS:
+            self._fold(*self.turns.popleft())
+        self.updated = time.monotonic()
+
+    def _fold(self, message: str, response: str):
+        line = summarize_turn(message, response)
+        self.summary_lines.append(line)
+        self.summary_chars += len(line) + 1
+        # Oldest summary lines drop off first once the summary is over budget
+        while self.summary_chars > CONVERSATION_SUMMARY_CHARS and len(self.summary_lines) > 1:
+            self.summary_chars -= len(self.summary_lines.popleft()) + 1
+
+    def to_state(self) -> Dict:
+        return {"turns": list(self.turns), "summary_lines": list(self.summary_lines)}
+
+    @classmethod
+    def from_state(cls, conversation_id: str, state: Dict) -> "Conversation":
+        conversation = cls(conversation_id)
+        conversation.turns.extend(tuple(turn) for turn in state.get("turns", []))
+        conversation.summary_lines.extend(state.get("summary_lines", []))
+        conversation.summary_chars = sum(len(line) + 1 for line in conversation.summary_lines)
+        return conversation
+
+    def prompt_block(self) -> str:
+        """Conversation memory for the system prompt ("" for a new conversation)"""
+        parts: List[str] = []
+        if self.summary_lines:
+            parts.append("Summary of earlier turns:\n" + "\n".join(self.summary_lines))
+        if self.turns:
+            parts.append("Recent turns:\n" + "\n".join(
+                f"Student: {message}\nAssistant: {response}" for message, response in self.turns
+            ))
+        return "\n\n".join(parts)
+
+class ConversationStore:
+    """LRU/TTL store of conversations, reloading from chat_history on a miss.
+
+    Kept in-process for a single worker; with a shared cache backend (multi-worker mode)
+    conversations are read from and saved to the shared cache so any worker can continue them.
+    """
+
+    def __init__(self, max_active: int = CONVERSATION_MAX_ACTIVE, ttl: float = CONVERSATION_TTL_SECONDS):
+        self.max_active = max_active
+        self.ttl = ttl
+        self.conversations: "OrderedDict[Tuple[Optional[str], str], Conversation]" = OrderedDict()
+
+    def _evict(self):
+        now = time.monotonic()
+        while self.conversations:
+            key, oldest = next(iter(self.conversations.items()))
+            if len(self.conversations) <= self.max_active and now - oldest.updated <= self.ttl:
+                break
+            del self.conversations[key]
+
+    @staticmethod
+    def _shared_cache():
+        cache = get_shared_cache()
+        return cache if cache.backend != "memory" else None
+
+    @staticmethod
+    def _shared_key(key: Tuple[Optional[str], str]) -> str:
+        return f"{key[0] or ''}:{key[1]}"
+
+    async def get(self, conversation_id: Optional[str], user_id: Optional[str] = None) -> Conversation:
+        """Conversation for this user (a new one if conversation_id is None or unknown)"""
+        # A freshly generated ID cannot have any state or history, so only supplied IDs are looked up
+        supplied = bool(conversation_id)
+        conversation_id = conversation_id or str(uuid.uuid4())
+        # Keyed by owner too, so one user can never read another user's conversation
+        key = (user_id, conversation_id)
+        shared = self._shared_cache()
+        if supplied and shared is None:
+            conversation = self.conversations.get(key)
+            if conversation is not None:
+                self.conversations.move_to_end(key)
+                return conversation
+        elif supplied:
+            state = shared.get("conversation", self._shared_key(key))
+            if state is not None:
+                return Conversation.from_state(conversation_id, state)
+
+        conversation = Conversation(conversation_id)
+        if supplied and user_id:
+            try:
+                from app.database import get_conversation_turns
+                for message, response in await get_conversation_turns(user_id, conversation_id, CONVERSATION_RELOAD_TURNS):
+                    conversation.add_turn(message, response)
+            except Exception as e:
+                logger.warning("Could not reload conversation %s: %s", conversation_id, e)
+        if shared is None:
+            self.conversations[key] = conversation
+            self._evict()
+        return conversation
+
+    def save(self, conversation: Conversation, user_id: Optional[str] = None):
+        """Persist a conversation after add_turn (only needed with a shared cache backend)"""
+        shared = self._shared_cache()
+        if shared is not None:
+            shared.set("conversation", self._shared_key((user_id, conversation.id)), conversation.to_state(), ttl=self.ttl)
+
+conversation_store = ConversationStore()
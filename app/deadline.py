@@ -0,0 +1,89 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Optional, TypeVar
+
+from fastapi import Request
+
+from app.config import env_float
+
+T = TypeVar("T")
+
+# Overall time budget for one request, end to end
+CHAT_DEADLINE_SECONDS = env_float("CHAT_DEADLINE_SECONDS", 25.0)
+TRANSLATE_DEADLINE_SECONDS = env_float("TRANSLATE_DEADLINE_SECONDS", 60.0)
+# Per-stage caps so retrieval never eats the whole generation budget
+EMBED_TIMEOUT_SECONDS = env_float("EMBED_TIMEOUT", 3.0)
+SEARCH_TIMEOUT_SECONDS = env_float("SEARCH_TIMEOUT", 3.0)
+
+# Absolute time.monotonic() deadline of the current request (None = no budget)
+_deadline: ContextVar[Optional[float]] = ContextVar("request_deadline", default=None)
+
+class DeadlineExceeded(Exception):
+    """The request ran out of time budget; maps to 504"""
+
+    def __init__(self, stage: str):
+        super().__init__(f"Request deadline exceeded during {stage}")
+        self.stage = stage
+
+@contextmanager
+def deadline_scope(seconds: float):
+    """Set the time budget for everything awaited inside the block (never extends an outer one)"""
+    deadline = time.monotonic() + seconds
+    outer = _deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def request_deadline(default_seconds: float):
+    """FastAPI dependency starting the request budget; clients may shorten it with X-Request-Timeout"""
+    async def dependency(request: Request):
+        seconds = default_seconds
+        header = request.headers.get("x-request-timeout")
+        if header:
+            try:
+                seconds = min(seconds, max(0.0, float(header)))
+            except ValueError:
+                pass
+        # Each request runs in its own task context, so this never leaks into other requests
+        _deadline.set(time.monotonic() + seconds)
+
+    return dependency
+
+def detach():
+    """Drop the inherited budget in a task that serves several requests (each caller bounds its own wait)"""
+    _deadline.set(None)
+
+def remaining() -> Optional[float]:
+    """Seconds left in the current request budget, or None if there is no budget"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+def budget(cap: Optional[float] = None) -> Optional[float]:
+    """Timeout for the next upstream call: the smaller of cap and the remaining budget"""
+    left = remaining()
+    if left is None:
+        return cap
+    return left if cap is None else min(cap, left)
+
+def check(stage: str):
+    """Raise DeadlineExceeded if the budget is already spent"""
+    left = remaining()
+    if left is not None and left <= 0:
+        raise DeadlineExceeded(stage)
+
+async def run_blocking(func: Callable[..., T], *args, stage: str, cap: Optional[float] = None, **kwargs) -> T:
+    """Run a blocking upstream call in a worker thread, bounded by the remaining budget"""
+    check(stage)
+    timeout = budget(cap)
+    try:
+        return await asyncio.wait_for(asyncio.to_thread(func, *args, **kwargs), timeout)
+    except asyncio.TimeoutError:
+        raise DeadlineExceeded(stage)
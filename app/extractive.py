@@ -0,0 +1,87 @@
+import re
+import time
+from typing import Dict, List, Optional
+
+from app import metrics
+from app.config import env_bool, env_float, env_int
+from app.model_router import extract_features
+from app.rerank import tokenize
+
+# Answer definitional questions straight from the top chunk, without the LLM
+EXTRACTIVE_ENABLED = env_bool("EXTRACTIVE_ENABLED", True)
+# Vector similarity the top chunk needs before its text is trusted as the answer
+EXTRACTIVE_MIN_SCORE = env_float("EXTRACTIVE_MIN_SCORE", 0.85)
+# Fraction of the question's terms the best sentence must contain
+EXTRACTIVE_MIN_COVERAGE = env_float("EXTRACTIVE_MIN_COVERAGE", 0.5)
+EXTRACTIVE_MAX_SENTENCES = env_int("EXTRACTIVE_MAX_SENTENCES", 3)
+# Longest supporting passage quoted under the answer
+EXTRACTIVE_PASSAGE_CHARS = env_int("EXTRACTIVE_PASSAGE_CHARS", 600)
+# Questions longer than this are rarely definitional
+EXTRACTIVE_MAX_QUESTION_CHARS = env_int("EXTRACTIVE_MAX_QUESTION_CHARS", 200)
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_FENCE = re.compile(r"```.*?(```|$)", re.DOTALL)
+_HEADING = re.compile(r"^\s*#{1,6}\s+.*$", re.MULTILINE)
+_MARKUP = re.compile(r"[*_`]+|\[([^\]]*)\]\([^)]*\)")
+
+def is_eligible(message: Optional[str], context: Optional[str], top_score: Optional[float], has_memory: bool) -> bool:
+    """Whether a chat request may be answered from the top chunk alone"""
+    if not EXTRACTIVE_ENABLED or not message or context or has_memory:
+        return False
+    if top_score is None or top_score < EXTRACTIVE_MIN_SCORE or len(message) > EXTRACTIVE_MAX_QUESTION_CHARS:
+        return False
+    features = extract_features(message, context, top_score)
+    return not features["has_code"] and features["reasoning_cues"] == 0
+
+def _plain(text: str) -> str:
+    return _MARKUP.sub(lambda m: m.group(1) or "", text).strip()
+
+def paragraphs(text: str) -> List[str]:
+    """Prose paragraphs of a chunk, without headings or code blocks"""
+    text = _HEADING.sub("", _FENCE.sub("", text or ""))
+    return [" ".join(p.split()) for p in re.split(r"\n\s*\n", text) if p.strip()]
+
+def build_answer(question: str, chunk: Dict) -> Optional[str]:
+    """Best-matching sentences and passage of a chunk with its attribution, or None if nothing matches well"""
+    started = time.perf_counter()
+    terms = set(tokenize(question))
+    if not terms:
+        return None
+
+    # (coverage, paragraph index, sentence index, sentence)
+    scored = []
+    blocks = paragraphs(chunk.get("text", ""))
+    for p, paragraph in enumerate(blocks):
+        for s, sentence in enumerate(_SENTENCE_END.split(paragraph)):
+            coverage = len(terms & set(tokenize(sentence))) / len(terms)
+            if coverage > 0:
+                scored.append((coverage, p, s, _plain(sentence)))
+    if not scored:
+        return None
+    ranked = sorted(scored, key=lambda item: (-item[0], item[1], item[2]))
+    if ranked[0][0] < EXTRACTIVE_MIN_COVERAGE:
+        return None
+
+    # Supporting sentences must match at least half as well as the best; keep them in reading order
+    chosen = [item for item in ranked[:EXTRACTIVE_MAX_SENTENCES] if item[0] >= ranked[0][0] / 2]
+    chosen.sort(key=lambda item: (item[1], item[2]))
+    answer = " ".join(item[3] for item in chosen)
+    passage = _plain(blocks[ranked[0][1]])
+    if len(passage) > EXTRACTIVE_PASSAGE_CHARS:
+        passage = passage[:EXTRACTIVE_PASSAGE_CHARS].rsplit(" ", 1)[0] + " …"
+
+    parts = [answer]
+    if passage != answer:
+        parts.append(f"> {passage}")
+    source = " › ".join(str(label) for label in (chunk.get("module"), chunk.get("section")) if label)
+    if source:
+        parts.append(f"*Source: {source}*")
+    metrics.observe("chat.extractive.latency", time.perf_counter() - started)
+    return "\n\n".join(parts)
+
+def fast_path_stats() -> Dict:
+    """How many chat answers came from the extractive fast path vs the LLM"""
+    extractive = metrics.counter("chat.answer.extractive")
+    llm = metrics.counter("chat.answer.llm")
+    total = extractive + llm
+    return {"extractive": extractive, "llm": llm, "fraction": round(extractive / total, 4) if total else 0.0}
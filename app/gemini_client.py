@@ -1,27 +1,87 @@
+import asyncio
+import logging
 import os
+import threading
 import time
-from pathlib import Path
-from dotenv import load_dotenv  # pyright: ignore[reportMissingImports]
-from typing import List, Optional
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional
 
-# Load .env file from backend directory
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path, override=True)
+from app import deadline, metrics
+from app.config import GEMINI_API_KEY, env_bool, env_float, env_int
+from app.deadline import DeadlineExceeded
+from app.shared_cache import get_shared_cache
+from app.scheduler import scheduler, RateLimited, estimate_tokens, is_quota_error, retry_after_from_error
 
-# Configure Gemini
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+logger = logging.getLogger(__name__)
 
-# Try to import new SDK
-try:
-    from google import genai
-    from google.genai import types
-    NEW_SDK_AVAILABLE = True
-except ImportError:
-    NEW_SDK_AVAILABLE = False
-    print("⚠️  New Google GenAI SDK not found. Falling back to legacy SDK.")
+PRIMARY_MODEL = "gemini-3-pro-preview"
 
-import google.generativeai as old_genai
-from google.api_core import exceptions as google_exceptions
+FALLBACK_MODELS = [
+    "gemini-2.5-flash",       # Try 2.5
+    "gemini-2.0-flash-lite",  # Newest free tier
+    "gemini-2.0-flash",       # Standard 2.0
+    "gemini-flash-latest",    # Latest available flash
+    "gemini-pro",             # Legacy
+]
+
+TRANSLATE_FALLBACK_MODEL = "gemini-2.0-flash-lite"
+
+# Hedging: if a model has not answered by its observed p95 latency, start the next
+# healthy fallback in parallel and take whichever answers first
+HEDGE_ENABLED = env_bool("HEDGE_ENABLED", False)
+HEDGE_DEFAULT_DELAY = env_float("HEDGE_DEFAULT_DELAY", 8.0)
+HEDGE_MIN_SAMPLES = env_int("HEDGE_MIN_SAMPLES", 20)
+HEDGE_MAX_PARALLEL = env_int("HEDGE_MAX_PARALLEL", 2)
+
+# Streamed chunks buffered between the SDK's worker thread and a slow consumer
+STREAM_BUFFER_CHUNKS = env_int("STREAM_BUFFER_CHUNKS", 16)
+
+# Circuit breaker: skip a model for a while after repeated non-quota failures
+BREAKER_FAILURES = env_int("MODEL_BREAKER_FAILURES", 3)
+BREAKER_COOLDOWN = env_float("MODEL_BREAKER_COOLDOWN", 60.0)
+
+class ModelHealth:
+    """Consecutive-failure circuit breaker per model, kept in the shared cache so all workers agree"""
+
+    def healthy(self, model_name: str) -> bool:
+        return get_shared_cache().get("breaker.open", model_name) is None
+
+    def record_success(self, model_name: str):
+        cache = get_shared_cache()
+        # Runs after every call: read first (WAL reads never wait on writers), write only to reset a streak
+        if cache.get("breaker.failures", model_name) is not None:
+            cache.delete("breaker.failures", model_name)
+
+    def record_failure(self, model_name: str):
+        cache = get_shared_cache()
+        failures = cache.incr("breaker.failures", model_name, ttl=BREAKER_COOLDOWN)
+        if failures >= BREAKER_FAILURES:
+            cache.set("breaker.open", model_name, time.time() + BREAKER_COOLDOWN, ttl=BREAKER_COOLDOWN)
+            cache.delete("breaker.failures", model_name)
+            metrics.incr(f"gemini.{model_name}.breaker_open")
+
+model_health = ModelHealth()
+
+# Both Google SDKs are heavy to import, so they are loaded on first use
+_genai_client = None
+_new_sdk_available: Optional[bool] = None
+
+def get_genai_client():
+    """Get the shared New SDK client, or None if the SDK is not installed"""
+    global _genai_client, _new_sdk_available
+    if _new_sdk_available is None:
+        try:
+            from google import genai
+            _genai_client = genai.Client(api_key=GEMINI_API_KEY)
+            _new_sdk_available = True
+        except ImportError:
+            _new_sdk_available = False
+            logger.warning("⚠️  New Google GenAI SDK not found. Falling back to legacy SDK.")
+    return _genai_client
+
+def get_legacy_sdk():
+    """Import the legacy google.generativeai SDK"""
+    import google.generativeai as old_genai
+    return old_genai
 
 _gemini_configured = False
 
@@ -30,20 +90,224 @@ def configure_gemini():
     global _gemini_configured
     if not _gemini_configured and GEMINI_API_KEY:
         try:
-            old_genai.configure(api_key=GEMINI_API_KEY)
+            get_legacy_sdk().configure(api_key=GEMINI_API_KEY)
             _gemini_configured = True
         except Exception as e:
-            print(f"⚠️  Error configuring Gemini (Legacy): {e}")
+            logger.error("⚠️  Error configuring Gemini (Legacy): %s", e)
     elif not GEMINI_API_KEY:
-        print("⚠️  WARNING: GEMINI_API_KEY not set. Chat and translation features may not work.")
-        print("   Get your API key from: https://aistudio.google.com/app/apikey")
+        logger.warning(
+            "⚠️  GEMINI_API_KEY not set. Chat and translation features may not work. "
+            "Get your API key from: https://aistudio.google.com/app/apikey"
+        )
 
-async def generate_chat_response(
-    user_message: str,
-    system_context: Optional[str] = None
-) -> str:
-    """Generate chat response using Gemini (trying Gemini 3 first)"""
-    
+def _response_text(response) -> str:
+    """Extract text from a Gemini response (either SDK)"""
+    if hasattr(response, 'text') and response.text:
+        return response.text
+    if hasattr(response, 'candidates') and response.candidates:
+        candidate = response.candidates[0]
+        if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
+            return ''.join([part.text for part in candidate.content.parts if hasattr(part, 'text')])
+    return ""
+
+def _generate_sync(model_name: str, prompt: str, timeout: Optional[float]) -> str:
+    """Blocking generation call; Gemini 3 goes through the New SDK, the rest through the legacy one"""
+    if model_name == PRIMARY_MODEL:
+        # Note: thinking_level defaults to "high" for gemini-3-pro-preview.
+        config = {"http_options": {"timeout": int(timeout * 1000)}} if timeout else None
+        response = get_genai_client().models.generate_content(
+            model=model_name,
+            contents=prompt,
+            config=config
+        )
+        return _response_text(response)
+
+    configure_gemini()
+    model = get_legacy_sdk().GenerativeModel(model_name)
+    response = model.generate_content(prompt, request_options={"timeout": timeout} if timeout else None)
+    return _response_text(response)
+
+def _stream_sync(model_name: str, prompt: str, timeout: Optional[float]) -> Iterator[str]:
+    """Blocking streamed generation; yields text pieces as the model produces them"""
+    if model_name == PRIMARY_MODEL:
+        config = {"http_options": {"timeout": int(timeout * 1000)}} if timeout else None
+        chunks = get_genai_client().models.generate_content_stream(
+            model=model_name,
+            contents=prompt,
+            config=config
+        )
+    else:
+        configure_gemini()
+        model = get_legacy_sdk().GenerativeModel(model_name)
+        chunks = model.generate_content(prompt, stream=True, request_options={"timeout": timeout} if timeout else None)
+    for chunk in chunks:
+        text = _response_text(chunk)
+        if text:
+            yield text
+
+async def _stream_model(model_name: str, prompt: str, prompt_tokens: int, on_delta: Callable[[str], Awaitable[None]]) -> str:
+    """One scheduled streamed call; pieces go to on_delta as they arrive, the full text is returned.
+
+    The SDK iterator runs in a worker thread that may only run STREAM_BUFFER_CHUNKS
+    ahead of on_delta, so a slow consumer slows the upstream read instead of buffering it.
+    """
+    await scheduler.acquire(model_name, prompt_tokens)
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    credits = threading.Semaphore(STREAM_BUFFER_CHUNKS)
+    abandoned = threading.Event()
+    end = object()
+
+    def produce():
+        try:
+            for text in _stream_sync(model_name, prompt, deadline.budget()):
+                while not credits.acquire(timeout=0.5):
+                    if abandoned.is_set():
+                        return
+                if abandoned.is_set():
+                    return
+                loop.call_soon_threadsafe(queue.put_nowait, text)
+            loop.call_soon_threadsafe(queue.put_nowait, end)
+        except Exception as e:
+            if not abandoned.is_set():
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+
+    started = time.perf_counter()
+    worker = asyncio.ensure_future(asyncio.to_thread(produce))
+    pieces: List[str] = []
+    try:
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), deadline.budget())
+            except asyncio.TimeoutError:
+                metrics.incr(f"gemini.{model_name}.timeout")
+                raise DeadlineExceeded(model_name)
+            if item is end:
+                break
+            if isinstance(item, Exception):
+                if is_quota_error(item):
+                    scheduler.penalize(model_name, retry_after_from_error(item))
+                else:
+                    model_health.record_failure(model_name)
+                raise item
+            credits.release()
+            pieces.append(item)
+            await on_delta(item)
+    finally:
+        # Stop the worker thread at its next chunk if we are leaving early
+        abandoned.set()
+        credits.release()
+        worker.cancel()
+    metrics.observe(f"gemini.{model_name}.latency", time.perf_counter() - started)
+    model_health.record_success(model_name)
+    if not pieces:
+        raise ValueError(f"{model_name} returned an empty response")
+    return "".join(pieces)
+
+async def _call_model(model_name: str, prompt: str, prompt_tokens: int) -> str:
+    """One scheduled generation call, bounded by the request deadline"""
+    await scheduler.acquire(model_name, prompt_tokens)
+    started = time.perf_counter()
+    try:
+        text = await deadline.run_blocking(
+            _generate_sync, model_name, prompt, deadline.budget(), stage=model_name
+        )
+    except DeadlineExceeded:
+        metrics.incr(f"gemini.{model_name}.timeout")
+        raise
+    except Exception as e:
+        if is_quota_error(e):
+            scheduler.penalize(model_name, retry_after_from_error(e))
+        else:
+            model_health.record_failure(model_name)
+        raise
+    metrics.observe(f"gemini.{model_name}.latency", time.perf_counter() - started)
+    model_health.record_success(model_name)
+    if not text:
+        raise ValueError(f"{model_name} returned an empty response")
+    return text
+
+def _hedge_delay(model_name: str) -> float:
+    """How long to give a model before hedging: its observed p95 once there are enough samples"""
+    if metrics.count(f"gemini.{model_name}.latency") >= HEDGE_MIN_SAMPLES:
+        return metrics.percentile(f"gemini.{model_name}.latency", 95)
+    return HEDGE_DEFAULT_DELAY
+
+async def _generate_with_fallbacks(models: List[str], prompt: str, hedge: bool = HEDGE_ENABLED) -> str:
+    """Try models in order, optionally hedging a slow one with the next healthy fallback"""
+    prompt_tokens = estimate_tokens(prompt)
+    available = [m for m in models if m != PRIMARY_MODEL or get_genai_client()]
+    candidates = iter([m for m in available if model_health.healthy(m)] or available)
+    running: Dict[asyncio.Task, str] = {}
+    launched: List[str] = []
+    errors: List[Exception] = []
+
+    def launch() -> bool:
+        model_name = next(candidates, None)
+        if model_name is None:
+            return False
+        logger.debug("🔄 Trying model: %s", model_name)
+        running[asyncio.create_task(_call_model(model_name, prompt, prompt_tokens))] = model_name
+        launched.append(model_name)
+        return True
+
+    exhausted = not launch()
+    try:
+        while running:
+            hedge_delay = None
+            if hedge and not exhausted and len(running) < HEDGE_MAX_PARALLEL:
+                hedge_delay = _hedge_delay(launched[-1])
+            done, _ = await asyncio.wait(
+                running, timeout=deadline.budget(hedge_delay), return_when=asyncio.FIRST_COMPLETED
+            )
+
+            if not done:
+                deadline.check("generation")
+                # The newest call is slower than its p95: race the next fallback against it
+                if launch():
+                    logger.info("⏱️  %s is slow, hedging with %s", launched[-2], launched[-1])
+                    metrics.incr("gemini.hedged")
+                else:
+                    exhausted = True
+                continue
+
+            for task in done:
+                model_name = running.pop(task)
+                try:
+                    text = task.result()
+                except RateLimited as e:
+                    logger.info("⏳ Skipping %s: %s", model_name, e.detail)
+                    errors.append(e)
+                    continue
+                except Exception as e:
+                    logger.warning(
+                        "⚠️  %s failed (%s): %s", model_name,
+                        "rate limited" if is_quota_error(e) else type(e).__name__, str(e)[:100]
+                    )
+                    errors.append(e)
+                    continue
+                logger.debug("✅ Success with %s", model_name)
+                return text
+
+            # A call failed: replace it right away (plain sequential fallback when not hedging)
+            if len(running) < (HEDGE_MAX_PARALLEL if hedge else 1):
+                exhausted = not launch()
+    finally:
+        for task in running:
+            task.cancel()
+
+    if errors and all(isinstance(e, RateLimited) or is_quota_error(e) for e in errors):
+        # Every model is out of quota: tell the client when to come back
+        retry_after = min(scheduler.wait_time(m, prompt_tokens) for m in models)
+        raise RateLimited("All Gemini models are rate limited, please retry later", retry_after=retry_after)
+    if any(isinstance(e, DeadlineExceeded) for e in errors):
+        raise DeadlineExceeded("generation")
+    if errors:
+        # If all models failed, raise the last error
+        raise ValueError(f"All Gemini models failed. Last error: {str(errors[-1])}")
+    raise ValueError("No Gemini models available")
+
+def _chat_prompt(user_message: str, system_context: Optional[str]) -> str:
     if not GEMINI_API_KEY:
         # Try to load again
         api_key = os.getenv("GEMINI_API_KEY")
@@ -52,100 +316,67 @@ async def generate_chat_response(
     
     # Combine system context and user message
     if system_context:
-        full_prompt = f"{system_context}\n\nUser question: {user_message}\n\nAnswer based on the context provided above."
-    else:
-        full_prompt = user_message
+        return f"{system_context}\n\nUser question: {user_message}\n\nAnswer based on the context provided above."
+    return user_message
 
-    # 1. Try New SDK with Gemini 3 Pro
-    if NEW_SDK_AVAILABLE:
-        try:
-            client = genai.Client(api_key=GEMINI_API_KEY)
-            print(f"Attempting to use gemini-3-pro-preview...")
-            
-            # Note: thinking_level defaults to "high" for gemini-3-pro-preview.
-            response = client.models.generate_content(
-                model="gemini-3-pro-preview",
-                contents=full_prompt
-            )
-            print("✅ Using model: gemini-3-pro-preview (New SDK)")
-            if response.text:
-                return response.text
-        except Exception as e:
-            print(f"⚠️  Gemini 3 Pro (New SDK) failed: {e}")
-            if "429" in str(e):
-                 print("   Quota exceeded for Gemini 3 Pro. Falling back to other models.")
-            elif "404" in str(e) or "not found" in str(e).lower():
-                 print("   Model might not be available for this API key or region.")
-            # Fall through to legacy logic
-
-    # 2. Fallback to Legacy SDK
-    try:
-        configure_gemini()
-        
-        fallback_models = [
-            "gemini-2.5-flash",       # Try 2.5
-            "gemini-2.0-flash-lite",  # Newest free tier
-            "gemini-2.0-flash",       # Standard 2.0
-            "gemini-flash-latest",    # Latest available flash
-            "gemini-pro",             # Legacy
-        ]
-        
-        last_error = None
-        
-        # Iterate through models to find one that works (and has quota)
-        for model_name in fallback_models:
-            print(f"🔄 Trying fallback model: {model_name}")
-            try:
-                model = old_genai.GenerativeModel(model_name)
-                
-                # Generate response with short retry logic per model
-                max_retries = 2
-                retry_delay = 2
-                
-                response = None
-                for attempt in range(max_retries):
-                    try:
-                        response = model.generate_content(full_prompt)
-                        break
-                    except Exception as e:
-                        if isinstance(e, google_exceptions.ResourceExhausted):
-                            if attempt < max_retries - 1:
-                                time.sleep(retry_delay * (attempt + 1))
-                                continue
-                            else:
-                                print(f"   Rate limit on {model_name}, trying next model...")
-                                raise e # Re-raise to move to next model in outer loop
-                        raise e
-
-                if hasattr(response, 'text') and response.text:
-                    print(f"✅ Success with {model_name}")
-                    return response.text
-                elif hasattr(response, 'candidates') and response.candidates:
-                    candidate = response.candidates[0]
-                    if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                        text = ''.join([part.text for part in candidate.content.parts if hasattr(part, 'text')])
-                        print(f"✅ Success with {model_name}")
-                        return text
-                        
-            except Exception as e:
-                print(f"⚠️  {model_name} failed: {str(e)[:100]}...")
-                last_error = e
-                continue # Try next model
-        
-        if last_error:
-            # If all models failed, raise the last error (likely a 429 if all are exhausted)
-             raise ValueError(f"All Gemini models failed. Last error: {str(last_error)}")
-        
-        return "I apologize, but I could not generate a response. Please try again."
+async def generate_chat_response(
+    user_message: str,
+    system_context: Optional[str] = None,
+    models: Optional[List[str]] = None
+) -> str:
+    """Generate chat response using Gemini (Gemini 3 first unless the router picked another model order)"""
+    full_prompt = _chat_prompt(user_message, system_context)
 
+    try:
+        return await _generate_with_fallbacks(models or [PRIMARY_MODEL] + FALLBACK_MODELS, full_prompt)
+    except (RateLimited, DeadlineExceeded):
+        raise
     except Exception as e:
-        print(f"Error generating chat response with Gemini (Legacy): {e}")
-        import traceback
-        traceback.print_exc()
+        logger.error("Error generating chat response with Gemini: %s", e)
         raise ValueError(f"Gemini API error: {str(e)}")
 
-async def translate_text(text: str, target_language: str = "ur") -> str:
-    """Translate text using Gemini"""
+async def stream_chat_response(
+    user_message: str,
+    on_delta: Callable[[str], Awaitable[None]],
+    system_context: Optional[str] = None,
+    models: Optional[List[str]] = None
+) -> str:
+    """Like generate_chat_response, but pieces of the answer are passed to on_delta as they arrive.
+
+    Falls back to the next model only while nothing has been streamed yet; no hedging.
+    """
+    full_prompt = _chat_prompt(user_message, system_context)
+    prompt_tokens = estimate_tokens(full_prompt)
+    models = models or [PRIMARY_MODEL] + FALLBACK_MODELS
+    available = [m for m in models if m != PRIMARY_MODEL or get_genai_client()]
+    streamed = False
+
+    async def forward(text: str):
+        nonlocal streamed
+        streamed = True
+        await on_delta(text)
+
+    errors: List[Exception] = []
+    for model_name in [m for m in available if model_health.healthy(m)] or available:
+        try:
+            return await _stream_model(model_name, full_prompt, prompt_tokens, forward)
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            if streamed:
+                raise ValueError(f"Gemini API error: {str(e)}")
+            logger.warning("⚠️  %s failed to stream (%s): %s", model_name, type(e).__name__, str(e)[:100])
+            errors.append(e)
+
+    if errors and all(isinstance(e, RateLimited) or is_quota_error(e) for e in errors):
+        retry_after = min(scheduler.wait_time(m, prompt_tokens) for m in models)
+        raise RateLimited("All Gemini models are rate limited, please retry later", retry_after=retry_after)
+    if errors:
+        raise ValueError(f"Gemini API error: All Gemini models failed. Last error: {str(errors[-1])}")
+    raise ValueError("No Gemini models available")
+
+async def translate_text(text: str, target_language: str = "ur", strict: bool = False) -> str:
+    """Translate text using Gemini (returns the original text on failure unless strict)"""
     
     if not GEMINI_API_KEY:
          raise ValueError("GEMINI_API_KEY not configured.")
@@ -153,29 +384,13 @@ async def translate_text(text: str, target_language: str = "ur") -> str:
     language_name = "Urdu" if target_language == "ur" else "English"
     prompt = f"Translate the following text to {language_name}. Preserve formatting, code blocks, and technical terms. Only return the translation:\n\n{text}"
 
-    # 1. Try New SDK
-    if NEW_SDK_AVAILABLE:
-        try:
-            client = genai.Client(api_key=GEMINI_API_KEY)
-            response = client.models.generate_content(
-                model="gemini-3-pro-preview",
-                contents=prompt
-            )
-            if response.text:
-                return response.text
-        except Exception:
-            pass # Fallback silently
-
-    # 2. Fallback to Legacy SDK
     try:
-        configure_gemini()
-        # Fallback to a fast model available in your list
-        model = old_genai.GenerativeModel("gemini-2.0-flash-lite") 
-        response = model.generate_content(prompt)
-        
-        if hasattr(response, 'text') and response.text:
-            return response.text
-        return text
+        return await _generate_with_fallbacks([PRIMARY_MODEL, TRANSLATE_FALLBACK_MODEL], prompt)
+    except (RateLimited, DeadlineExceeded):
+        # Never let callers cache the untranslated text as a translation
+        raise
     except Exception as e:
-        print(f"Error translating text: {e}")
+        logger.error("Error translating text: %s", e)
+        if strict:
+            raise
         return text
@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+from fastapi.responses import ORJSONResponse
+
+from app import metrics
+from app.config import env_bool, env_float, env_int
+from app.scheduler import RateLimited
+
+logger = logging.getLogger(__name__)
+
+SHED_ENABLED = env_bool("SHED_ENABLED", True)
+# How often the event loop is probed; lag is how late the probe wakes up
+LOOP_LAG_INTERVAL = env_float("LOOP_LAG_INTERVAL", 0.1)
+# Low-priority endpoints (translate, personalize) are shed first...
+SHED_LOW_LAG_MS = env_float("SHED_LOW_LAG_MS", 150.0)
+SHED_LOW_IN_FLIGHT = env_int("SHED_LOW_IN_FLIGHT", 32)
+# ...chat only once the worker is in worse shape
+SHED_HIGH_LAG_MS = env_float("SHED_HIGH_LAG_MS", 500.0)
+SHED_HIGH_IN_FLIGHT = env_int("SHED_HIGH_IN_FLIGHT", 64)
+SHED_RETRY_AFTER = env_float("SHED_RETRY_AFTER", 5.0)
+
+# Path prefix -> priority; the first match wins. Unlisted paths (auth, /health, /ready, /metrics) are never shed.
+PRIORITIES = (
+    # Polling a submitted translation job is cheap and never shed (submitting one is low priority)
+    ("/api/translate/jobs/", None),
+    ("/api/translate", "low"),
+    ("/api/personalize", "low"),
+    ("/api/chat", "high"),
+)
+
+def priority_for(path: str) -> Optional[str]:
+    for prefix, priority in PRIORITIES:
+        if path.startswith(prefix):
+            return priority
+    return None
+
+class LoopMonitor:
+    """Event-loop lag probe and in-flight request counter for one worker process"""
+
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL):
+        self.interval = interval
+        self.in_flight = 0
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._next_wake: Optional[float] = None
+        self._task: Optional[asyncio.Task] = None
+        # Priority -> whether it is currently being shed (logged on transitions only)
+        self._shedding: Dict[str, bool] = {"low": False, "high": False}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._probe())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _probe(self):
+        while True:
+            self._next_wake = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            sample = max(0.0, time.perf_counter() - self._next_wake)
+            # Smoothed, but a single long stall still shows up immediately
+            self.lag = max(sample, 0.7 * self.lag + 0.3 * sample)
+            self.max_lag = max(self.max_lag, sample)
+            metrics.observe("loop.lag", sample)
+
+    def current_lag(self) -> float:
+        """Smoothed lag in seconds, or how overdue the probe is right now if that is worse"""
+        overdue = time.perf_counter() - self._next_wake if self._next_wake is not None else 0.0
+        return max(self.lag, overdue)
+
+    @contextmanager
+    def track(self):
+        """Count one sheddable request (HTTP or WebSocket question) as in flight while the block runs"""
+        self.in_flight += 1
+        try:
+            yield
+        finally:
+            self.in_flight -= 1
+
+    def should_shed(self, priority: str) -> bool:
+        lag_ms = self.current_lag() * 1000
+        if priority == "low":
+            shed = lag_ms >= SHED_LOW_LAG_MS or self.in_flight >= SHED_LOW_IN_FLIGHT
+        else:
+            shed = lag_ms >= SHED_HIGH_LAG_MS or self.in_flight >= SHED_HIGH_IN_FLIGHT
+        if shed != self._shedding[priority]:
+            self._shedding[priority] = shed
+            log = logger.warning if shed else logger.info
+            log(
+                "%s shedding %s-priority requests (loop lag %.0fms, %d in flight)",
+                "🚦 Started" if shed else "✅ Stopped", priority, lag_ms, self.in_flight,
+                extra={"shedding": {"priority": priority, "active": shed, "lag_ms": round(lag_ms, 1), "in_flight": self.in_flight}}
+            )
+        return shed
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": SHED_ENABLED,
+            "lag_ms": round(self.current_lag() * 1000, 1),
+            "max_lag_ms": round(self.max_lag * 1000, 1),
+            "in_flight": self.in_flight,
+            "shedding": dict(self._shedding),
+        }
+
+loop_monitor = LoopMonitor()
+
+class LoadSheddingMiddleware:
+    """Reject low-priority requests with 503 + Retry-After while the worker is overloaded.
+
+    Only requests with a priority count towards the in-flight total and can be
+    rejected, so health checks always get through and long-lived streams (such as
+    translation job events) never push the worker into shedding. WebSocket scopes
+    pass through; /ws/chat counts and sheds each question itself.
+    """
+
+    def __init__(self, app, monitor: LoopMonitor = loop_monitor):
+        self.app = app
+        self.monitor = monitor
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        priority = priority_for(scope["path"])
+        if priority is None:
+            await self.app(scope, receive, send)
+            return
+        if SHED_ENABLED and self.monitor.should_shed(priority):
+            metrics.incr(f"shed.{priority}")
+            exc = RateLimited("Server is overloaded, please retry shortly", SHED_RETRY_AFTER, status_code=503)
+            response = ORJSONResponse(
+                status_code=exc.status_code,
+                content={"detail": exc.detail, "retry_after": round(exc.retry_after, 1)},
+                headers=exc.headers
+            )
+            await response(scope, receive, send)
+            return
+
+        with self.monitor.track():
+            await self.app(scope, receive, send)
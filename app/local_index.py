@@ -0,0 +1,157 @@
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+# Stored alongside the raw float32 matrix so a saved index can be validated on load
+INDEX_FORMAT_VERSION = 1
+
+# Rows dequantized at a time when scanning int8 codes
+SCAN_BLOCK_ROWS = 4096
+
+# Set bits per byte, for NumPy versions without np.bitwise_count (< 2.0)
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+def _popcount(bits: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(bits)
+    return _POPCOUNT[bits]
+
+class LocalVectorIndex:
+    """In-process cosine index over NumPy arrays with optional int8 / binary quantization.
+
+    Mirrors the Qdrant setup: quantized vectors are scanned for (limit * oversampling)
+    candidates, which are then rescored with the full-precision vectors. The float32
+    originals can be memory-mapped from disk (see save/load), so only the quantized
+    matrix has to stay resident.
+    """
+
+    def __init__(self, dim: int = 768, quantization: str = "none", oversampling: float = 2.0, rescore: bool = True):
+        if quantization not in ("none", "int8", "binary"):
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.dim = dim
+        self.quantization = quantization
+        self.oversampling = oversampling
+        self.rescore = rescore
+        self.vectors = np.zeros((0, dim), dtype=np.float32)
+        self.payloads: List[Dict] = []
+        self.ids: List[str] = []
+        self._codes: Optional[np.ndarray] = None
+        self._scale = 1.0
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
+
+    def add(self, ids: Sequence[str], vectors, payloads: Sequence[Dict]):
+        """Append vectors (any float array-like of shape [n, dim]) and rebuild the quantized codes"""
+        matrix = self._normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        self.vectors = np.concatenate([self.vectors, matrix]) if len(self.vectors) else matrix
+        self.ids.extend(str(i) for i in ids)
+        self.payloads.extend(payloads)
+        self._quantize()
+
+    def _quantize(self):
+        if self.quantization == "int8":
+            # Symmetric scalar quantization; the 0.99 quantile keeps outliers from wasting range
+            self._scale = float(np.quantile(np.abs(self.vectors), 0.99)) or 1.0
+            self._codes = np.clip(np.rint(self.vectors / self._scale * 127), -127, 127).astype(np.int8)
+        elif self.quantization == "binary":
+            self._codes = np.packbits(self.vectors > 0, axis=1)
+        else:
+            self._codes = None
+
+    def _scores(self, query: np.ndarray) -> np.ndarray:
+        """Approximate similarity of query to every stored vector"""
+        if self.quantization == "int8":
+            # Dequantize in blocks so scanning never materializes the whole float32 matrix
+            scaled = query * (self._scale / 127)
+            return np.concatenate([
+                self._codes[start:start + SCAN_BLOCK_ROWS].astype(np.float32) @ scaled
+                for start in range(0, len(self._codes), SCAN_BLOCK_ROWS)
+            ])
+        if self.quantization == "binary":
+            # Fewer differing sign bits = more similar
+            query_bits = np.packbits(query > 0)
+            return -_popcount(np.bitwise_xor(self._codes, query_bits)).sum(axis=1, dtype=np.int32).astype(np.float32)
+        return self.vectors @ query
+
+    @staticmethod
+    def _top(scores: np.ndarray, k: int) -> np.ndarray:
+        k = min(k, len(scores))
+        if k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        top = np.argpartition(-scores, k - 1)[:k]
+        return top[np.argsort(-scores[top])]
+
+    def search(self, query_vector: Sequence[float], limit: int = 5) -> List[Dict]:
+        """Nearest neighbours in the same shape search_vectors returns"""
+        if not self.ids:
+            return []
+        query = self._normalize(np.asarray(query_vector, dtype=np.float32).reshape(self.dim))
+        if self.quantization == "none":
+            rows = self._top(self._scores(query), limit)
+            scores = (self.vectors[rows] @ query)
+        else:
+            candidates = self._top(self._scores(query), int(limit * max(1.0, self.oversampling)))
+            if self.rescore:
+                exact = self.vectors[candidates] @ query
+                order = np.argsort(-exact)[:limit]
+                rows, scores = candidates[order], exact[order]
+            else:
+                rows = candidates[:limit]
+                scores = self.vectors[rows] @ query
+        return [
+            {
+                "text": self.payloads[row].get("text", ""),
+                "score": float(score),
+                "id": self.ids[row],
+                "module": self.payloads[row].get("module"),
+                "section": self.payloads[row].get("section"),
+            }
+            for row, score in zip(rows.tolist(), scores.tolist())
+        ]
+
+    def memory_bytes(self) -> Dict[str, int]:
+        """Size of the scanned (quantized) matrix vs the full-precision originals"""
+        scanned = self._codes.nbytes if self._codes is not None else self.vectors.nbytes
+        return {"scanned": int(scanned), "full_precision": int(self.vectors.nbytes)}
+
+    def save(self, directory: Path):
+        """Write vectors.f32 (raw row-major float32), payloads.jsonl and meta.json"""
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        self.vectors.tofile(directory / "vectors.f32")
+        with open(directory / "payloads.jsonl", "w", encoding="utf-8") as f:
+            for point_id, payload in zip(self.ids, self.payloads):
+                f.write(json.dumps({"id": point_id, "payload": payload}, ensure_ascii=False) + "\n")
+        (directory / "meta.json").write_text(json.dumps({
+            "version": INDEX_FORMAT_VERSION, "dim": self.dim, "count": len(self.ids)
+        }))
+
+    @classmethod
+    def load(cls, directory: Path, mmap: bool = True, **kwargs) -> "LocalVectorIndex":
+        """Load a saved index; with mmap=True the float32 originals stay on disk"""
+        directory = Path(directory)
+        meta = json.loads((directory / "meta.json").read_text())
+        if meta["version"] != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format version: {meta['version']}")
+        index = cls(dim=meta["dim"], **kwargs)
+        path = directory / "vectors.f32"
+        if mmap and meta["count"]:
+            index.vectors = np.memmap(path, dtype=np.float32, mode="r", shape=(meta["count"], meta["dim"]))
+        else:
+            index.vectors = np.fromfile(path, dtype=np.float32).reshape(-1, meta["dim"])
+        with open(directory / "payloads.jsonl", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                index.ids.append(record["id"])
+                index.payloads.append(record["payload"])
+        index._quantize()
+        return index
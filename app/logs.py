@@ -0,0 +1,189 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+
+from app.config import env_int, env_float, env_str
+
+# Root level plus per-module overrides, e.g. "app.gemini_client=DEBUG,uvicorn.access=WARNING"
+LOG_LEVEL = env_str("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = env_str("LOG_LEVELS", "")
+# "json" for one JSON object per line, "text" for plain messages (local development)
+LOG_FORMAT = env_str("LOG_FORMAT", "json").lower()
+# Repeated hot-path messages: the first LOG_SAMPLE_BURST per window are kept, then 1 in LOG_SAMPLE_EVERY
+LOG_SAMPLE_BURST = env_int("LOG_SAMPLE_BURST", 20)
+LOG_SAMPLE_WINDOW = env_float("LOG_SAMPLE_WINDOW", 10.0)
+LOG_SAMPLE_EVERY = env_int("LOG_SAMPLE_EVERY", 50)
+# Records held in memory while the writer thread catches up; beyond this they are dropped
+LOG_QUEUE_SIZE = env_int("LOG_QUEUE_SIZE", 10000)
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+_request_id: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else was passed via extra= and is emitted as a field
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_dropped = 0
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+def set_request_id(request_id: Optional[str] = None) -> str:
+    """Bind a request ID to the current context (a new one if none is given)"""
+    request_id = request_id or uuid.uuid4().hex
+    _request_id.set(request_id)
+    return request_id
+
+class RequestIdFilter(logging.Filter):
+    """Stamp records with the request ID of the context that logged them"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = _request_id.get()
+        return True
+
+class SamplingFilter(logging.Filter):
+    """Thin out repeated INFO/DEBUG messages; warnings and errors always pass.
+
+    Messages are keyed by logger and format string, so hot paths should log with
+    %-style arguments rather than f-strings.
+    """
+
+    def __init__(self, burst: int = LOG_SAMPLE_BURST, window: float = LOG_SAMPLE_WINDOW, every: int = LOG_SAMPLE_EVERY):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.every = max(1, every)
+        self._counts: Dict[Tuple[str, str], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.burst <= 0:
+            return True
+        key = (record.name, str(record.msg))
+        now = time.monotonic()
+        with self._lock:
+            started, seen = self._counts.get(key, (now, 0))
+            if now - started > self.window:
+                started, seen = now, 0
+            seen += 1
+            self._counts[key] = (started, seen)
+            if len(self._counts) > 10000:
+                self._counts.clear()
+        if seen <= self.burst:
+            return True
+        if (seen - self.burst) % self.every == 0:
+            record.sampled = self.every
+            return True
+        return False
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """Hand records to the writer thread without ever blocking the caller"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Render the message and traceback here, where args are still safe to read
+        record.message = record.getMessage()
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        global _dropped
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _dropped += 1
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with timestamp, level, logger, request ID and extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class TextFormatter(logging.Formatter):
+    """Plain messages, with the traceback and request ID when present"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        message = record.getMessage()
+        if getattr(record, "request_id", None):
+            message = f"[{record.request_id[:8]}] {message}"
+        if record.exc_text:
+            message = f"{message}\n{record.exc_text}"
+        return message
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse "module=LEVEL,other=LEVEL" into a dict, ignoring malformed entries"""
+    levels = {}
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        name, _, level = entry.partition("=")
+        if level.strip().upper() in logging._nameToLevel:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+def dropped_records() -> int:
+    return _dropped
+
+def setup_logging():
+    """Route all logging (including uvicorn's) through a bounded queue to a stdout writer thread"""
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stdout)
+    output.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else TextFormatter())
+
+    handler = NonBlockingQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    # Filters run in the logging thread, where the request context is still bound
+    handler.addFilter(RequestIdFilter())
+    handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+    # uvicorn installs its own synchronous stdout handlers; send its records through the queue too
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    for name, level in parse_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(handler.queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,44 +1,54 @@
-from fastapi import FastAPI, HTTPException, Depends, Request, status
+import time
+
+_import_started = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Depends, Request, Query, Path, Response, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from fastapi.exceptions import RequestValidationError
 from pydantic import BaseModel
 from typing import Optional, List
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-import traceback
+from datetime import datetime
+import base64
+import json
 import logging
-import sys
-
-# Configure logging to ensure output is visible
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(message)s',
-    stream=sys.stdout,
-    force=True
-)
-logger = logging.getLogger(__name__)
 
-# Load .env file from backend directory BEFORE importing other modules
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path)
+# Load .env file (once, in app.config) BEFORE importing other modules
+import app.config  # noqa: F401
+from app.config import env_int
 
-from app.database import get_db, init_db
-from app.qdrant_client import get_qdrant_client, search_vectors
-from app.openai_client import get_embeddings, generate_chat_response
-from app.models import ChatRequest, ChatResponse, TranslateRequest, TranslateResponse
-from app.auth import get_current_user_optional, router as auth_router
+# Queue-backed structured logging: handlers never write to stdout on the event loop
+from app.logs import setup_logging, set_request_id, dropped_records, REQUEST_ID_HEADER
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Heavy SDKs (SQLAlchemy, Qdrant, Google GenAI, passlib) are imported lazily on first use
+from app.models import ChatRequest, ChatResponse, ChatHistoryPage, TranslateRequest, TranslateResponse
+from app.auth import get_current_user, get_current_user_optional, router as auth_router
+from app.scheduler import RateLimited, scheduler
+from app.rate_limit import limit_requests
+from app.deadline import DeadlineExceeded, request_deadline, CHAT_DEADLINE_SECONDS, TRANSLATE_DEADLINE_SECONDS
+from app import metrics
+from app.chat_service import answer_chat
+from app.extractive import fast_path_stats
+from app.shared_cache import get_shared_cache
+from app.chunk_store import chunk_store
+from app.compression import CompressionMiddleware
+from app.load_shedding import LoadSheddingMiddleware, loop_monitor
+from app.profiling import PROFILE_ENABLED, ProfilingMiddleware, router as profiling_router
+from app.ws_chat import router as ws_chat_router, ws_stats
+from app.translation_jobs import router as translation_jobs_router, translation_jobs
+from app.startup import initialize_backends, record_phase, format_report, is_ready, is_degraded, startup_report
 
-app = FastAPI(title="Physical AI Textbook API", version="1.0.0")
+# orjson is several times faster than the stdlib encoder, notably for long non-ASCII (Urdu) text
+app = FastAPI(title="Physical AI Textbook API", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Global exception handler to ensure all errors return JSON
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Handle all unhandled exceptions and return JSON"""
-    print(f"Unhandled exception: {exc}")
-    traceback.print_exc()
-    return JSONResponse(
+    logger.error("Unhandled exception: %s", exc, exc_info=exc)
+    return ORJSONResponse(
         status_code=500,
         content={
             "detail": f"Internal server error: {str(exc)}",
@@ -46,14 +56,40 @@ async def global_exception_handler(request: Request, exc: Exception):
         }
     )
 
+@app.exception_handler(RateLimited)
+async def rate_limited_handler(request: Request, exc: RateLimited):
+    """Fail fast with 429/503 and Retry-After when quota or queue capacity is exhausted"""
+    return ORJSONResponse(
+        status_code=exc.status_code,
+        content={"detail": exc.detail, "retry_after": round(exc.retry_after, 1)},
+        headers=exc.headers
+    )
+
+@app.exception_handler(DeadlineExceeded)
+async def deadline_exceeded_handler(request: Request, exc: DeadlineExceeded):
+    """The request ran out of its time budget"""
+    metrics.incr(f"deadline.exceeded.{exc.stage}")
+    return ORJSONResponse(
+        status_code=504,
+        content={"detail": str(exc)}
+    )
+
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     """Handle validation errors and return JSON"""
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=422,
         content={"detail": exc.errors()}
     )
 
+# Opt-in request profiling; innermost, so it samples the task that runs the endpoint
+if PROFILE_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Shed translate/personalize, then chat, when the event loop lags or too many requests are in flight
+# (inside CORS, so browsers can read the 503)
+app.add_middleware(LoadSheddingMiddleware)
+
 # CORS middleware - allow all origins for development
 app.add_middleware(
     CORSMiddleware,
@@ -63,23 +99,41 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_id_middleware(request: Request, call_next):
+    """Tag every log record of a request with its ID (client-supplied or generated)"""
+    request_id = set_request_id(request.headers.get(REQUEST_ID_HEADER))
+    response = await call_next(request)
+    response.headers[REQUEST_ID_HEADER] = request_id
+    return response
+
+# Negotiated gzip/brotli for responses above COMPRESS_MIN_BYTES
+app.add_middleware(CompressionMiddleware)
+
 # Include auth routes
 app.include_router(auth_router, prefix="/auth", tags=["auth"])
+app.include_router(profiling_router, prefix="/admin", tags=["admin"])
+app.include_router(ws_chat_router, tags=["chat"])
+app.include_router(translation_jobs_router, prefix="/api/translate/jobs", tags=["translate"])
+
+record_phase("import", "ready", time.perf_counter() - _import_started)
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize database and Qdrant on startup"""
-    try:
-        await init_db()
-    except Exception as e:
-        print(f"⚠️  Database initialization skipped: {e}")
-        print("   Some features may not work without database connection")
-    
-    try:
-        await get_qdrant_client()
-    except Exception as e:
-        print(f"⚠️  Qdrant initialization skipped: {e}")
-        print("   Vector search may not work without Qdrant connection")
+    """Initialize database and Qdrant concurrently on startup"""
+    loop_monitor.start()
+    translation_jobs.start()
+    await initialize_backends()
+    logger.info("⏱️  Startup report:\n%s", format_report(), extra={"startup": startup_report})
+    if startup_report["database"]["status"] != "ready":
+        logger.warning("⚠️  Database initialization skipped: some features may not work without database connection")
+    if startup_report["qdrant"]["status"] != "ready":
+        logger.warning("⚠️  Qdrant initialization skipped: vector search may not work without Qdrant connection")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await translation_jobs.stop()
+    await loop_monitor.stop()
 
 @app.get("/")
 async def root():
@@ -87,133 +141,173 @@ async def root():
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving requests"""
     return {"status": "healthy"}
 
-@app.post("/api/chat", response_model=ChatResponse)
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: backend initialization has finished (possibly degraded)"""
+    if not is_ready():
+        return ORJSONResponse(status_code=503, content={"status": "starting", "startup": startup_report})
+    return {"status": "degraded" if is_degraded() else "ready", "startup": startup_report}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """In-process counters, latency histograms and upstream quota state"""
+    return {
+        **metrics.snapshot(),
+        "scheduler": scheduler.stats(),
+        "shared_cache": get_shared_cache().stats(),
+        "chunk_store": chunk_store.stats(),
+        "load": loop_monitor.stats(),
+        "websockets": ws_stats(),
+        "translation_jobs": translation_jobs.stats(),
+        "log_records_dropped": dropped_records(),
+        "chat_answers": fast_path_stats(),
+    }
+
+@app.post(
+    "/api/chat",
+    response_model=ChatResponse,
+    dependencies=[Depends(limit_requests("chat")), Depends(request_deadline(CHAT_DEADLINE_SECONDS))]
+)
 async def chat(
     request: ChatRequest,
     current_user: Optional[dict] = Depends(get_current_user_optional)
 ):
     """RAG chatbot endpoint"""
-    msg_preview = request.message[:50] if request.message else 'None'
-    logger.info(f"\n🔍 CHAT REQUEST: message='{msg_preview}...', context={'Yes' if request.context else 'No'}")
-    try:
-        # Get embeddings for query (with fallback)
-        context_text = ""
-        rag_used = False
-        logger.info("📊 Step 1: Generating embeddings...")
-        try:
-            query_embedding = await get_embeddings(request.message or request.context)
-            emb_len = len(query_embedding) if query_embedding else 0
-            logger.info(f"📊 Step 2: Embedding generated, length={emb_len}")
-            
-            if query_embedding and len(query_embedding) > 0:
-                # Search Qdrant for relevant chunks
-                logger.info("📊 Step 3: Searching Qdrant...")
-                try:
-                    qdrant_client = await get_qdrant_client()
-                    search_results = await search_vectors(qdrant_client, query_embedding, limit=5)
-                    
-                    if search_results and len(search_results) > 0:
-                        # Build context from search results
-                        context_text = "\n\n".join([result["text"] for result in search_results])
-                        rag_used = True
-                        top_score = search_results[0].get('score', 'N/A')
-                        logger.info(f"✅ RAG ACTIVE: Retrieved {len(search_results)} chunks from Qdrant")
-                        logger.info(f"   Top result score: {top_score}")
-                    else:
-                        logger.warning("⚠️  Qdrant search returned no results, using fallback context")
-                except Exception as e:
-                    logger.error(f"⚠️  Qdrant search failed: {e}")
-                    logger.warning("   Using fallback context")
-            else:
-                logger.warning("⚠️  No embeddings available, using fallback context")
-        except Exception as e:
-            logger.error(f"⚠️  Embedding generation failed: {e}")
-            logger.warning("   Using fallback context")
-        
-        # Fallback context if no vector search results
-        if not context_text:
-            context_text = "This is a textbook about Physical AI & Humanoid Robotics covering ROS 2, Gazebo, NVIDIA Isaac, and Vision-Language-Action systems."
-            logger.warning("⚠️  Using FALLBACK context (RAG not used)")
-        else:
-            logger.info(f"📚 Context length: {len(context_text)} characters")
-        
-        # Add selected text context if provided
-        if request.context:
-            context_text = f"{request.context}\n\n{context_text}"
-        
-        # Generate response using OpenAI
-        system_prompt = f"""You are an AI assistant helping students learn about Physical AI & Humanoid Robotics. 
-Use the following context from the textbook to answer questions accurately. If the context doesn't contain 
-the answer, you can use your general knowledge but indicate when you're doing so.
+    return await answer_chat(request, current_user)
 
-Context from textbook:
-{context_text}
+def encode_history_cursor(timestamp: Optional[datetime], entry_id: str) -> str:
+    """Opaque keyset cursor for the (timestamp, id) of the last row on a page (legacy rows have no timestamp)"""
+    raw = json.dumps([timestamp.isoformat() if timestamp else None, entry_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
 
-Answer the question based on the context provided. Be helpful, clear, and educational."""
-        
-        # Generate response using Gemini
-        try:
-            response = await generate_chat_response(
-                user_message=request.message or request.context,
-                system_context=system_prompt
-            )
-        except Exception as e:
-            print(f"Error generating chat response: {e}")
-            raise HTTPException(
-                status_code=500, 
-                detail=f"Failed to generate response. Please check GEMINI_API_KEY is set correctly. Error: {str(e)}"
-            )
-        
-        # Store chat history if user is logged in
-        if current_user and current_user.get("id"):
-            try:
-                from app.database import save_chat_history
-                await save_chat_history(
-                    user_id=current_user["id"],
-                    message=request.message or request.context,
-                    response=response,
-                    context=request.context
-                )
-            except Exception as e:
-                print(f"Warning: Could not save chat history: {e}")
-                # Continue even if history save fails
-        
-        return ChatResponse(response=response)
-        
-    except HTTPException:
-        # Re-raise HTTP exceptions
-        raise
+def decode_history_cursor(cursor: str):
+    """Inverse of encode_history_cursor; raises ValueError on malformed cursors"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    timestamp, entry_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    return (datetime.fromisoformat(timestamp) if timestamp is not None else None), str(entry_id)
+
+@app.get("/api/chat/history", response_model=ChatHistoryPage)
+async def chat_history(
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    fields: str = Query("summary", pattern="^(summary|full)$"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Newest-first chat history for the logged-in user, paginated by keyset cursor"""
+    try:
+        before = decode_history_cursor(cursor) if cursor else None
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    try:
+        from app.database import get_chat_history_page
+        # Fetch one extra row to know whether there is a next page
+        rows = await get_chat_history_page(current_user["id"], limit + 1, before, full=(fields == "full"))
     except Exception as e:
-        print(f"Unexpected error in chat endpoint: {e}")
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+        logger.error("Error loading chat history: %s", e)
+        raise HTTPException(status_code=503, detail="Chat history is not available")
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1]["timestamp"], rows[-1]["id"])
+    return ChatHistoryPage(items=rows, next_cursor=next_cursor)
 
-@app.post("/api/translate", response_model=TranslateResponse)
+@app.post(
+    "/api/translate",
+    response_model=TranslateResponse,
+    dependencies=[Depends(limit_requests("translate")), Depends(request_deadline(TRANSLATE_DEADLINE_SECONDS))]
+)
 async def translate(request: TranslateRequest):
     """Translate content to Urdu"""
     try:
-        from app.translation import translate_text, get_cached_translation
+        from app.translation import get_cached_translation, hash_text
+        from app.openai_client import translate_text
+        text_hash = hash_text(request.text)
         
         # Check cache first
         cached = await get_cached_translation(request.text, request.language)
         if cached:
-            return TranslateResponse(translated_text=cached)
+            return TranslateResponse(translated_text=cached, text_hash=text_hash)
         
         # Translate using OpenAI
-        translated = await translate_text(request.text, request.language)
+        try:
+            translated = await translate_text(request.text, request.language, strict=True)
+        except (RateLimited, DeadlineExceeded):
+            raise
+        except Exception as e:
+            # Hand back the source so the page still renders, but never cache it: GET /api/translate/{hash}
+            # serves cached rows as immutable, so a cached fallback would stick in browsers and CDNs
+            logger.warning("Translation failed, returning the source text uncached: %s", e)
+            metrics.incr("translate.fallback")
+            return TranslateResponse(translated_text=request.text, text_hash=None)
         
         # Cache the translation
         from app.translation import cache_translation
         await cache_translation(request.text, translated, request.language, request.module)
         
-        return TranslateResponse(translated_text=translated)
+        return TranslateResponse(translated_text=translated, text_hash=text_hash)
         
+    except (RateLimited, DeadlineExceeded):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Cached translations never change for a (text hash, language); bump the version to invalidate clients
+TRANSLATION_ETAG_VERSION = env_int("TRANSLATION_ETAG_VERSION", 1)
+TRANSLATION_MAX_AGE = env_int("TRANSLATION_MAX_AGE", 365 * 24 * 3600)
+
+def translation_etag(text_hash: str, language: str) -> str:
+    """Weak ETag for a cached translation, derivable from the URL alone.
+
+    Weak because CompressionMiddleware serves identity, gzip and br bodies under it,
+    and different encodings must not share a strong validator.
+    """
+    return f'W/"{text_hash}-{language}-v{TRANSLATION_ETAG_VERSION}"'
+
+def _opaque_tag(tag: str) -> str:
+    return tag[2:] if tag.startswith("W/") else tag
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match uses weak comparison, so W/ prefixes are ignored on both sides"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or _opaque_tag(etag) in (_opaque_tag(tag) for tag in tags)
+
+@app.get("/api/translate/{text_hash}", response_model=TranslateResponse)
+async def translate_by_hash(
+    request: Request,
+    text_hash: str = Path(..., pattern="^[0-9a-f]{64}$"),
+    language: str = Query("ur", pattern="^[a-z]{2,8}$")
+):
+    """Cacheable translation lookup by sha256 of the source text (as returned by POST /api/translate)"""
+    etag = translation_etag(text_hash, language)
+    cache_headers = {"ETag": etag, "Cache-Control": f"public, max-age={TRANSLATION_MAX_AGE}, immutable"}
+    # A given (text hash, language) never changes, so a matching ETag is answered without any lookup
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        metrics.incr("translate.get.not_modified")
+        return Response(status_code=304, headers=cache_headers)
+
+    from app.translation import get_translation_by_hash
+    try:
+        translated = await get_translation_by_hash(text_hash, language)
+    except Exception as e:
+        logger.error("Error loading translation %s: %s", text_hash, e)
+        raise HTTPException(status_code=503, detail="Translation cache is not available")
+    if translated is None:
+        metrics.incr("translate.get.miss")
+        # Not cached yet: POST /api/translate creates it, so this must not be cached
+        raise HTTPException(status_code=404, detail="Translation not cached", headers={"Cache-Control": "no-store"})
+    metrics.incr("translate.get.hit")
+    return ORJSONResponse(
+        content={"translated_text": translated, "text_hash": text_hash},
+        headers=cache_headers
+    )
+
 @app.get("/api/personalize")
 async def get_personalization(
     current_user: Optional[dict] = Depends(get_current_user_optional)
@@ -232,5 +326,12 @@ async def get_personalization(
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    from app.config import WEB_CONCURRENCY
+    # log_config=None: uvicorn's default config would reinstall synchronous stdout handlers
+    # over setup_logging(), bypassing the queue and the JSON formatter
+    # Multiple workers need an import string so each process loads its own app
+    if WEB_CONCURRENCY > 1:
+        uvicorn.run("app.main:app", host="0.0.0.0", port=8000, workers=WEB_CONCURRENCY, log_config=None)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8000, log_config=None)
 
@@ -0,0 +1,80 @@
+import threading
+from collections import deque
+from typing import Dict, List
+
+# Recent observations kept per histogram; percentiles are computed over this window
+RESERVOIR_SIZE = 1024
+
+class Histogram:
+    """Rolling window of observations with count/sum over the process lifetime"""
+
+    def __init__(self, size: int = RESERVOIR_SIZE):
+        self.values = deque(maxlen=size)
+        self.count = 0
+        self.total = 0.0
+
+    def observe(self, value: float):
+        self.values.append(value)
+        self.count += 1
+        self.total += value
+
+    def percentile(self, p: float) -> float:
+        """p in [0, 100]; 0.0 if nothing was observed yet"""
+        if not self.values:
+            return 0.0
+        ordered: List[float] = sorted(self.values)
+        index = min(len(ordered) - 1, max(0, int(round(p / 100.0 * (len(ordered) - 1)))))
+        return ordered[index]
+
+    def summary(self) -> Dict:
+        return {
+            "count": self.count,
+            "avg": round(self.total / self.count, 4) if self.count else 0.0,
+            "p50": round(self.percentile(50), 4),
+            "p95": round(self.percentile(95), 4),
+            "p99": round(self.percentile(99), 4),
+        }
+
+_lock = threading.Lock()
+_counters: Dict[str, int] = {}
+_histograms: Dict[str, Histogram] = {}
+
+def incr(name: str, value: int = 1):
+    """Increment a counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+def counter(name: str) -> int:
+    """Current value of a counter"""
+    with _lock:
+        return _counters.get(name, 0)
+
+def observe(name: str, value: float):
+    """Record an observation (e.g. a latency in seconds)"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.observe(value)
+
+def percentile(name: str, p: float, default: float = 0.0) -> float:
+    """Percentile of a histogram, or default if it has no observations"""
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None or not histogram.values:
+            return default
+        return histogram.percentile(p)
+
+def count(name: str) -> int:
+    """Number of values currently in a histogram's window"""
+    with _lock:
+        histogram = _histograms.get(name)
+        return len(histogram.values) if histogram else 0
+
+def snapshot() -> Dict:
+    """All counters and histogram summaries"""
+    with _lock:
+        return {
+            "counters": dict(_counters),
+            "histograms": {name: h.summary() for name, h in _histograms.items()},
+        }
@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import text
+
+# Ordered, idempotent schema changes for databases created before the models changed.
+# create_all() only creates missing tables, so anything added to an existing table
+# (indexes, columns) must also be listed here. Never edit or reorder applied entries.
+MIGRATIONS: List[Tuple[str, str]] = [
+    (
+        "0001_chat_history_user_timestamp_index",
+        'CREATE INDEX IF NOT EXISTS ix_chat_history_user_timestamp ON chat_history (user_id, "timestamp", id)',
+    ),
+    (
+        "0002_chat_history_conversation_id",
+        "ALTER TABLE chat_history ADD COLUMN IF NOT EXISTS conversation_id VARCHAR",
+    ),
+    (
+        "0003_chat_history_conversation_index",
+        'CREATE INDEX IF NOT EXISTS ix_chat_history_conversation_timestamp ON chat_history (conversation_id, "timestamp")',
+    ),
+    (
+        "0004_translations_text_hash",
+        "ALTER TABLE translations ADD COLUMN IF NOT EXISTS text_hash VARCHAR(64)",
+    ),
+    (
+        "0005_translations_text_hash_backfill",
+        "UPDATE translations SET text_hash = encode(sha256(convert_to(original_text, 'UTF8')), 'hex') "
+        "WHERE text_hash IS NULL",
+    ),
+    (
+        "0006_translations_language_text_hash_index",
+        "CREATE INDEX IF NOT EXISTS ix_translations_language_text_hash ON translations (language, text_hash)",
+    ),
+    (
+        "0007_content_chunks_section_length",
+        "ALTER TABLE content_chunks ALTER COLUMN section TYPE VARCHAR(300)",
+    ),
+    (
+        # Keep one row per (language, text_hash): a real translation over an echo of the source, then the oldest
+        "0009_translations_dedupe_language_text_hash",
+        "DELETE FROM translations WHERE id IN ("
+        "SELECT id FROM (SELECT id, ROW_NUMBER() OVER ("
+        "PARTITION BY language, text_hash "
+        "ORDER BY (translated_text = original_text), created_at NULLS LAST, id"
+        ") AS row_rank FROM translations WHERE text_hash IS NOT NULL) ranked WHERE row_rank > 1)",
+    ),
+    (
+        "0010_translations_language_text_hash_unique",
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_translations_language_text_hash ON translations (language, text_hash)",
+    ),
+    (
+        "0011_translations_drop_language_text_hash_index",
+        "DROP INDEX IF EXISTS ix_translations_language_text_hash",
+    ),
+]
+
+# pg_advisory_xact_lock key shared by every worker; arbitrary but fixed
+SCHEMA_LOCK_ID = 7_240_113_052
+
+def lock_schema(conn):
+    """Serialize schema changes across workers until the current transaction ends (Postgres only)"""
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_ID})
+
+def run_migrations(conn) -> List[str]:
+    """Apply pending migrations and record them in schema_migrations; returns the names applied.
+
+    Runs on the caller's transaction, which must hold lock_schema() so concurrently
+    starting workers never apply the same migration twice.
+    """
+    applied: List[str] = []
+    conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS schema_migrations ("
+        "name VARCHAR(200) PRIMARY KEY, applied_at TIMESTAMP NOT NULL)"
+    ))
+    done = {row[0] for row in conn.execute(text("SELECT name FROM schema_migrations"))}
+    for name, statement in MIGRATIONS:
+        if name in done:
+            continue
+        conn.execute(text(statement))
+        conn.execute(
+            text("INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :applied_at)"),
+            {"name": name, "applied_at": datetime.utcnow()}
+        )
+        applied.append(name)
+    return applied
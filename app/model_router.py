@@ -0,0 +1,86 @@
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from app import metrics
+from app.config import env_bool, env_float, env_int
+from app.gemini_client import PRIMARY_MODEL, FALLBACK_MODELS
+
+logger = logging.getLogger(__name__)
+
+def _with_fallbacks(preferred: List[str]) -> List[str]:
+    """Preferred models first, then every other model in the default order"""
+    return preferred + [model for model in [PRIMARY_MODEL] + FALLBACK_MODELS if model not in preferred]
+
+# Model order per tier; each tier still falls back to the remaining models
+TIERS: Dict[str, List[str]] = {
+    "fast": _with_fallbacks(["gemini-2.0-flash-lite", "gemini-2.0-flash", "gemini-flash-latest", "gemini-2.5-flash"]),
+    "standard": _with_fallbacks(["gemini-2.5-flash", "gemini-2.0-flash", "gemini-2.0-flash-lite", "gemini-flash-latest"]),
+    "pro": [PRIMARY_MODEL] + FALLBACK_MODELS,
+}
+
+# Disabled: every request goes to the pro tier (Gemini 3 first), as before routing existed
+ROUTER_ENABLED = env_bool("ROUTER_ENABLED", True)
+# Fast tier: short question with a confident retrieval hit and nothing that needs reasoning
+ROUTER_FAST_MAX_CHARS = env_int("ROUTER_FAST_MAX_CHARS", 160)
+ROUTER_FAST_MIN_SCORE = env_float("ROUTER_FAST_MIN_SCORE", 0.75)
+# Pro tier: long questions, large selected-text context, code, or several reasoning cues
+ROUTER_PRO_MIN_CHARS = env_int("ROUTER_PRO_MIN_CHARS", 600)
+ROUTER_PRO_CONTEXT_CHARS = env_int("ROUTER_PRO_CONTEXT_CHARS", 3000)
+ROUTER_PRO_REASONING_CUES = env_int("ROUTER_PRO_REASONING_CUES", 2)
+
+_CODE = re.compile(
+    r"```|`[^`\n]+`|^\s*(def|class|import|from|#include|int|void|public|ros2|colcon)\b|[;{}]\s*$|\w+\(.*\)",
+    re.MULTILINE,
+)
+_REASONING = re.compile(
+    r"\b(why|how does|how do|how can|compare|difference|trade-?offs?|design|implement|derive|prove|"
+    r"debug|optimi[sz]e|step[- ]by[- ]step|explain in detail|what happens if|error|fails?)\b",
+    re.IGNORECASE,
+)
+
+def has_code(text: str) -> bool:
+    return bool(text) and bool(_CODE.search(text))
+
+def extract_features(message: str, context: Optional[str], top_score: Optional[float]) -> Dict:
+    """Cheap local features of a chat request"""
+    message = message or ""
+    context = context or ""
+    return {
+        "message_chars": len(message),
+        "context_chars": len(context),
+        "top_score": top_score if top_score is not None else 0.0,
+        "has_code": has_code(message) or has_code(context),
+        "reasoning_cues": len(_REASONING.findall(message)),
+    }
+
+def choose_tier(features: Dict) -> Tuple[str, str]:
+    """(tier, reason) for a request's features"""
+    if not ROUTER_ENABLED:
+        return "pro", "router disabled"
+    if features["has_code"]:
+        return "pro", "code"
+    if features["context_chars"] >= ROUTER_PRO_CONTEXT_CHARS:
+        return "pro", "large context"
+    if features["message_chars"] >= ROUTER_PRO_MIN_CHARS:
+        return "pro", "long question"
+    if features["reasoning_cues"] >= ROUTER_PRO_REASONING_CUES:
+        return "pro", "reasoning"
+    if (
+        features["message_chars"] <= ROUTER_FAST_MAX_CHARS
+        and features["top_score"] >= ROUTER_FAST_MIN_SCORE
+        and features["reasoning_cues"] == 0
+    ):
+        return "fast", "short question, confident retrieval"
+    return "standard", "default"
+
+def route(message: str, context: Optional[str], top_score: Optional[float]) -> Tuple[str, List[str]]:
+    """Pick the model tier for a chat request and record the decision; returns (tier, models)"""
+    features = extract_features(message, context, top_score)
+    tier, reason = choose_tier(features)
+    metrics.incr(f"router.tier.{tier}")
+    logger.info("🧭 Routed to %s tier (%s)", tier, reason, extra={"router": {"tier": tier, "reason": reason, **features}})
+    return tier, TIERS[tier]
+
+def record_latency(tier: str, seconds: float):
+    metrics.observe(f"router.{tier}.latency", seconds)
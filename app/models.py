@@ -1,12 +1,28 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, List
+from datetime import datetime
 
 class ChatRequest(BaseModel):
     message: Optional[str] = None
     context: Optional[str] = None
+    conversation_id: Optional[str] = None  # continue a multi-turn conversation
+    elaborate: bool = False  # always generate with the LLM, never the extractive fast path
 
 class ChatResponse(BaseModel):
     response: str
+    conversation_id: Optional[str] = None  # send back to continue this conversation
+    extractive: bool = False  # answered from the textbook directly; resend with elaborate=true for an LLM answer
+
+class ChatHistoryItem(BaseModel):
+    id: str
+    timestamp: Optional[datetime] = None
+    message: str
+    response: Optional[str] = None  # only with fields=full
+    context: Optional[str] = None   # only with fields=full
+
+class ChatHistoryPage(BaseModel):
+    items: List[ChatHistoryItem]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= to get the next (older) page
 
 class TranslateRequest(BaseModel):
     text: str
@@ -15,6 +31,25 @@ class TranslateRequest(BaseModel):
 
 class TranslateResponse(BaseModel):
     translated_text: str
+    text_hash: Optional[str] = None  # for GET /api/translate/{text_hash}
+
+class TranslateJobSegment(BaseModel):
+    index: int
+    status: str  # "cached", "pending", "done" or "failed"
+    translated_text: Optional[str] = None
+
+class TranslateJob(BaseModel):
+    job_id: str
+    status: str  # "queued", "running", "completed" or "failed"
+    language: str
+    text_hash: str  # the finished translation is also served by GET /api/translate/{text_hash}
+    segments_total: int
+    segments_done: int  # cached + translated
+    segments_failed: int
+    segments: List[TranslateJobSegment]
+    translated_text: Optional[str] = None  # only once completed
+    error: Optional[str] = None
+    created_at: str
 
 class PersonalizationConfig(BaseModel):
     show_advanced_topics: bool
@@ -1,46 +1,153 @@
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-from typing import List, Optional
-import google.generativeai as genai
+import asyncio
+import hashlib
+import logging
+import time
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
 
-# Load .env file from backend directory
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path, override=True)
+from app.config import GEMINI_API_KEY, env_bool, env_float, env_int
+from app.gemini_client import configure_gemini, get_legacy_sdk
+from app import deadline, metrics
+from app.deadline import EMBED_TIMEOUT_SECONDS, DeadlineExceeded
+from app.scheduler import RateLimited, scheduler, estimate_tokens
+from app.shared_cache import get_shared_cache
 
-# Gemini API Key
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+logger = logging.getLogger(__name__)
 
-def configure_gemini():
-    if GEMINI_API_KEY:
-        genai.configure(api_key=GEMINI_API_KEY)
+# "models/text-embedding-004" is the latest standard model
+EMBEDDING_MODEL = "models/text-embedding-004"
 
-async def get_embeddings(text: str) -> List[float]:
-    """Get embeddings for text using Gemini (text-embedding-004)"""
+# Query embeddings are cached (shared by all workers) so repeated questions skip the API call
+EMBED_CACHE_TTL = env_int("EMBED_CACHE_TTL", 7 * 24 * 3600)
+
+# Micro-batching: concurrent queries within the window share one embed_content call
+EMBED_BATCHING = env_bool("EMBED_BATCHING", True)
+EMBED_BATCH_WINDOW_MS = env_float("EMBED_BATCH_WINDOW_MS", 5.0)
+EMBED_BATCH_MAX = env_int("EMBED_BATCH_MAX", 32)
+
+class EmbeddingBatcher:
+    """Coalesces concurrent query embeddings into batched embed_content calls.
+
+    Texts arriving within window_ms of the first one (or until max_batch are queued) share
+    one upstream call and one scheduler admission, so quota is spent per batch, not per
+    request. Each caller waits at most its own remaining request budget.
+    """
+
+    def __init__(self, window_ms: float = EMBED_BATCH_WINDOW_MS, max_batch: int = EMBED_BATCH_MAX):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.pending: List[Tuple[str, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    async def embed(self, text: str) -> List[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Mark errors as retrieved even if this caller has already given up waiting
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self.pending.append((text, future))
+        if len(self.pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        # shield: one caller timing out must not cancel the batch for the others
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(future), deadline.budget(EMBED_TIMEOUT_SECONDS + self.window)
+            )
+        except asyncio.TimeoutError:
+            # Out of request budget (504) rather than just past the embedding cap
+            deadline.check("embedding")
+            raise
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: List[Tuple[str, asyncio.Future]]):
+        # The batch serves many requests, so it is bounded by the embedding cap, not one caller's budget
+        deadline.detach()
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        metrics.observe("embedding.batch_size", len(batch))
+        started = time.perf_counter()
+        try:
+            vectors = await _embed_batch(texts)
+            by_text = dict(zip(texts, vectors))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            metrics.observe("embedding.latency", time.perf_counter() - started)
+
+async def _embed_batch(texts: List[str]) -> List[List[float]]:
+    """One scheduler admission and one embed_content call for a list of texts"""
+    # Raises RateLimited instead of spending a doomed call
+    await scheduler.acquire(EMBEDDING_MODEL, sum(estimate_tokens(text) for text in texts))
+    configure_gemini()
+    genai = get_legacy_sdk()
+    result = await deadline.run_blocking(
+        genai.embed_content,
+        model=EMBEDDING_MODEL,
+        content=texts,
+        task_type="retrieval_document",
+        title="Embedding of book content",
+        request_options={"timeout": EMBED_TIMEOUT_SECONDS},
+        stage="embedding",
+        cap=EMBED_TIMEOUT_SECONDS
+    )
+    vectors = result.get("embedding") if result else None
+    if not vectors or len(vectors) != len(texts):
+        raise ValueError("Gemini embedding result empty or incomplete")
+    return vectors
+
+_batcher: Optional[EmbeddingBatcher] = None
+
+def get_batcher() -> EmbeddingBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = EmbeddingBatcher()
+    return _batcher
+
+async def get_embeddings(text: str, strict: bool = False) -> List[float]:
+    """Get embeddings for text using Gemini (text-embedding-004).
+
+    Falls back to a local hash embedding on API errors unless strict; rate limits and
+    deadline overruns always propagate so callers can answer 429/503/504.
+    """
     try:
         if not GEMINI_API_KEY:
-            print("⚠️  GEMINI_API_KEY not set. Embeddings will not work.")
+            if strict:
+                raise ValueError("GEMINI_API_KEY not configured.")
+            logger.warning("⚠️  GEMINI_API_KEY not set. Embeddings will not work.")
             return create_fallback_embedding(text)
-            
-        configure_gemini()
-        
-        # Use Gemini's embedding model
-        # "models/text-embedding-004" is the latest standard model
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=text,
-            task_type="retrieval_document",
-            title="Embedding of book content"
-        )
-        
-        if 'embedding' in result:
-            return result['embedding']
+
+        cache_key = hashlib.sha256(f"{EMBEDDING_MODEL}:{text}".encode("utf-8")).hexdigest()
+        cached = get_shared_cache().get("embedding", cache_key)
+        if cached:
+            return cached
+
+        if EMBED_BATCHING:
+            embedding = await get_batcher().embed(text)
         else:
-            print("⚠️  Gemini embedding result empty.")
-            return create_fallback_embedding(text)
+            embedding = (await _embed_batch([text]))[0]
+        get_shared_cache().set("embedding", cache_key, embedding, ttl=EMBED_CACHE_TTL)
+        return embedding
             
+    except (RateLimited, DeadlineExceeded):
+        raise
     except Exception as e:
-        print(f"Error getting embeddings with Gemini: {e}")
+        if strict:
+            raise
+        logger.warning("Error getting embeddings with Gemini: %s", e)
         # Fallback to simple embedding
         return create_fallback_embedding(text)
 
@@ -70,15 +177,26 @@ def create_fallback_embedding(text: str) -> List[float]:
 
 async def generate_chat_response(
     user_message: str,
-    system_context: Optional[str] = None
+    system_context: Optional[str] = None,
+    models: Optional[List[str]] = None
 ) -> str:
     """Generate chat response - now uses Gemini"""
     # Import and use Gemini client instead
     from app.gemini_client import generate_chat_response as gemini_chat
-    return await gemini_chat(user_message, system_context)
+    return await gemini_chat(user_message, system_context, models)
+
+async def stream_chat_response(
+    user_message: str,
+    on_delta: Callable[[str], Awaitable[None]],
+    system_context: Optional[str] = None,
+    models: Optional[List[str]] = None
+) -> str:
+    """Generate a chat response, passing pieces to on_delta as they arrive - uses Gemini"""
+    from app.gemini_client import stream_chat_response as gemini_stream
+    return await gemini_stream(user_message, on_delta, system_context, models)
 
-async def translate_text(text: str, target_language: str = "ur") -> str:
+async def translate_text(text: str, target_language: str = "ur", strict: bool = False) -> str:
     """Translate text - now uses Gemini"""
     # Import and use Gemini client instead
     from app.gemini_client import translate_text as gemini_translate
-    return await gemini_translate(text, target_language)
+    return await gemini_translate(text, target_language, strict)
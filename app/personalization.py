@@ -1,5 +1,8 @@
 from app.database import UserProfile, SessionLocal, ExperienceLevel
 from typing import Dict
+import logging
+
+logger = logging.getLogger(__name__)
 
 async def get_user_personalization(user_id: str) -> Dict:
     """Get personalization config for user"""
@@ -16,7 +19,7 @@ async def get_user_personalization(user_id: str) -> Dict:
         
         return get_config_for_level(experience_level)
     except Exception as e:
-        print(f"Error getting personalization: {e}")
+        logger.error("Error getting personalization: %s", e)
         return get_default_config()
     finally:
         db.close()
@@ -0,0 +1,275 @@
+import asyncio
+import hmac
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from fastapi import APIRouter, Depends, HTTPException, Path as PathParam, Request
+from fastapi.responses import PlainTextResponse
+
+from app.config import env_bool, env_float, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Off by default: the middleware is not even installed, so disabled profiling costs nothing
+PROFILE_ENABLED = env_bool("PROFILE_ENABLED", False)
+# Admin token for X-Profile requests and the /admin/profiles endpoints (unset: both disabled)
+PROFILE_ADMIN_TOKEN = env_str("PROFILE_ADMIN_TOKEN", "")
+# Fraction of /api requests profiled without being asked
+PROFILE_SAMPLE_RATE = env_float("PROFILE_SAMPLE_RATE", 0.0)
+PROFILE_INTERVAL_MS = env_float("PROFILE_INTERVAL_MS", 5.0)
+PROFILE_DIR = Path(env_str("PROFILE_DIR", str(Path(tempfile.gettempdir()) / "ai-book-profiles")))
+# Profiles kept on disk; older ones are deleted
+PROFILE_KEEP = env_int("PROFILE_KEEP", 50)
+
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_ID_PATTERN = r"^[0-9a-f]{16}$"
+
+_ROOT = str(Path(__file__).resolve().parent.parent) + os.sep
+
+def _label(frame) -> str:
+    filename = frame.f_code.co_filename
+    filename = filename[len(_ROOT):] if filename.startswith(_ROOT) else os.path.basename(filename)
+    return f"{frame.f_code.co_name} ({filename}:{frame.f_lineno})"
+
+def _await_chain(coro) -> List[str]:
+    """Frames of a suspended coroutine and everything it awaits, outermost first"""
+    labels: List[str] = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        labels.append(_label(frame))
+        awaited = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None)
+        if isinstance(awaited, asyncio.Task):
+            awaited = awaited.get_coro()
+        elif awaited is not None and not hasattr(awaited, "cr_frame") and not hasattr(awaited, "gi_frame"):
+            labels.append(f"[await {type(awaited).__name__}]")
+            break
+        coro = awaited
+    return labels
+
+class Profiler:
+    """Sampling profiler for one asyncio task, covering both running and awaiting time.
+
+    A background thread wakes every interval: while the task is running on the
+    loop thread it records the real stack (CPU or blocking work); while the task
+    is suspended it records the await chain down to what it is waiting on.
+    Collapsed stacks ("frame;frame;... count") load straight into flamegraph tools.
+    """
+
+    def __init__(self, label: str, trigger: str, interval_ms: float = PROFILE_INTERVAL_MS):
+        self.id = uuid.uuid4().hex[:16]
+        self.label = label
+        self.trigger = trigger
+        self.interval = interval_ms / 1000.0
+        self.stacks: Counter = Counter()
+        self.running_samples = 0
+        self.awaiting_samples = 0
+        self._task: Optional[asyncio.Task] = None
+        self._thread_id: Optional[int] = None
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start profiling the current task (call from inside it)"""
+        self._task = asyncio.current_task()
+        self._thread_id = threading.get_ident()
+        self._started_at = time.time()
+        self._wall = time.perf_counter()
+        self._cpu = time.thread_time()
+        self._process_cpu = time.process_time()
+        self._sampler = threading.Thread(target=self._run, name=f"profiler-{self.id}", daemon=True)
+        self._sampler.start()
+
+    def stop(self) -> Dict:
+        """Stop sampling and return the report.
+
+        cpu_ms is CPU time of the whole loop thread while the profile ran, so it
+        includes work done for other concurrent requests; it is not per-request CPU.
+        """
+        self.wall_ms = (time.perf_counter() - self._wall) * 1000
+        self.cpu_ms = (time.thread_time() - self._cpu) * 1000
+        self.process_cpu_ms = (time.process_time() - self._process_cpu) * 1000
+        self._stop.set()
+        self._sampler.join()
+        return self.report()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:
+                # The task's coroutines change under us; a torn sample is just skipped
+                continue
+
+    def _sample(self):
+        coro = self._task.get_coro()
+        root = getattr(coro, "cr_frame", None)
+        frame = sys._current_frames().get(self._thread_id)
+        running: List = []
+        while frame is not None:
+            running.append(frame)
+            if frame is root:
+                break
+            frame = frame.f_back
+        if root is not None and running and running[-1] is root:
+            self.running_samples += 1
+            self.stacks[";".join(_label(f) for f in reversed(running))] += 1
+        else:
+            labels = _await_chain(coro)
+            if labels:
+                self.awaiting_samples += 1
+                self.stacks[";".join(labels)] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def report(self) -> Dict:
+        inclusive: Counter = Counter()
+        for stack, count in self.stacks.items():
+            for label in set(stack.split(";")):
+                inclusive[label] += count
+        ms = self.interval * 1000
+        return {
+            "id": self.id,
+            "label": self.label,
+            "trigger": self.trigger,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(self._started_at)),
+            "wall_ms": round(self.wall_ms, 1),
+            "cpu_ms": round(self.cpu_ms, 1),
+            "process_cpu_ms": round(self.process_cpu_ms, 1),
+            "interval_ms": ms,
+            "samples": self.running_samples + self.awaiting_samples,
+            "running_ms": round(self.running_samples * ms, 1),
+            "awaiting_ms": round(self.awaiting_samples * ms, 1),
+            "hot_frames": [{"frame": label, "ms": round(count * ms, 1)} for label, count in inclusive.most_common(20)],
+            "top_stacks": [{"stack": stack, "ms": round(count * ms, 1)} for stack, count in self.stacks.most_common(10)],
+        }
+
+def save_profile(profiler: Profiler, report: Dict) -> Path:
+    """Write <id>.json and <id>.collapsed to PROFILE_DIR and prune the oldest beyond PROFILE_KEEP"""
+    PROFILE_DIR.mkdir(parents=True, exist_ok=True)
+    path = PROFILE_DIR / f"{profiler.id}.json"
+    path.write_text(json.dumps(report, indent=2))
+    (PROFILE_DIR / f"{profiler.id}.collapsed").write_text(profiler.collapsed())
+    reports = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime)
+    for old in reports[:-PROFILE_KEEP] if PROFILE_KEEP > 0 else []:
+        old.unlink(missing_ok=True)
+        old.with_suffix(".collapsed").unlink(missing_ok=True)
+    return path
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(PROFILE_ADMIN_TOKEN) and token is not None and hmac.compare_digest(token, PROFILE_ADMIN_TOKEN)
+
+class ProfilingMiddleware:
+    """Profile requests that ask for it (admin X-Profile header or ?profile=1) or are sampled.
+
+    Installed innermost, so it runs in the same task as the endpoint. The profile
+    ID is returned in X-Profile-Id and the report is kept under PROFILE_DIR.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def _trigger(self, scope) -> Optional[str]:
+        headers = dict(scope.get("headers") or [])
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        requested = headers.get(PROFILE_HEADER.lower().encode()) == b"1" or query.get("profile") == ["1"]
+        if requested:
+            token = headers.get(ADMIN_TOKEN_HEADER.lower().encode())
+            return "admin" if is_admin(token.decode("latin-1") if token else None) else None
+        if PROFILE_SAMPLE_RATE > 0 and scope["path"].startswith("/api/") and random.random() < PROFILE_SAMPLE_RATE:
+            return "sample"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        trigger = self._trigger(scope) if scope["type"] == "http" else None
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        profiler = Profiler(f"{scope['method']} {scope['path']}", trigger)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", [])) + [(PROFILE_ID_HEADER.lower().encode(), profiler.id.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            report = profiler.stop()
+            try:
+                await asyncio.to_thread(save_profile, profiler, report)
+                logger.info(
+                    "🔬 Profiled %s: %.0fms wall, %.0fms CPU (%s)", profiler.label, report["wall_ms"], report["cpu_ms"], profiler.id,
+                    extra={"profile": {k: report[k] for k in ("id", "label", "trigger", "wall_ms", "cpu_ms", "running_ms", "awaiting_ms")}}
+                )
+            except OSError as e:
+                logger.warning("Could not save profile %s: %s", profiler.id, e)
+
+async def require_admin(request: Request):
+    """Admin endpoints look absent unless PROFILE_ADMIN_TOKEN is set and sent"""
+    if not is_admin(request.headers.get(ADMIN_TOKEN_HEADER)):
+        raise HTTPException(status_code=404, detail="Not Found")
+
+def _profile_path(profile_id: str, suffix: str) -> Path:
+    path = PROFILE_DIR / f"{profile_id}{suffix}"
+    if not path.exists():
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return path
+
+@router.get("/profiles", dependencies=[Depends(require_admin)])
+async def list_profiles():
+    """Stored profiles, newest first"""
+    if not PROFILE_DIR.exists():
+        return {"profiles": []}
+    reports = sorted(PROFILE_DIR.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+    profiles = []
+    for path in reports:
+        report = json.loads(path.read_text())
+        profiles.append({k: report.get(k) for k in ("id", "label", "trigger", "started_at", "wall_ms", "cpu_ms")})
+    return {"profiles": profiles}
+
+@router.get("/profiles/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_profile(profile_id: str = PathParam(..., pattern=PROFILE_ID_PATTERN)):
+    """Full report of one profile"""
+    return json.loads(_profile_path(profile_id, ".json").read_text())
+
+@router.get("/profiles/{profile_id}/collapsed", response_class=PlainTextResponse, dependencies=[Depends(require_admin)])
+async def get_collapsed(profile_id: str = PathParam(..., pattern=PROFILE_ID_PATTERN)):
+    """Collapsed stacks, e.g. for flamegraph.pl or speedscope"""
+    return PlainTextResponse(_profile_path(profile_id, ".collapsed").read_text())
+
+async def run_profiled(coro, label: str) -> Tuple[Any, Dict, Path]:
+    """Await coro under the profiler (used by scripts' --profile flag); returns (result, report, saved path).
+
+    If coro raises, the profile is still saved and its path logged before the error propagates.
+    """
+    profiler = Profiler(label, "cli")
+    profiler.start()
+    try:
+        result = await coro
+    except BaseException:
+        path = save_profile(profiler, profiler.stop())
+        logger.warning("🔬 Profile of failed run %s saved to %s", label, path)
+        raise
+    report = profiler.stop()
+    return result, report, save_profile(profiler, report)
@@ -1,17 +1,32 @@
-import os
-from pathlib import Path
-from dotenv import load_dotenv
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
-from typing import List, Dict, Optional
+import logging
+import re
+import threading
+from typing import List, Dict, Optional, TYPE_CHECKING
 
-# Load .env file from backend directory
-env_path = Path(__file__).parent.parent / '.env'
-load_dotenv(dotenv_path=env_path, override=True)
+from app import deadline
+from app.chunk_store import chunk_store
+from app.config import QDRANT_URL, QDRANT_API_KEY, QDRANT_TIMEOUT, env_str, env_float, env_bool
+from app.deadline import SEARCH_TIMEOUT_SECONDS
 
+# qdrant_client is imported lazily on first connection to keep app startup fast
+if TYPE_CHECKING:
+    from qdrant_client import QdrantClient
+
+logger = logging.getLogger(__name__)
+
+# Stable alias the API reads through; it points at one versioned physical collection
+# (book_content_v1, book_content_v2, ...) and is swapped atomically after a reindex
 COLLECTION_NAME = "book_content"
-QDRANT_URL = os.getenv("QDRANT_URL", "https://your-cluster.qdrant.io")
-QDRANT_API_KEY = os.getenv("QDRANT_API_KEY", "")
+VECTOR_SIZE = 768  # Gemini text-embedding-004 dimension
+
+_VERSION_PATTERN = re.compile(rf"^{COLLECTION_NAME}_v(\d+)$")
+
+# Vector quantization, applied when the collection is created: "none", "int8" or "binary".
+# Quantized vectors stay in RAM, full-precision originals move to disk and are only
+# read to rescore the top (limit * oversampling) candidates.
+QDRANT_QUANTIZATION = env_str("QDRANT_QUANTIZATION", "none").lower()
+QDRANT_OVERSAMPLING = env_float("QDRANT_OVERSAMPLING", 2.0)
+QDRANT_RESCORE = env_bool("QDRANT_RESCORE", True)
 
 # Clean up QDRANT_URL - fix common typos
 if QDRANT_URL:
@@ -25,75 +40,170 @@ if QDRANT_URL:
     # Remove quotes
     QDRANT_URL = QDRANT_URL.strip("'\"")
 
-_qdrant_client: Optional[QdrantClient] = None
+_qdrant_client: Optional["QdrantClient"] = None
+_connect_lock = threading.Lock()
 
-async def get_qdrant_client() -> QdrantClient:
-    """Get or create Qdrant client"""
+def connect_qdrant() -> "QdrantClient":
+    """Create the Qdrant client and ensure the collection (blocking; run it off the event loop)"""
     global _qdrant_client
+    with _connect_lock:
+        if _qdrant_client is None:
+            # Validate URL before creating client
+            if not QDRANT_URL or QDRANT_URL == "https://your-cluster.qdrant.io":
+                raise ValueError("QDRANT_URL not configured")
+            
+            try:
+                from qdrant_client import QdrantClient
+                client = QdrantClient(
+                    url=QDRANT_URL,
+                    api_key=QDRANT_API_KEY if QDRANT_API_KEY else None,
+                    timeout=QDRANT_TIMEOUT,
+                )
+                _ensure_collection(client)
+                _qdrant_client = client
+            except Exception as e:
+                logger.error("Error creating Qdrant client: %s", e)
+                raise
+    return _qdrant_client
+
+async def get_qdrant_client() -> "QdrantClient":
+    """Get or create Qdrant client"""
     if _qdrant_client is None:
-        # Validate URL before creating client
-        if not QDRANT_URL or QDRANT_URL == "https://your-cluster.qdrant.io":
-            raise ValueError("QDRANT_URL not configured")
-        
-        try:
-            _qdrant_client = QdrantClient(
-                url=QDRANT_URL,
-                api_key=QDRANT_API_KEY if QDRANT_API_KEY else None,
-            )
-            await ensure_collection()
-        except Exception as e:
-            print(f"Error creating Qdrant client: {e}")
-            raise
+        return connect_qdrant()
     return _qdrant_client
 
 async def ensure_collection():
     """Ensure Qdrant collection exists"""
+    _ensure_collection(_qdrant_client)
+
+def quantization_config():
+    """Qdrant quantization config for QDRANT_QUANTIZATION (None for full float32)"""
+    from qdrant_client import models
+    if QDRANT_QUANTIZATION == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if QDRANT_QUANTIZATION == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+def search_params():
+    """Oversample quantized candidates and rescore them with the original vectors"""
+    if QDRANT_QUANTIZATION not in ("int8", "binary"):
+        return None
+    from qdrant_client import models
+    return models.SearchParams(
+        quantization=models.QuantizationSearchParams(rescore=QDRANT_RESCORE, oversampling=QDRANT_OVERSAMPLING)
+    )
+
+def versioned_name(version: int) -> str:
+    return f"{COLLECTION_NAME}_v{version}"
+
+def collection_versions(client: "QdrantClient") -> List[int]:
+    """Versions of the physical book_content_vN collections, oldest first"""
+    names = (c.name for c in client.get_collections().collections)
+    return sorted(int(m.group(1)) for m in map(_VERSION_PATTERN.match, names) if m)
+
+def alias_target(client: "QdrantClient") -> Optional[str]:
+    """Physical collection the book_content alias points at, if the alias exists"""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == COLLECTION_NAME:
+            return alias.collection_name
+    return None
+
+def create_collection(client: "QdrantClient", name: str):
+    """Create a physical collection with the configured vector params and quantization"""
+    from qdrant_client.models import Distance, VectorParams
+    quantization = quantization_config()
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(
+            size=VECTOR_SIZE,
+            distance=Distance.COSINE,
+            on_disk=quantization is not None
+        ),
+        quantization_config=quantization
+    )
+    logger.info("Created Qdrant collection: %s (quantization: %s)", name, QDRANT_QUANTIZATION)
+
+def swap_alias(client: "QdrantClient", collection_name: str):
+    """Point the alias at collection_name in one atomic alias update"""
+    from qdrant_client import models
+    operations = []
+    if alias_target(client) is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=COLLECTION_NAME)))
+    operations.append(models.CreateAliasOperation(
+        create_alias=models.CreateAlias(collection_name=collection_name, alias_name=COLLECTION_NAME)
+    ))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    logger.info("Alias %s now points at %s", COLLECTION_NAME, collection_name)
+
+def _ensure_collection(client: "QdrantClient"):
+    """Create book_content_v1 behind the alias if there is nothing to read from yet"""
     try:
-        collections = _qdrant_client.get_collections()
-        collection_exists = any(c.name == COLLECTION_NAME for c in collections.collections)
-        
-        if not collection_exists:
-            _qdrant_client.create_collection(
-                collection_name=COLLECTION_NAME,
-                vectors_config=VectorParams(
-                    size=768,  # Gemini text-embedding-004 dimension
-                    distance=Distance.COSINE
-                )
-            )
-            print(f"Created Qdrant collection: {COLLECTION_NAME}")
+        if alias_target(client) is not None:
+            return
+        # Collections seeded before aliases existed are read under the same name
+        collections = client.get_collections()
+        if any(c.name == COLLECTION_NAME for c in collections.collections):
+            return
+        if collection_versions(client):
+            # A first reindex is still running (or died); only the seeder may publish it
+            logger.warning("⚠️  No %s alias yet; finish seeding to publish a collection", COLLECTION_NAME)
+            return
+        create_collection(client, versioned_name(1))
+        swap_alias(client, versioned_name(1))
     except Exception as e:
-        print(f"Error ensuring collection: {e}")
+        logger.error("Error ensuring collection: %s", e)
 
 async def search_vectors(
-    client: QdrantClient,
+    client: "QdrantClient",
     query_vector: List[float],
     limit: int = 5
 ) -> List[Dict]:
-    """Search for similar vectors in Qdrant"""
+    """Search for similar vectors in Qdrant; chunk text is resolved from the chunk store"""
     try:
-        results = client.search(
+        results = await deadline.run_blocking(
+            client.search,
             collection_name=COLLECTION_NAME,
             query_vector=query_vector,
             limit=limit,
-            with_payload=True
+            # Text comes from the chunk store, so only the fields the hits carry are transferred
+            with_payload=["module", "section"],
+            search_params=search_params(),
+            stage="search",
+            cap=SEARCH_TIMEOUT_SECONDS
         )
         
-        return [
+        hits = [
             {
-                "text": result.payload.get("text", ""),
                 "score": result.score,
                 "id": str(result.id),
-                "module": result.payload.get("module"),
-                "section": result.payload.get("section")
+                "module": (result.payload or {}).get("module"),
+                "section": (result.payload or {}).get("section")
             }
             for result in results
         ]
     except Exception as e:
-        print(f"Error searching vectors: {e}")
+        logger.error("Error searching vectors: %s", e)
         return []
 
+    async def payload_texts(ids: List[str]) -> Dict[str, str]:
+        # Only for points seeded before content_chunks existed, which still carry their text
+        points = await deadline.run_blocking(
+            client.retrieve,
+            collection_name=COLLECTION_NAME,
+            ids=ids,
+            with_payload=["text"],
+            stage="search",
+            cap=SEARCH_TIMEOUT_SECONDS
+        )
+        return {str(point.id): point.payload["text"] for point in points if point.payload and point.payload.get("text")}
+
+    return await chunk_store.resolve(hits, payload_texts)
+
 async def add_vector(
-    client: QdrantClient,
+    client: "QdrantClient",
     vector_id: str,
     vector: List[float],
     payload: Dict
@@ -111,6 +221,6 @@ async def add_vector(
             ]
         )
     except Exception as e:
-        print(f"Error adding vector: {e}")
+        logger.error("Error adding vector: %s", e)
         raise
 
@@ -0,0 +1,79 @@
+from collections import OrderedDict
+from typing import Optional
+
+from fastapi import Depends, Request
+from starlette.requests import HTTPConnection
+
+from app import metrics
+from app.auth import get_current_user_optional
+from app.config import env_int
+from app.scheduler import RateLimited, TokenBucket
+
+# Per-client fairness limits (requests per minute, burst)
+CHAT_RPM_PER_USER = env_int("CHAT_RPM_PER_USER", 10)
+CHAT_RPM_PER_IP = env_int("CHAT_RPM_PER_IP", 20)
+TRANSLATE_RPM_PER_USER = env_int("TRANSLATE_RPM_PER_USER", 30)
+TRANSLATE_RPM_PER_IP = env_int("TRANSLATE_RPM_PER_IP", 60)
+RATE_LIMIT_MAX_CLIENTS = env_int("RATE_LIMIT_MAX_CLIENTS", 10000)
+# Proxies in front of the app that append to X-Forwarded-For; 0 ignores the header entirely
+TRUSTED_PROXY_HOPS = max(0, env_int("TRUSTED_PROXY_HOPS", 1))
+
+class ClientRateLimiter:
+    """Per-key token buckets with LRU eviction of idle clients"""
+
+    def __init__(self, per_minute: int, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.per_minute = per_minute
+        self.max_clients = max_clients
+        self.buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+
+    def check(self, key: str) -> float:
+        """Consume one request for key; returns 0.0 if allowed, else seconds to wait"""
+        if self.per_minute <= 0:
+            return 0.0
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = self.buckets[key] = TokenBucket(self.per_minute, self.per_minute / 60.0)
+            if len(self.buckets) > self.max_clients:
+                self.buckets.popitem(last=False)
+        else:
+            self.buckets.move_to_end(key)
+        return bucket.try_take()
+
+_limiters = {
+    "chat": (ClientRateLimiter(CHAT_RPM_PER_USER), ClientRateLimiter(CHAT_RPM_PER_IP)),
+    "translate": (ClientRateLimiter(TRANSLATE_RPM_PER_USER), ClientRateLimiter(TRANSLATE_RPM_PER_IP)),
+}
+
+def client_ip(request: HTTPConnection, trusted_hops: int = TRUSTED_PROXY_HOPS) -> str:
+    """Client IP as seen by the outermost trusted proxy.
+
+    Each proxy appends the address it received the request from, so only the last
+    trusted_hops entries of X-Forwarded-For are reliable; anything left of them is
+    client-supplied and would let a caller pick a fresh rate-limit bucket per request.
+    """
+    forwarded = request.headers.get("x-forwarded-for")
+    if forwarded and trusted_hops:
+        hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+        if hops:
+            return hops[-min(trusted_hops, len(hops))]
+    return request.client.host if request.client else "unknown"
+
+def check_limits(scope: str, ip: str, current_user: Optional[dict]):
+    """Consume one request from the IP's and the user's buckets; raises RateLimited when either is empty"""
+    user_limiter, ip_limiter = _limiters[scope]
+    wait = ip_limiter.check(ip)
+    if not wait and current_user and current_user.get("id"):
+        wait = user_limiter.check(str(current_user["id"]))
+    if wait:
+        metrics.incr(f"rate_limit.{scope}.rejected")
+        raise RateLimited(f"Too many {scope} requests, please slow down", retry_after=wait)
+
+def limit_requests(scope: str):
+    """FastAPI dependency enforcing per-user and per-IP fairness limits for an endpoint"""
+    async def dependency(
+        request: Request,
+        current_user: Optional[dict] = Depends(get_current_user_optional)
+    ):
+        check_limits(scope, client_ip(request), current_user)
+
+    return dependency
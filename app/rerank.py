@@ -0,0 +1,99 @@
+import re
+import time
+from collections import Counter
+from typing import Dict, List, TYPE_CHECKING
+
+from app import metrics
+from app.config import env_bool, env_float, env_int
+
+# numpy is imported on first rerank, not when app.main loads
+if TYPE_CHECKING:
+    import numpy as np
+
+# Candidates fetched from the vector store before reranking
+RETRIEVAL_CANDIDATES = env_int("RETRIEVAL_CANDIDATES", 20)
+RERANK_ENABLED = env_bool("RERANK_ENABLED", True)
+# Chunks kept for the prompt: at most RERANK_TOP_K, and no more than RERANK_CONTEXT_CHARS in total
+RERANK_TOP_K = env_int("RERANK_TOP_K", 5)
+RERANK_CONTEXT_CHARS = env_int("RERANK_CONTEXT_CHARS", 5000)
+# Feature weights (vector similarity, BM25, query-term coverage)
+RERANK_VECTOR_WEIGHT = env_float("RERANK_VECTOR_WEIGHT", 0.5)
+RERANK_BM25_WEIGHT = env_float("RERANK_BM25_WEIGHT", 0.35)
+RERANK_COVERAGE_WEIGHT = env_float("RERANK_COVERAGE_WEIGHT", 0.15)
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_TOKEN = re.compile(r"[a-z0-9][a-z0-9_+\-]*")
+_STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from how i in is it of on or the this "
+    "to what when where which who why with you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords"""
+    return [t for t in _TOKEN.findall((text or "").lower()) if t not in _STOPWORDS]
+
+def _min_max(values: "np.ndarray") -> "np.ndarray":
+    import numpy as np
+    spread = values.max() - values.min() if len(values) else 0.0
+    if spread <= 1e-12:
+        return np.ones_like(values) if len(values) and values.max() > 0 else np.zeros_like(values)
+    return (values - values.min()) / spread
+
+def score_candidates(query: str, candidates: List[Dict]) -> "np.ndarray":
+    """Combined rerank score for every candidate (higher is better)"""
+    import numpy as np
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    vector_scores = np.array([float(c.get("score") or 0.0) for c in candidates], dtype=np.float32)
+    if not query_terms:
+        return vector_scores
+
+    # Term-frequency matrix [candidates x query terms]; IDF is taken over the candidate set
+    counts = [Counter(tokenize(c.get("text", ""))) for c in candidates]
+    tf = np.array([[doc[t] for t in query_terms] for doc in counts], dtype=np.float32)
+    lengths = np.array([sum(doc.values()) for doc in counts], dtype=np.float32)
+    n = len(candidates)
+    df = (tf > 0).sum(axis=0)
+    idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))
+    bm25 = ((tf * (BM25_K1 + 1)) / (tf + norm[:, None]) * idf).sum(axis=1)
+    coverage = (tf > 0).mean(axis=1)
+
+    return (
+        RERANK_VECTOR_WEIGHT * _min_max(vector_scores)
+        + RERANK_BM25_WEIGHT * _min_max(bm25)
+        + RERANK_COVERAGE_WEIGHT * coverage
+    )
+
+def rerank(
+    query: str,
+    candidates: List[Dict],
+    top_k: int = RERANK_TOP_K,
+    max_chars: int = RERANK_CONTEXT_CHARS
+) -> List[Dict]:
+    """Reorder candidates by local features and keep the best that fit the context budget"""
+    if not candidates:
+        return []
+    started = time.perf_counter()
+    if RERANK_ENABLED:
+        import numpy as np
+        scores = score_candidates(query, candidates)
+        order = np.argsort(-scores, kind="stable")
+        ranked = [dict(candidates[i], rerank_score=float(scores[i])) for i in order]
+    else:
+        ranked = list(candidates)
+
+    selected: List[Dict] = []
+    used = 0
+    for candidate in ranked:
+        size = len(candidate.get("text", ""))
+        # Always keep the best chunk, then only what fits
+        if selected and used + size > max_chars:
+            continue
+        selected.append(candidate)
+        used += size
+        if len(selected) >= top_k:
+            break
+    metrics.observe("rerank.latency", time.perf_counter() - started)
+    return selected
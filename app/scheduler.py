@@ -0,0 +1,193 @@
+import asyncio
+import logging
+import math
+import re
+import time
+from typing import Dict, Optional, Tuple
+
+from app import deadline, metrics
+from app.config import WEB_CONCURRENCY, env_int, env_float, env_str
+from app.shared_cache import get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+# Gemini free tier (see RATE_LIMIT_GUIDE.md): 15 requests and 1M input tokens per minute, per model
+DEFAULT_RPM = env_int("GEMINI_DEFAULT_RPM", 15)
+DEFAULT_TPM = env_int("GEMINI_DEFAULT_TPM", 1_000_000)
+
+# Per-model overrides of (RPM, TPM)
+MODEL_QUOTAS: Dict[str, Tuple[int, int]] = {
+    "gemini-3-pro-preview": (5, 250_000),
+    "gemini-2.5-flash": (10, 250_000),
+    "models/text-embedding-004": (1500, 1_000_000),
+}
+
+# Extra overrides from the environment, e.g. GEMINI_QUOTAS="gemini-2.0-flash=30:1000000,gemini-pro=2:32000"
+for _entry in filter(None, env_str("GEMINI_QUOTAS").split(",")):
+    try:
+        _model, _limits = _entry.split("=", 1)
+        _rpm, _tpm = _limits.split(":", 1)
+        MODEL_QUOTAS[_model.strip()] = (int(_rpm), int(_tpm))
+    except ValueError:
+        logger.warning("⚠️  Ignoring malformed GEMINI_QUOTAS entry: %s", _entry)
+
+# Calls waiting for quota on one model before new ones are turned away with 503
+MAX_QUEUE_DEPTH = env_int("SCHEDULER_MAX_QUEUE_DEPTH", 20)
+# Longest a call may wait for quota when the caller gives no deadline
+MAX_WAIT_SECONDS = env_float("SCHEDULER_MAX_WAIT", 10.0)
+# Cooldown after an upstream 429 that did not say how long to back off
+DEFAULT_COOLDOWN_SECONDS = env_float("SCHEDULER_COOLDOWN", 30.0)
+
+_RETRY_DELAY_PATTERNS = (
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)"),
+    re.compile(r"retry in\s*([\d.]+)\s*s", re.IGNORECASE),
+)
+
+class RateLimited(Exception):
+    """Request rejected before doing upstream work; maps to 429 (or 503) with Retry-After"""
+
+    def __init__(self, detail: str, retry_after: float, status_code: int = 429):
+        super().__init__(detail)
+        self.detail = detail
+        self.retry_after = retry_after
+        self.status_code = status_code
+
+    @property
+    def headers(self):
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+class TokenBucket:
+    """Token bucket that hands out reservations (the balance may go negative)"""
+
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = capacity
+        self.per_second = per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float = 1.0) -> float:
+        """Seconds until `amount` tokens would be available (0.0 if available now)"""
+        self._refill(time.monotonic())
+        missing = amount - self.tokens
+        if missing <= 0:
+            return 0.0
+        if self.per_second <= 0:
+            return math.inf
+        return missing / self.per_second
+
+    def reserve(self, amount: float = 1.0):
+        """Take `amount` tokens now; callers wait out the debt via wait_time()"""
+        self._refill(time.monotonic())
+        self.tokens -= amount
+
+    def try_take(self, amount: float = 1.0) -> float:
+        """Take tokens if available; otherwise return the seconds to wait"""
+        wait = self.wait_time(amount)
+        if wait == 0.0:
+            self.tokens -= amount
+        return wait
+
+def estimate_tokens(text: str) -> int:
+    """Rough input-token estimate (~4 characters per token)"""
+    return max(1, len(text or "") // 4)
+
+def is_quota_error(error: Exception) -> bool:
+    """True for upstream 429 / ResourceExhausted errors from either SDK"""
+    message = str(error)
+    return "429" in message or "RESOURCE_EXHAUSTED" in message or type(error).__name__ == "ResourceExhausted"
+
+def retry_after_from_error(error: Exception) -> float:
+    """Backoff suggested by an upstream 429, or the default cooldown"""
+    message = str(error)
+    for pattern in _RETRY_DELAY_PATTERNS:
+        match = pattern.search(message)
+        if match:
+            return float(match.group(1))
+    return DEFAULT_COOLDOWN_SECONDS
+
+class ModelQuota:
+    """Request and token buckets plus queue/cooldown state for one model"""
+
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = TokenBucket(max(1.0, rpm), rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.queued = 0
+        self.blocked_until = 0.0
+
+class UpstreamScheduler:
+    """Admission control for all Gemini calls, keyed by model"""
+
+    def __init__(self):
+        self.models: Dict[str, ModelQuota] = {}
+
+    def _quota(self, model: str) -> ModelQuota:
+        quota = self.models.get(model)
+        if quota is None:
+            rpm, tpm = MODEL_QUOTAS.get(model, (DEFAULT_RPM, DEFAULT_TPM))
+            # Quotas are per API key, so each worker process gets an equal share
+            quota = self.models[model] = ModelQuota(rpm / WEB_CONCURRENCY, tpm / WEB_CONCURRENCY)
+        return quota
+
+    def wait_time(self, model: str, tokens: int = 0) -> float:
+        """Seconds until a call to model could start"""
+        quota = self._quota(model)
+        cooldown = max(0.0, quota.blocked_until - time.monotonic(), self._shared_cooldown(model))
+        tokens = min(tokens, quota.tokens.capacity)
+        return max(cooldown, quota.requests.wait_time(1), quota.tokens.wait_time(tokens))
+
+    async def acquire(self, model: str, tokens: int = 0, timeout: Optional[float] = None):
+        """Wait for quota on model, or raise RateLimited if it cannot start within timeout"""
+        budget = deadline.budget(MAX_WAIT_SECONDS) if timeout is None else timeout
+        quota = self._quota(model)
+        wait = self.wait_time(model, tokens)
+        if wait > budget:
+            metrics.incr(f"scheduler.{model}.rejected")
+            raise RateLimited(f"Quota for {model} exhausted", retry_after=wait)
+        if wait > 0 and quota.queued >= MAX_QUEUE_DEPTH:
+            metrics.incr(f"scheduler.{model}.overloaded")
+            raise RateLimited(f"Too many queued requests for {model}", retry_after=wait, status_code=503)
+
+        # Reserve now so later callers queue behind us
+        quota.requests.reserve(1)
+        quota.tokens.reserve(min(tokens, quota.tokens.capacity))
+        metrics.incr(f"scheduler.{model}.admitted")
+        if wait > 0:
+            metrics.observe("scheduler.queue_wait", wait)
+            quota.queued += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                quota.queued -= 1
+
+    @staticmethod
+    def _shared_cooldown(model: str) -> float:
+        """Cooldown another worker set after an upstream 429"""
+        if WEB_CONCURRENCY == 1:
+            return 0.0
+        return max(0.0, get_shared_cache().get("quota.cooldown", model, 0.0) - time.time())
+
+    def penalize(self, model: str, seconds: float):
+        """Stop admitting calls to model for a while (after an upstream 429), in every worker"""
+        quota = self._quota(model)
+        quota.blocked_until = max(quota.blocked_until, time.monotonic() + seconds)
+        if WEB_CONCURRENCY > 1:
+            get_shared_cache().set("quota.cooldown", model, time.time() + seconds, ttl=seconds)
+        metrics.incr(f"scheduler.{model}.upstream_429")
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        return {
+            model: {
+                "queued": quota.queued,
+                "requests_available": round(quota.requests.tokens, 2),
+                "tokens_available": round(quota.tokens.tokens),
+                "cooldown": round(max(0.0, quota.blocked_until - now), 1),
+            }
+            for model, quota in self.models.items()
+        }
+
+scheduler = UpstreamScheduler()
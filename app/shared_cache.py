@@ -0,0 +1,215 @@
+import json
+import logging
+from abc import ABC, abstractmethod
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from app.config import WEB_CONCURRENCY, env_int, env_str
+
+logger = logging.getLogger(__name__)
+
+# "memory" (this process only) or "sqlite" (shared by every worker on the host).
+# Multi-worker deployments default to sqlite so caches and breaker state are not duplicated.
+SHARED_CACHE = env_str("SHARED_CACHE", "sqlite" if WEB_CONCURRENCY > 1 else "memory").lower()
+SHARED_CACHE_PATH = env_str("SHARED_CACHE_PATH", str(Path(tempfile.gettempdir()) / "ai-book-cache.sqlite3"))
+# Entries kept per namespace by the memory backend
+SHARED_CACHE_MAX_ENTRIES = env_int("SHARED_CACHE_MAX_ENTRIES", 10000)
+# The sqlite backend deletes expired rows once every this many writes
+SQLITE_PURGE_EVERY = 1000
+
+class SharedCache(ABC):
+    """Namespaced key/value cache with per-entry TTLs; values must be JSON-serializable.
+
+    Cache failures are logged and treated as misses, never raised to callers.
+    """
+
+    backend = "none"
+
+    @abstractmethod
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        ...
+
+    @abstractmethod
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        ...
+
+    @abstractmethod
+    def delete(self, namespace: str, key: str):
+        ...
+
+    @abstractmethod
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        """Atomically add to an integer counter (created at 0) and return the new value"""
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend}
+
+class MemoryCache(SharedCache):
+    """Per-process LRU cache; the default for a single worker"""
+
+    backend = "memory"
+
+    def __init__(self, max_entries: int = SHARED_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.namespaces: Dict[str, "OrderedDict[str, Tuple[str, Optional[float]]]"] = {}
+        self._lock = threading.Lock()
+
+    def _entries(self, namespace: str) -> "OrderedDict[str, Tuple[str, Optional[float]]]":
+        return self.namespaces.setdefault(namespace, OrderedDict())
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entries = self._entries(namespace)
+            entry = entries.get(key)
+            if entry is None:
+                return default
+            if entry[1] is not None and entry[1] <= time.time():
+                del entries[key]
+                return default
+            entries.move_to_end(key)
+        # Stored serialized, so callers never share (and mutate) one object
+        return json.loads(entry[0])
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        expires = time.time() + ttl if ttl else None
+        raw = json.dumps(value)
+        with self._lock:
+            entries = self._entries(namespace)
+            entries[key] = (raw, expires)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def delete(self, namespace: str, key: str):
+        with self._lock:
+            self._entries(namespace).pop(key, None)
+
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        with self._lock:
+            entries = self._entries(namespace)
+            entry = entries.get(key)
+            current = 0
+            expires = time.time() + ttl if ttl else None
+            if entry is not None and (entry[1] is None or entry[1] > time.time()):
+                current, expires = json.loads(entry[0]), entry[1]
+            entries[key] = (json.dumps(current + amount), expires)
+            return current + amount
+
+    def stats(self) -> Dict:
+        return {"backend": self.backend, "entries": {ns: len(e) for ns, e in self.namespaces.items()}}
+
+class SqliteCache(SharedCache):
+    """SQLite (WAL mode) file shared by all worker processes on one host"""
+
+    backend = "sqlite"
+
+    def __init__(self, path: str = SHARED_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                " namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL,"
+                " PRIMARY KEY (namespace, key))"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # One connection per thread; WAL lets readers run alongside a writer in another process
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, namespace: str, key: str, default: Any = None) -> Any:
+        try:
+            row = self._connect().execute(
+                "SELECT value FROM cache WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, time.time())
+            ).fetchone()
+        except sqlite3.Error as e:
+            logger.warning("Shared cache read failed: %s", e)
+            return default
+        return json.loads(row[0]) if row else default
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[float] = None):
+        try:
+            conn = self._connect()
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value), time.time() + ttl if ttl else None)
+            )
+            self._writes += 1
+            if self._writes % SQLITE_PURGE_EVERY == 0:
+                conn.execute("DELETE FROM cache WHERE expires_at <= ?", (time.time(),))
+        except sqlite3.Error as e:
+            logger.warning("Shared cache write failed: %s", e)
+
+    def delete(self, namespace: str, key: str):
+        try:
+            self._connect().execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (namespace, key))
+        except sqlite3.Error as e:
+            logger.warning("Shared cache delete failed: %s", e)
+
+    def incr(self, namespace: str, key: str, amount: int = 1, ttl: Optional[float] = None) -> int:
+        conn = self._connect()
+        now = time.time()
+        try:
+            # BEGIN IMMEDIATE takes the write lock up front, so concurrent workers serialize here
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?"
+                    " AND (expires_at IS NULL OR expires_at > ?)",
+                    (namespace, key, now)
+                ).fetchone()
+                value = (json.loads(row[0]) if row else 0) + amount
+                expires = row[1] if row else (now + ttl if ttl else None)
+                conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                    (namespace, key, json.dumps(value), expires)
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            logger.warning("Shared cache increment failed: %s", e)
+            return amount
+        return value
+
+    def stats(self) -> Dict:
+        try:
+            rows = self._connect().execute(
+                "SELECT namespace, COUNT(*) FROM cache WHERE expires_at IS NULL OR expires_at > ? GROUP BY namespace",
+                (time.time(),)
+            ).fetchall()
+        except sqlite3.Error:
+            rows = []
+        return {"backend": self.backend, "path": self.path, "entries": dict(rows)}
+
+_shared_cache: Optional[SharedCache] = None
+_cache_lock = threading.Lock()
+
+def get_shared_cache() -> SharedCache:
+    """The process-wide cache backend selected by SHARED_CACHE"""
+    global _shared_cache
+    if _shared_cache is None:
+        with _cache_lock:
+            if _shared_cache is None:
+                if SHARED_CACHE == "sqlite":
+                    try:
+                        _shared_cache = SqliteCache(SHARED_CACHE_PATH)
+                    except sqlite3.Error as e:
+                        logger.warning("⚠️  Could not open shared cache at %s, using memory: %s", SHARED_CACHE_PATH, e)
+                if _shared_cache is None:
+                    _shared_cache = MemoryCache()
+    return _shared_cache
@@ -0,0 +1,82 @@
+import asyncio
+import time
+from typing import Callable, Dict
+
+from app.config import STARTUP_DB_TIMEOUT, STARTUP_QDRANT_TIMEOUT
+
+# Phase name -> {"status": "pending" | "ready" | "failed" | "timeout", "seconds": float, ...}
+startup_report: Dict[str, Dict] = {}
+
+def record_phase(name: str, status: str, seconds: float, error: str = None):
+    """Record how a startup phase went"""
+    entry = {"status": status, "seconds": round(seconds, 3)}
+    if error:
+        entry["error"] = error
+    startup_report[name] = entry
+
+def _init_database():
+    """Create tables (imports SQLAlchemy on first use)"""
+    from app.database import create_tables
+    create_tables()
+
+def _init_chunks():
+    """Preload chunk text from content_chunks"""
+    from app.chunk_store import chunk_store
+    chunk_store.load()
+
+async def _init_database_and_chunks():
+    """Chunks can only be preloaded once the tables exist"""
+    await _run_phase("database", _init_database, STARTUP_DB_TIMEOUT)
+    if startup_report["database"]["status"] == "ready":
+        await _run_phase("chunks", _init_chunks, STARTUP_DB_TIMEOUT)
+
+def _init_qdrant():
+    """Connect to Qdrant and ensure the collection exists"""
+    from app.qdrant_client import connect_qdrant
+    connect_qdrant()
+
+def _run_blocking_phase(name: str, func: Callable[[], None]):
+    """Run a blocking init function in a worker thread and record its outcome"""
+    started = time.perf_counter()
+    try:
+        func()
+        record_phase(name, "ready", time.perf_counter() - started)
+    except Exception as e:
+        record_phase(name, "failed", time.perf_counter() - started, str(e))
+
+async def _run_phase(name: str, func: Callable[[], None], timeout: float):
+    """Run one backend phase with a timeout; a late success still updates the report"""
+    started = time.perf_counter()
+    record_phase(name, "pending", 0.0)
+    try:
+        await asyncio.wait_for(asyncio.to_thread(_run_blocking_phase, name, func), timeout)
+    except asyncio.TimeoutError:
+        # The worker thread keeps going and overwrites this entry when it finishes
+        record_phase(name, "timeout", time.perf_counter() - started, f"not ready after {timeout}s")
+
+async def initialize_backends():
+    """Initialize the database (then the chunk cache) and Qdrant concurrently"""
+    started = time.perf_counter()
+    await asyncio.gather(
+        _init_database_and_chunks(),
+        _run_phase("qdrant", _init_qdrant, STARTUP_QDRANT_TIMEOUT),
+    )
+    record_phase("backends", "ready", time.perf_counter() - started)
+
+def is_ready() -> bool:
+    """Startup has finished once no backend phase is still pending"""
+    return bool(startup_report) and all(
+        phase["status"] not in ("pending", "timeout") for phase in startup_report.values()
+    )
+
+def is_degraded() -> bool:
+    """True if any backend failed to initialize"""
+    return any(phase["status"] != "ready" for phase in startup_report.values())
+
+def format_report() -> str:
+    """One line per startup phase, for the startup log"""
+    return "\n".join(
+        f"   {name:<10} {phase['status']:<8} {phase['seconds']:.3f}s"
+        + (f"  ({phase['error']})" if phase.get("error") else "")
+        for name, phase in startup_report.items()
+    )
@@ -1,24 +1,80 @@
+from app.config import env_int
 from app.database import Translation, SessionLocal
+from app.shared_cache import get_shared_cache
 from app.openai_client import translate_text as openai_translate
 from sqlalchemy import and_
-from typing import Optional
+from typing import Dict, Iterable, List, Optional, Set
+import hashlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Translations served from the shared cache before touching Postgres
+TRANSLATION_CACHE_TTL = env_int("TRANSLATION_CACHE_TTL", 24 * 3600)
+
+def _cache_key(text_hash: str, language: str) -> str:
+    return f"{language}:{text_hash}"
+
+def hash_text(text: str) -> str:
+    """Cache key for a source text (sha256 hex of its UTF-8 bytes)"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _insert_new(db, rows: List[Dict]) -> int:
+    """Insert translation rows, skipping (language, text_hash) pairs already stored; returns rows inserted.
+
+    The first translation stored for a text wins, so GET /api/translate/{text_hash},
+    which is served as immutable, always returns the same row.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(Translation).values(rows).on_conflict_do_nothing(index_elements=["language", "text_hash"])
+    return db.execute(statement).rowcount
 
 async def get_cached_translation(original_text: str, language: str) -> Optional[str]:
-    """Get cached translation from database"""
+    """Get cached translation (shared cache first, then database)"""
+    text_hash = hash_text(original_text)
+    shared = get_shared_cache().get("translation", _cache_key(text_hash, language))
+    if shared is not None:
+        return shared
     if SessionLocal is None:
         return None
     db = SessionLocal()
     try:
-        translation = db.query(Translation).filter(
+        translation = db.query(Translation.translated_text).filter(
             and_(
-                Translation.original_text == original_text,
+                Translation.text_hash == text_hash,
                 Translation.language == language
             )
         ).first()
+        if translation:
+            get_shared_cache().set("translation", _cache_key(text_hash, language), translation.translated_text, ttl=TRANSLATION_CACHE_TTL)
         return translation.translated_text if translation else None
     except Exception as e:
-        print(f"Error getting cached translation: {e}")
+        logger.error("Error getting cached translation: %s", e)
+        return None
+    finally:
+        db.close()
+
+async def get_translation_by_hash(text_hash: str, language: str) -> Optional[str]:
+    """Cached translation addressed by source-text hash (shared cache first, then database)"""
+    shared = get_shared_cache().get("translation", _cache_key(text_hash, language))
+    if shared is not None:
+        return shared
+    if SessionLocal is None:
         return None
+    db = SessionLocal()
+    try:
+        translation = db.query(Translation.translated_text).filter(
+            and_(
+                Translation.text_hash == text_hash,
+                Translation.language == language
+            )
+        ).first()
+        if translation:
+            get_shared_cache().set("translation", _cache_key(text_hash, language), translation.translated_text, ttl=TRANSLATION_CACHE_TTL)
+        return translation.translated_text if translation else None
     finally:
         db.close()
 
@@ -28,23 +84,108 @@ async def cache_translation(
     language: str,
     module: Optional[str] = None
 ):
-    """Cache translation in database"""
+    """Cache translation in database (an existing translation of the same text is kept)"""
+    text_hash = hash_text(original_text)
+    get_shared_cache().set("translation", _cache_key(text_hash, language), translated_text, ttl=TRANSLATION_CACHE_TTL)
     if SessionLocal is None:
         return
     db = SessionLocal()
     try:
         import uuid
-        translation = Translation(
-            id=str(uuid.uuid4()),
-            original_text=original_text,
-            translated_text=translated_text,
-            language=language,
-            module=module
-        )
-        db.add(translation)
+        inserted = _insert_new(db, [{
+            "id": str(uuid.uuid4()),
+            "original_text": original_text,
+            "translated_text": translated_text,
+            "language": language,
+            "module": module,
+            "text_hash": text_hash,
+        }])
         db.commit()
+        if not inserted:
+            # Lost to an earlier translation: let the next read load the stored one
+            get_shared_cache().delete("translation", _cache_key(text_hash, language))
     except Exception as e:
-        print(f"Error caching translation: {e}")
+        logger.error("Error caching translation: %s", e)
+        db.rollback()
+    finally:
+        db.close()
+
+async def get_cached_hashes(language: str, hashes: Iterable[str]) -> Set[str]:
+    """Which of these text hashes already have a cached translation"""
+    if SessionLocal is None:
+        return set()
+    hashes = list(hashes)
+    found: Set[str] = set()
+    db = SessionLocal()
+    try:
+        # Chunk the IN list so huge books don't build a single enormous query
+        for start in range(0, len(hashes), 500):
+            rows = db.query(Translation.text_hash).filter(
+                Translation.language == language,
+                Translation.text_hash.in_(hashes[start:start + 500])
+            ).all()
+            found.update(row.text_hash for row in rows)
+        return found
+    finally:
+        db.close()
+
+async def get_cached_translations(texts: Iterable[str], language: str) -> Dict[str, str]:
+    """Cached translations of many texts, keyed by text hash (shared cache first, then one database pass)"""
+    cache = get_shared_cache()
+    found: Dict[str, str] = {}
+    missing: List[str] = []
+    for text_hash in dict.fromkeys(hash_text(text) for text in texts):
+        shared = cache.get("translation", _cache_key(text_hash, language))
+        if shared is not None:
+            found[text_hash] = shared
+        else:
+            missing.append(text_hash)
+    if SessionLocal is None or not missing:
+        return found
+    db = SessionLocal()
+    try:
+        for start in range(0, len(missing), 500):
+            rows = db.query(Translation.text_hash, Translation.translated_text).filter(
+                Translation.language == language,
+                Translation.text_hash.in_(missing[start:start + 500])
+            ).all()
+            for row in rows:
+                found[row.text_hash] = row.translated_text
+                cache.set("translation", _cache_key(row.text_hash, language), row.translated_text, ttl=TRANSLATION_CACHE_TTL)
+        return found
+    except Exception as e:
+        logger.error("Error getting cached translations: %s", e)
+        return found
+    finally:
+        db.close()
+
+async def bulk_cache_translations(entries: List[Dict], language: str):
+    """Insert many translations in one transaction, skipping texts that are already cached.
+
+    Each entry needs original_text and translated_text, and may carry module.
+    """
+    if SessionLocal is None or not entries:
+        return
+    import uuid
+    by_hash: Dict[str, Dict] = {}
+    for entry in entries:
+        text_hash = hash_text(entry["original_text"])
+        by_hash.setdefault(text_hash, {
+            "id": str(uuid.uuid4()),
+            "original_text": entry["original_text"],
+            "translated_text": entry["translated_text"],
+            "language": language,
+            "module": entry.get("module"),
+            "text_hash": text_hash,
+        })
+    rows = list(by_hash.values())
+    db = SessionLocal()
+    try:
+        for start in range(0, len(rows), 500):
+            _insert_new(db, rows[start:start + 500])
+        db.commit()
+    except Exception:
         db.rollback()
+        raise
     finally:
         db.close()
@@ -0,0 +1,308 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Path, Response
+from fastapi.responses import StreamingResponse
+
+from app import metrics
+from app.config import env_float, env_int
+from app.deadline import TRANSLATE_DEADLINE_SECONDS, deadline_scope
+from app.models import TranslateJob, TranslateRequest
+from app.openai_client import translate_text
+from app.rate_limit import limit_requests
+from app.scheduler import RateLimited
+from app.shared_cache import get_shared_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Jobs translated concurrently by this worker process; each job's segments run one after another
+TRANSLATE_JOB_WORKERS = env_int("TRANSLATE_JOB_WORKERS", 2)
+# Jobs waiting for a free worker before new submissions get 503
+TRANSLATE_JOB_QUEUE = env_int("TRANSLATE_JOB_QUEUE", 100)
+# Uncached paragraphs are packed into segments of up to this many characters (one Gemini call each)
+TRANSLATE_JOB_SEGMENT_CHARS = env_int("TRANSLATE_JOB_SEGMENT_CHARS", 6000)
+TRANSLATE_JOB_ATTEMPTS = max(1, env_int("TRANSLATE_JOB_ATTEMPTS", 3))
+# Job records live in the shared cache, so any worker can answer polls
+TRANSLATE_JOB_TTL = env_int("TRANSLATE_JOB_TTL", 24 * 3600)
+TRANSLATE_JOB_POLL_INTERVAL = env_float("TRANSLATE_JOB_POLL_INTERVAL", 0.5)
+# Comment lines sent on quiet event streams so proxies keep them open
+TRANSLATE_JOB_KEEPALIVE = env_float("TRANSLATE_JOB_KEEPALIVE", 15.0)
+
+# app.translation (and with it SQLAlchemy) is imported where it is used, as in app.main
+JOB_ID_PATTERN = "^[0-9a-f]{32}$"
+TERMINAL = ("completed", "failed")
+
+def split_paragraphs(text: str) -> List[str]:
+    """Blank-line separated blocks, as the frontend (and scripts/pretranslate.py --granularity paragraph) sends them"""
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
+
+def plan_segments(paragraphs: List[str], cached: Dict[str, str]) -> List[Dict]:
+    """Cached paragraphs become filled-in segments; runs of uncached ones are packed into pending segments"""
+    from app.translation import hash_text
+    segments: List[Dict] = []
+    run: List[str] = []
+
+    def flush():
+        if run:
+            segments.append({"status": "pending", "source": "\n\n".join(run), "paragraphs": list(run), "translated_text": None})
+            run.clear()
+
+    for paragraph in paragraphs:
+        translated = cached.get(hash_text(paragraph))
+        if translated is not None:
+            flush()
+            segments.append({"status": "cached", "source": paragraph, "translated_text": translated})
+            continue
+        if run and sum(len(p) + 2 for p in run) + len(paragraph) > TRANSLATE_JOB_SEGMENT_CHARS:
+            flush()
+        run.append(paragraph)
+    flush()
+    for index, segment in enumerate(segments):
+        segment["index"] = index
+    return segments
+
+class TranslationJob:
+    """One submitted text; its record (without source text) is mirrored to the shared cache"""
+
+    def __init__(self, text: str, language: str, module: Optional[str], segments: List[Dict]):
+        from app.translation import hash_text
+        self.id = uuid.uuid4().hex
+        self.text = text
+        self.text_hash = hash_text(text)
+        self.language = language
+        self.module = module
+        self.segments = segments
+        self.status = "queued"
+        self.translated_text: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+
+    def record(self) -> Dict:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "language": self.language,
+            "text_hash": self.text_hash,
+            "segments_total": len(self.segments),
+            "segments_done": sum(1 for s in self.segments if s["status"] in ("cached", "done")),
+            "segments_failed": sum(1 for s in self.segments if s["status"] == "failed"),
+            "segments": [
+                {"index": s["index"], "status": s["status"], "translated_text": s["translated_text"]}
+                for s in self.segments
+            ],
+            "translated_text": self.translated_text,
+            "error": self.error,
+            "created_at": self.created_at,
+        }
+
+    def save(self):
+        get_shared_cache().set("translate_job", self.id, self.record(), ttl=TRANSLATE_JOB_TTL)
+
+    async def finish(self):
+        """Complete the job if every segment has a translation, caching the whole text too"""
+        from app.translation import cache_translation
+        failed = [s for s in self.segments if s["status"] == "failed"]
+        if failed:
+            self.status = "failed"
+            self.error = self.error or f"{len(failed)} of {len(self.segments)} segments could not be translated"
+        else:
+            self.translated_text = "\n\n".join(s["translated_text"] for s in self.segments)
+            await cache_translation(self.text, self.translated_text, self.language, self.module)
+            self.status = "completed"
+        metrics.incr(f"translate.jobs.{self.status}")
+        self.save()
+
+class TranslationJobPool:
+    """Bounded queue plus a fixed set of worker tasks, so long translations never hold request handlers"""
+
+    def __init__(self, workers: int = TRANSLATE_JOB_WORKERS, queue_size: int = TRANSLATE_JOB_QUEUE):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._running: Dict[str, TranslationJob] = {}
+
+    def start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+
+    async def stop(self):
+        """Cancel the workers; unfinished jobs are marked failed so clients stop waiting"""
+        interrupted = list(self._running.values())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        while self._queue is not None and not self._queue.empty():
+            interrupted.append(self._queue.get_nowait())
+        for job in interrupted:
+            job.status = "failed"
+            job.error = "Server restarted before the translation finished; please resubmit"
+            job.save()
+        self._queue = None
+        self._tasks = []
+        self._running = {}
+
+    def submit(self, job: TranslationJob):
+        if self._queue is None:
+            raise RateLimited("Translation jobs are not available yet, please retry shortly", 5.0, status_code=503)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            metrics.incr("translate.jobs.rejected")
+            raise RateLimited("Too many translation jobs queued, please retry later", 30.0, status_code=503)
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            self._running[job.id] = job
+            try:
+                await self._run(job)
+            except Exception as e:
+                logger.exception("Translation job %s crashed: %s", job.id, e)
+                job.status = "failed"
+                job.error = "Internal error while translating"
+                job.save()
+            finally:
+                self._running.pop(job.id, None)
+                self._queue.task_done()
+
+    async def _run(self, job: TranslationJob):
+        started = time.perf_counter()
+        job.status = "running"
+        job.save()
+        for segment in job.segments:
+            if segment["status"] != "pending":
+                continue
+            try:
+                translated = await self._translate(segment["source"], job.language)
+            except Exception as e:
+                logger.warning("Translation job %s: segment %d failed: %s", job.id, segment["index"], e)
+                segment["status"] = "failed"
+                job.error = str(e) or type(e).__name__
+            else:
+                segment["status"] = "done"
+                segment["translated_text"] = translated
+                await self._cache_paragraphs(job, segment["paragraphs"], translated)
+            job.save()
+        await job.finish()
+        metrics.observe("translate.jobs.latency", time.perf_counter() - started)
+        logger.info(
+            "🌐 Translation job %s %s: %d segments in %.1fs", job.id, job.status, len(job.segments), time.perf_counter() - started
+        )
+
+    async def _cache_paragraphs(self, job: TranslationJob, paragraphs: List[str], translated: str):
+        """Cache a packed segment per source paragraph, the unit the frontend and later jobs look up"""
+        from app.translation import cache_translation
+        translated_paragraphs = split_paragraphs(translated)
+        if len(translated_paragraphs) != len(paragraphs):
+            # The model merged or split paragraphs, so they cannot be paired up; the whole job text is still cached
+            metrics.incr("translate.jobs.unaligned")
+            logger.info(
+                "Translation job %s: %d paragraphs came back as %d, not caching them individually",
+                job.id, len(paragraphs), len(translated_paragraphs)
+            )
+            return
+        for source, target in zip(paragraphs, translated_paragraphs):
+            await cache_translation(source, target, job.language, job.module)
+
+    async def _translate(self, text: str, language: str) -> str:
+        """One segment, waiting out rate limits; raises once every attempt has failed"""
+        for attempt in range(1, TRANSLATE_JOB_ATTEMPTS + 1):
+            try:
+                with deadline_scope(TRANSLATE_DEADLINE_SECONDS):
+                    return await translate_text(text, language, strict=True)
+            except RateLimited as e:
+                if attempt == TRANSLATE_JOB_ATTEMPTS:
+                    raise
+                await asyncio.sleep(min(e.retry_after, TRANSLATE_DEADLINE_SECONDS))
+            except Exception:
+                if attempt == TRANSLATE_JOB_ATTEMPTS:
+                    raise
+                await asyncio.sleep(2 * attempt)
+
+    def stats(self) -> Dict:
+        return {
+            "workers": len(self._tasks),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": len(self._running),
+        }
+
+translation_jobs = TranslationJobPool()
+
+def get_job(job_id: str) -> Optional[Dict]:
+    return get_shared_cache().get("translate_job", job_id)
+
+@router.post(
+    "",
+    response_model=TranslateJob,
+    status_code=202,
+    dependencies=[Depends(limit_requests("translate"))]
+)
+async def submit_translation_job(request: TranslateRequest, response: Response):
+    """Start translating a (long) text in the background; already cached paragraphs come back filled in"""
+    from app.translation import get_cached_translations, hash_text
+    paragraphs = split_paragraphs(request.text)
+    if not paragraphs:
+        raise HTTPException(status_code=422, detail="Nothing to translate")
+    cached = await get_cached_translations([request.text] + paragraphs, request.language)
+    whole = cached.get(hash_text(request.text))
+    if whole is not None:
+        cached = {}
+    job = TranslationJob(request.text, request.language, request.module, plan_segments(paragraphs, cached))
+    metrics.incr("translate.jobs.submitted")
+    if whole is not None:
+        job.status = "completed"
+        job.translated_text = whole
+        job.segments = [{"index": 0, "status": "cached", "source": request.text, "translated_text": whole}]
+        job.save()
+    elif all(s["status"] == "cached" for s in job.segments):
+        await job.finish()
+    else:
+        translation_jobs.submit(job)
+        job.save()
+    response.headers["Location"] = f"/api/translate/jobs/{job.id}"
+    return job.record()
+
+@router.get("/{job_id}", response_model=TranslateJob)
+async def get_translation_job(job_id: str = Path(..., pattern=JOB_ID_PATTERN)):
+    """Current state of a translation job (poll until status is completed or failed)"""
+    record = get_job(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Translation job not found or expired")
+    return record
+
+@router.get("/{job_id}/events")
+async def stream_translation_job(job_id: str = Path(..., pattern=JOB_ID_PATTERN)):
+    """Server-sent events: progress whenever a segment finishes, then done with the final record"""
+    if get_job(job_id) is None:
+        raise HTTPException(status_code=404, detail="Translation job not found or expired")
+
+    async def events():
+        last = None
+        quiet_since = time.monotonic()
+        while True:
+            record = get_job(job_id)
+            if record is None:
+                yield b'event: error\ndata: {"detail": "Translation job expired"}\n\n'
+                return
+            state = (record["status"], record["segments_done"], record["segments_failed"])
+            if state != last:
+                last = state
+                quiet_since = time.monotonic()
+                kind = b"done" if record["status"] in TERMINAL else b"progress"
+                yield b"event: " + kind + b"\ndata: " + orjson.dumps(record) + b"\n\n"
+                if kind == b"done":
+                    return
+            elif time.monotonic() - quiet_since >= TRANSLATE_JOB_KEEPALIVE:
+                quiet_since = time.monotonic()
+                yield b": keepalive\n\n"
+            await asyncio.sleep(TRANSLATE_JOB_POLL_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-store"})
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+import uuid
+from typing import Dict, Optional
+
+import orjson
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from app import metrics
+from app.auth import verify_token
+from app.chat_service import answer_chat
+from app.config import env_float, env_int
+from app.deadline import CHAT_DEADLINE_SECONDS, DeadlineExceeded, deadline_scope
+from app.load_shedding import SHED_ENABLED, SHED_RETRY_AFTER, loop_monitor
+from app.logs import set_request_id
+from app.models import ChatRequest
+from app.rate_limit import check_limits, client_ip
+from app.scheduler import RateLimited
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Questions one connection may have in flight; more are rejected with a 429 error message
+WS_MAX_IN_FLIGHT = env_int("WS_MAX_IN_FLIGHT", 4)
+# Connections this worker accepts; beyond it new ones are closed with 1013 (try again later)
+WS_MAX_CONNECTIONS = env_int("WS_MAX_CONNECTIONS", 5000)
+# Close connections that send nothing for this long (0 keeps them open indefinitely)
+WS_IDLE_TIMEOUT = env_float("WS_IDLE_TIMEOUT", 900.0)
+WS_MAX_MESSAGE_BYTES = env_int("WS_MAX_MESSAGE_BYTES", 64 * 1024)
+
+_active_connections = 0
+
+def ws_stats() -> Dict:
+    return {"active": _active_connections, "max": WS_MAX_CONNECTIONS}
+
+def _connection_token(websocket: WebSocket) -> Optional[str]:
+    """Bearer token from the Authorization header, or ?token= (browsers cannot set WebSocket headers)"""
+    header = websocket.headers.get("authorization", "")
+    if header.lower().startswith("bearer "):
+        return header[7:].strip()
+    return websocket.query_params.get("token")
+
+class ChatSession:
+    """One authenticated /ws/chat connection multiplexing several questions.
+
+    Each question runs in its own task; all writes go through one lock, so a
+    client that reads slowly makes its own question tasks (and their upstream
+    streams) wait instead of buffering unboundedly in the server.
+    """
+
+    def __init__(self, websocket: WebSocket, user: Optional[dict]):
+        self.websocket = websocket
+        self.user = user
+        self.ip = client_ip(websocket)
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self._send_lock = asyncio.Lock()
+
+    async def send(self, message: Dict):
+        async with self._send_lock:
+            await self.websocket.send_text(orjson.dumps(message).decode())
+
+    async def send_error(self, question_id: Optional[str], status: int, detail, retry_after: Optional[float] = None):
+        message = {"type": "error", "id": question_id, "status": status, "detail": detail}
+        if retry_after is not None:
+            message["retry_after"] = round(retry_after, 1)
+        await self.send(message)
+
+    async def handle(self, raw: str):
+        if len(raw) > WS_MAX_MESSAGE_BYTES:
+            await self.send_error(None, 413, f"Message larger than {WS_MAX_MESSAGE_BYTES} bytes")
+            return
+        try:
+            message = orjson.loads(raw)
+            kind = message.get("type")
+        except (orjson.JSONDecodeError, AttributeError):
+            await self.send_error(None, 400, "Messages must be JSON objects")
+            return
+
+        question_id = str(message.get("id") or "")
+        if kind == "ping":
+            await self.send({"type": "pong"})
+        elif kind == "cancel":
+            task = self.tasks.get(question_id)
+            if task is not None:
+                task.cancel()
+        elif kind == "ask":
+            if not question_id or question_id in self.tasks:
+                await self.send_error(question_id or None, 400, "ask needs an id that is not already in flight")
+            elif len(self.tasks) >= WS_MAX_IN_FLIGHT:
+                metrics.incr("ws.rejected.in_flight")
+                await self.send_error(question_id, 429, f"At most {WS_MAX_IN_FLIGHT} questions in flight per connection")
+            else:
+                self.tasks[question_id] = asyncio.create_task(self.ask(question_id, message))
+        else:
+            await self.send_error(question_id or None, 400, f"Unknown message type: {kind}")
+
+    async def ask(self, question_id: str, message: Dict):
+        """Answer one question, streaming deltas and finishing with done, error or cancelled"""
+        set_request_id()
+        metrics.incr("ws.questions")
+        try:
+            request = ChatRequest(**{k: message[k] for k in ("message", "context", "conversation_id", "elaborate") if k in message})
+            if not (request.message or request.context):
+                raise HTTPException(status_code=422, detail="ask needs a message or context")
+            check_limits("chat", self.ip, self.user)
+            if SHED_ENABLED and loop_monitor.should_shed("high"):
+                metrics.incr("shed.high")
+                raise RateLimited("Server is overloaded, please retry shortly", SHED_RETRY_AFTER, status_code=503)
+
+            async def on_delta(text: str):
+                await self.send({"type": "delta", "id": question_id, "text": text})
+
+            # Each question counts towards the same in-flight limit as HTTP chat requests
+            with loop_monitor.track(), deadline_scope(CHAT_DEADLINE_SECONDS):
+                result = await answer_chat(request, self.user, on_delta=on_delta)
+            await self.send({"type": "done", "id": question_id, **result.model_dump()})
+        except asyncio.CancelledError:
+            await self._send_quietly({"type": "cancelled", "id": question_id})
+            raise
+        except ValidationError as e:
+            await self._send_error_quietly(question_id, 422, e.errors(include_url=False))
+        except RateLimited as e:
+            await self._send_error_quietly(question_id, e.status_code, e.detail, e.retry_after)
+        except DeadlineExceeded as e:
+            metrics.incr(f"deadline.exceeded.{e.stage}")
+            await self._send_error_quietly(question_id, 504, str(e))
+        except HTTPException as e:
+            await self._send_error_quietly(question_id, e.status_code, e.detail)
+        except Exception as e:
+            logger.exception("Unexpected error answering over WebSocket: %s", e)
+            await self._send_error_quietly(question_id, 500, f"Internal server error: {str(e)}")
+        finally:
+            self.tasks.pop(question_id, None)
+
+    async def _send_quietly(self, message: Dict):
+        # The client may already be gone
+        try:
+            await self.send(message)
+        except Exception:
+            pass
+
+    async def _send_error_quietly(self, question_id: str, status: int, detail, retry_after: Optional[float] = None):
+        try:
+            await self.send_error(question_id, status, detail, retry_after)
+        except Exception:
+            pass
+
+    async def close(self):
+        for task in list(self.tasks.values()):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+
+@router.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket):
+    """Multiplexed, streaming chat over one authenticated connection (protocol in README)"""
+    global _active_connections
+    token = _connection_token(websocket)
+    user = verify_token(token) if token else None
+    if token and user is None:
+        # Policy violation: a token was sent but is invalid or expired
+        await websocket.close(code=1008)
+        return
+    if _active_connections >= WS_MAX_CONNECTIONS:
+        metrics.incr("ws.rejected.connections")
+        await websocket.close(code=1013)
+        return
+
+    await websocket.accept()
+    _active_connections += 1
+    metrics.incr("ws.connections")
+    session = ChatSession(websocket, user)
+    connection_id = uuid.uuid4().hex[:12]
+    logger.debug("🔌 WebSocket %s opened (user %s)", connection_id, user.get("id") if user else None)
+    try:
+        await session.send({
+            "type": "ready",
+            "connection_id": connection_id,
+            "user_id": user.get("id") if user else None,
+            "max_in_flight": WS_MAX_IN_FLIGHT,
+        })
+        while True:
+            try:
+                frame = await asyncio.wait_for(websocket.receive(), WS_IDLE_TIMEOUT or None)
+            except asyncio.TimeoutError:
+                if session.tasks:
+                    continue
+                await websocket.close(code=1000)
+                break
+            if frame["type"] == "websocket.disconnect":
+                break
+            raw = frame.get("text")
+            if raw is None:
+                raw = (frame.get("bytes") or b"").decode("utf-8", "replace")
+            await session.handle(raw)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        _active_connections -= 1
+        await session.close()
+        logger.debug("🔌 WebSocket %s closed", connection_id)
@@ -0,0 +1,120 @@
+"""
+Benchmark quantized vector search against the float32 baseline.
+
+Builds app.local_index.LocalVectorIndex over the book chunks (embedded locally
+with the fallback embedding, so no API calls) or, when the docs are not
+present or --synthetic is given, over clustered random vectors. Each
+configuration is scored on recall@k against exact float32 search and on
+per-query latency.
+
+Usage (from project root or backend folder):
+
+    python -m scripts.bench_quantization
+    python -m scripts.bench_quantization --synthetic --points 50000 --queries 500
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import List, Tuple
+
+import numpy as np
+
+# Add backend directory to path so "app" imports work
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_ROOT))
+
+from app.local_index import LocalVectorIndex  # type: ignore
+
+# (label, quantization, oversampling, rescore)
+CONFIGS: List[Tuple[str, str, float, bool]] = [
+    ("float32", "none", 1.0, False),
+    ("int8", "int8", 1.0, False),
+    ("int8+rescore x2", "int8", 2.0, True),
+    ("binary", "binary", 1.0, False),
+    ("binary+rescore x2", "binary", 2.0, True),
+    ("binary+rescore x4", "binary", 4.0, True),
+    ("binary+rescore x8", "binary", 8.0, True),
+]
+
+
+def book_vectors() -> np.ndarray:
+    """Fallback-embed every book chunk (local, deterministic)."""
+    from app.openai_client import create_fallback_embedding  # type: ignore
+    from scripts.seed_vectors import load_book_chunks  # type: ignore
+
+    chunks = load_book_chunks()
+    return np.array([create_fallback_embedding(c["text"]) for c in chunks], dtype=np.float32)
+
+
+def synthetic_vectors(points: int, dim: int, rng: np.random.Generator) -> np.ndarray:
+    """Clustered Gaussian vectors, roughly shaped like topic-clustered text embeddings."""
+    centers = rng.standard_normal((max(1, points // 50), dim)).astype(np.float32)
+    labels = rng.integers(0, len(centers), points)
+    return centers[labels] + 0.6 * rng.standard_normal((points, dim)).astype(np.float32)
+
+
+def make_queries(vectors: np.ndarray, count: int, rng: np.random.Generator) -> np.ndarray:
+    """Perturbed copies of stored vectors, standing in for paraphrased questions."""
+    rows = rng.integers(0, len(vectors), count)
+    noise = rng.standard_normal((count, vectors.shape[1])).astype(np.float32)
+    scale = np.linalg.norm(vectors[rows], axis=1, keepdims=True) / np.sqrt(vectors.shape[1])
+    return vectors[rows] + 0.5 * scale * noise
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, k: int):
+    ids = [str(i) for i in range(len(vectors))]
+    payloads = [{} for _ in ids]
+
+    baseline = LocalVectorIndex(dim=vectors.shape[1])
+    baseline.add(ids, vectors, payloads)
+    truth = [{hit["id"] for hit in baseline.search(q, k)} for q in queries]
+
+    print(f"{len(vectors)} vectors x {vectors.shape[1]} dims, {len(queries)} queries, k={k}\n")
+    print(f"{'config':<20} {'scanned MB':>10} {'recall@' + str(k):>9} {'p50 ms':>8} {'p95 ms':>8}")
+    for label, quantization, oversampling, rescore in CONFIGS:
+        index = LocalVectorIndex(dim=vectors.shape[1], quantization=quantization,
+                                 oversampling=oversampling, rescore=rescore)
+        index.add(ids, vectors, payloads)
+        index.search(queries[0], k)  # warm up
+
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            results = index.search(query, k)
+            latencies.append((time.perf_counter() - started) * 1000)
+            hits += len(expected & {hit["id"] for hit in results})
+
+        recall = hits / (k * len(queries))
+        scanned_mb = index.memory_bytes()["scanned"] / 1e6
+        print(f"{label:<20} {scanned_mb:>10.2f} {recall:>9.3f} "
+              f"{np.percentile(latencies, 50):>8.2f} {np.percentile(latencies, 95):>8.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare int8/binary quantization with float32 search")
+    parser.add_argument("--synthetic", action="store_true", help="Use random clustered vectors instead of the book")
+    parser.add_argument("--points", type=int, default=20000, help="Synthetic vectors (default: 20000)")
+    parser.add_argument("--dim", type=int, default=768, help="Synthetic dimension (default: 768)")
+    parser.add_argument("--queries", type=int, default=200, help="Queries to run (default: 200)")
+    parser.add_argument("--k", type=int, default=5, help="Results per query (default: 5)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    vectors = None
+    if not args.synthetic:
+        try:
+            vectors = book_vectors()
+        except RuntimeError as e:
+            print(f"⚠️  {e}\n   Falling back to synthetic vectors.\n")
+    if vectors is None or not len(vectors):
+        vectors = synthetic_vectors(args.points, args.dim, rng)
+
+    run(vectors, make_queries(vectors, args.queries, rng), args.k)
+
+
+if __name__ == "__main__":
+    main()
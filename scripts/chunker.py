@@ -0,0 +1,277 @@
+"""
+Markdown-aware chunker for the book.
+
+Splits a document along its structure instead of raw character counts:
+
+- the heading hierarchy is tracked and attached to every chunk as its section
+  (e.g. "ROS 2 Basics > Nodes > Lifecycle"), and chunks never span two sections
+- fenced code blocks are kept whole, however large
+- sizes are measured in (approximate) tokens, with a configurable overlap of
+  trailing sentences (or words) carried into the next chunk of the same section;
+  the overlap counts towards the size limit
+- output is a generator, and whole documents can be chunked in parallel
+  across processes with load_documents
+
+Used by seed_vectors.py; can also be run directly to inspect the chunks:
+
+    python -m scripts.chunker path/to/page.md --max-tokens 300
+"""
+
+import argparse
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_MAX_TOKENS = 350
+DEFAULT_OVERLAP_TOKENS = 40
+
+# Roughly one token per 4 characters of a word, one per punctuation mark
+_TOKEN_PIECE = re.compile(r"\w{1,4}|[^\w\s]")
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(`{3,}|~{3,})")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def count_tokens(text: str) -> int:
+    """Approximate token count (no tokenizer dependency)."""
+    return len(_TOKEN_PIECE.findall(text))
+
+
+def parse_blocks(text: str) -> Iterator[Tuple[str, str, int]]:
+    """
+    Yield (kind, text, heading_level) for each block of a markdown document.
+    kind is 'heading', 'code' or 'text'; blank lines separate text blocks.
+    """
+    lines = text.splitlines()
+    paragraph: List[str] = []
+    i = 0
+
+    def flush_paragraph():
+        block = "\n".join(paragraph).strip()
+        paragraph.clear()
+        return block
+
+    while i < len(lines):
+        line = lines[i]
+        fence = _FENCE.match(line)
+        if fence:
+            block = flush_paragraph()
+            if block:
+                yield "text", block, 0
+            marker = fence.group(1)
+            code = [line]
+            i += 1
+            # The fence closes on a line starting with at least as many of the same character
+            while i < len(lines):
+                code.append(lines[i])
+                if lines[i].strip().startswith(marker[0] * len(marker)) and lines[i].strip().strip(marker[0]) == "":
+                    break
+                i += 1
+            yield "code", "\n".join(code), 0
+            i += 1
+            continue
+
+        heading = _HEADING.match(line)
+        if heading:
+            block = flush_paragraph()
+            if block:
+                yield "text", block, 0
+            yield "heading", heading.group(2), len(heading.group(1))
+        elif line.strip():
+            paragraph.append(line)
+        else:
+            block = flush_paragraph()
+            if block:
+                yield "text", block, 0
+        i += 1
+
+    block = flush_paragraph()
+    if block:
+        yield "text", block, 0
+
+
+def _split_words(text: str, max_tokens: int) -> List[str]:
+    """Greedy word windows of at most max_tokens (a single longer word is cut by characters)."""
+    windows: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for word in text.split():
+        word_tokens = count_tokens(word)
+        if word_tokens > max_tokens:
+            # Every character is at most one token
+            pieces = [word[start:start + max_tokens] for start in range(0, len(word), max_tokens)]
+        else:
+            pieces = [word]
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if current and current_tokens + piece_tokens > max_tokens:
+                windows.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += piece_tokens
+    if current:
+        windows.append(" ".join(current))
+    return windows
+
+
+def split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Split a text block that exceeds max_tokens at sentence, then word, boundaries."""
+    pieces: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    for sentence in _SENTENCE_END.split(text):
+        sentence_tokens = count_tokens(sentence)
+        # A single run-on sentence falls back to word windows
+        parts = _split_words(sentence, max_tokens) if sentence_tokens > max_tokens else [sentence]
+        for part in parts:
+            part_tokens = count_tokens(part)
+            if current and current_tokens + part_tokens > max_tokens:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(part)
+            current_tokens += part_tokens
+    if current:
+        pieces.append(" ".join(current))
+    return pieces
+
+
+def _overlap_tail(blocks: List[Tuple[str, str]], overlap_tokens: int) -> List[Tuple[str, str]]:
+    """
+    Trailing sentences of the last text block, up to overlap_tokens; when even the
+    last sentence is too long (e.g. a word-window split), its trailing words instead.
+    """
+    if overlap_tokens <= 0 or not blocks or blocks[-1][0] != "text":
+        return []
+    tail: List[str] = []
+    tokens = 0
+    for sentence in reversed(_SENTENCE_END.split(blocks[-1][1])):
+        sentence_tokens = count_tokens(sentence)
+        if tokens + sentence_tokens > overlap_tokens:
+            if not tail:
+                words: List[str] = []
+                for word in reversed(sentence.split()):
+                    word_tokens = count_tokens(word)
+                    if tokens + word_tokens > overlap_tokens:
+                        break
+                    words.insert(0, word)
+                    tokens += word_tokens
+                if words:
+                    tail.append(" ".join(words))
+            break
+        tail.insert(0, sentence)
+        tokens += sentence_tokens
+    return [("text", " ".join(tail))] if tail else []
+
+
+def chunk_markdown(
+    text: str,
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    overlap_tokens: int = DEFAULT_OVERLAP_TOKENS,
+) -> Iterator[Dict]:
+    """
+    Yield chunks of a markdown document as dicts with text, section (heading
+    path joined with ' > ', '' before the first heading), headings and tokens.
+
+    Every chunk, overlap and heading line included, is at most max_tokens, except
+    one holding a fenced code block that is larger on its own.
+    """
+    # Overlap comes out of the budget, so it can take at most half of it
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+    # (level, title) of the enclosing headings, outermost first
+    heading_stack: List[Tuple[int, str]] = []
+    current: List[Tuple[str, str]] = []
+    current_tokens = 0
+    heading_tokens = 0
+    # Whether current holds anything beyond overlap carried from the previous chunk
+    has_new = False
+
+    def make_chunk():
+        body = "\n\n".join(block for _, block in current)
+        headings = [title for _, title in heading_stack]
+        return {
+            "text": body,
+            "section": " > ".join(headings),
+            "headings": headings,
+            "tokens": count_tokens(body),
+        }
+
+    for kind, block, level in parse_blocks(text):
+        if kind == "heading":
+            if has_new:
+                yield make_chunk()
+            current, current_tokens, has_new = [], 0, False
+            while heading_stack and heading_stack[-1][0] >= level:
+                heading_stack.pop()
+            heading_stack.append((level, block))
+            # Keep the heading line in the text so the chunk reads on its own
+            line = "#" * level + " " + block
+            current.append(("heading", line))
+            current_tokens = heading_tokens = count_tokens(line)
+            continue
+
+        # Room for a piece next to the section heading or a full overlap tail
+        piece_budget = max(1, max_tokens - overlap_tokens - heading_tokens)
+        if kind == "code":
+            pieces = [block]
+        elif count_tokens(block) > piece_budget:
+            pieces = split_oversized(block, piece_budget)
+        else:
+            pieces = [block]
+
+        for piece in pieces:
+            piece_tokens = count_tokens(piece)
+            if has_new and current_tokens + piece_tokens > max_tokens:
+                yield make_chunk()
+                current = _overlap_tail(current, min(overlap_tokens, max_tokens - piece_tokens))
+                current_tokens = sum(count_tokens(b) for _, b in current)
+            current.append((kind, piece))
+            current_tokens += piece_tokens
+            has_new = True
+
+    if has_new:
+        yield make_chunk()
+
+
+def load_documents(
+    paths: Iterable,
+    chunk_document: Callable[..., List[Dict]],
+    workers: Optional[int] = None,
+) -> Iterator[Dict]:
+    """
+    Chunk many documents in parallel worker processes, yielding chunks in path order.
+
+    chunk_document must be a picklable top-level function taking one path and
+    returning that document's chunks. workers defaults to the CPU count; with
+    one worker (or a single document) everything runs in this process.
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(paths) <= 1:
+        for path in paths:
+            yield from chunk_document(path)
+        return
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths))) as pool:
+        chunksize = max(1, len(paths) // (workers * 4))
+        for document_chunks in pool.map(chunk_document, paths, chunksize=chunksize):
+            yield from document_chunks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show how a markdown file is chunked")
+    parser.add_argument("path", help="Markdown file")
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--overlap-tokens", type=int, default=DEFAULT_OVERLAP_TOKENS)
+    args = parser.parse_args()
+
+    with open(args.path, encoding="utf-8") as f:
+        text = f.read()
+    for i, chunk in enumerate(chunk_markdown(text, args.max_tokens, args.overlap_tokens), 1):
+        print(f"--- chunk {i}: {chunk['tokens']} tokens, section: {chunk['section'] or '(none)'}")
+        print(chunk["text"])
+        print()
+
+
+if __name__ == "__main__":
+    main()
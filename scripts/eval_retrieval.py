@@ -0,0 +1,466 @@
+"""
+Evaluate retrieval quality against latency over the book corpus.
+
+Builds a labeled query set from the book pages, chunked exactly as
+seed_vectors.py does (read_markdown + chunk_markdown, so the default
+configuration is the set load_book_chunks produces):
+
+  heading   the text of a section heading; relevant chunks are the ones under
+            that heading path on the same page
+  sentence  a held-out sentence with ~30% of its words dropped; relevant
+            chunks are the ones containing the full sentence
+
+Labels refer to pages, headings and sentences rather than chunk IDs, so
+configurations with different chunk sizes are scored on the same queries.
+Each configuration reports recall@k (relevant chunks in the top k, out of at
+most k), MRR and per-query search latency percentiles.
+
+By default everything runs locally: chunks and queries are embedded with the
+fallback embedding and searched with app.local_index.LocalVectorIndex, so it
+needs no API keys and is deterministic enough for CI. --embeddings gemini
+uses real embeddings, cached in --embedding-cache so later runs are local too.
+--backend qdrant searches the live book_content collection instead (the
+production chunking only; quantization is whatever the collection uses).
+
+Usage (from project root or backend folder):
+
+    python -m scripts.eval_retrieval
+    python -m scripts.eval_retrieval --chunk-sizes 200,350,500 --quantization none,binary --rerank off,on
+    python -m scripts.eval_retrieval --output eval.json --baseline eval_baseline.json --max-regression 0.02
+    python -m scripts.eval_retrieval --backend qdrant --embeddings gemini
+
+Exits with status 1 when --baseline is given and any configuration's recall@k
+or MRR dropped by more than --max-regression, or when the baseline was made
+from different docs, seed, query sampling, cutoffs, embeddings or backend
+(those runs score different query sets, so comparing them would be noise).
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import itertools
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+# Add backend directory to path so "app" imports work
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_ROOT))
+
+from app.local_index import LocalVectorIndex  # type: ignore
+from app.openai_client import EMBEDDING_MODEL, create_fallback_embedding, get_embeddings  # type: ignore
+from app.rerank import RETRIEVAL_CANDIDATES, score_candidates, tokenize  # type: ignore
+from scripts import seed_vectors as seed  # type: ignore
+from scripts.chunker import chunk_markdown, parse_blocks  # type: ignore
+
+DEFAULT_KS = (1, 3, 5, 10)
+EMBEDDING_CACHE_PATH = BACKEND_ROOT / ".eval_embeddings.json.gz"
+# Held-out sentence queries per page, and which sentences qualify
+SENTENCES_PER_PAGE = 3
+MIN_SENTENCE_WORDS = 8
+MAX_SENTENCE_WORDS = 40
+# Share of a sentence's words kept in its query
+QUERY_KEEP_FRACTION = 0.7
+# Headings too generic to identify a section on their own
+GENERIC_HEADINGS = frozenset(
+    "overview introduction summary conclusion exercises references resources "
+    "next steps key takeaways prerequisites learning objectives further reading".split()
+)
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.split()).lower()
+
+
+def load_pages() -> List[Dict]:
+    """Every book page with its module and page labels, read as seed_vectors.py reads it."""
+    if not seed.DOCS_ROOT.exists():
+        raise RuntimeError(f"Docs root not found at {seed.DOCS_ROOT}. Make sure the frontend repo is present or pass --docs.")
+    pages = []
+    for md_path in sorted(seed.DOCS_ROOT.rglob("*.md")):
+        raw = seed.read_markdown(md_path)
+        if raw:
+            pages.append({"doc": len(pages), "raw": raw, **seed.infer_module_and_section(md_path)})
+    return pages
+
+
+def chunk_pages(pages: List[Dict], max_tokens: int, overlap_tokens: int) -> List[Dict]:
+    """Chunks in the shape of seed_vectors.chunk_document, plus the page they came from."""
+    return [
+        {
+            "text": chunk["text"],
+            "module": page["module"],
+            "section": chunk["section"] or page["section"],
+            "page": page["section"],
+            "doc": page["doc"],
+        }
+        for page in pages
+        for chunk in chunk_markdown(page["raw"], max_tokens, overlap_tokens)
+    ]
+
+
+def heading_queries(pages: List[Dict]) -> List[Dict]:
+    """One query per distinctive heading: its title, labeled with its heading path."""
+    queries = []
+    for page in pages:
+        stack: List = []
+        for kind, block, level in parse_blocks(page["raw"]):
+            if kind != "heading":
+                continue
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, block))
+            queries.append({
+                "kind": "heading",
+                "query": block,
+                "doc": page["doc"],
+                "section": " > ".join(title for _, title in stack),
+            })
+    # A title that appears on several pages (or says nothing) cannot be answered from the title alone
+    seen: Dict[str, int] = {}
+    for query in queries:
+        seen[normalize(query["query"])] = seen.get(normalize(query["query"]), 0) + 1
+    return [
+        q for q in queries
+        if seen[normalize(q["query"])] == 1
+        and len(tokenize(q["query"])) >= 2
+        and normalize(q["query"]) not in GENERIC_HEADINGS
+    ]
+
+
+def sentence_queries(pages: List[Dict], per_page: int, rng: np.random.Generator) -> List[Dict]:
+    """Held-out sentences from each page's prose, with words dropped so they are not verbatim."""
+    queries = []
+    for page in pages:
+        sentences = [
+            sentence.strip()
+            for kind, block, _ in parse_blocks(page["raw"]) if kind == "text"
+            for sentence in _SENTENCE.split(block)
+            if MIN_SENTENCE_WORDS <= len(sentence.split()) <= MAX_SENTENCE_WORDS
+        ]
+        if not sentences:
+            continue
+        for row in rng.choice(len(sentences), min(per_page, len(sentences)), replace=False):
+            words = sentences[row].split()
+            keep = np.sort(rng.choice(len(words), int(np.ceil(len(words) * QUERY_KEEP_FRACTION)), replace=False))
+            queries.append({
+                "kind": "sentence",
+                "query": " ".join(words[i] for i in keep),
+                "doc": page["doc"],
+                "sentence": normalize(sentences[row]),
+            })
+    return queries
+
+
+def relevant_chunks(query: Dict, chunks: List[Dict], texts: List[str]) -> Set[int]:
+    """Rows of chunks that answer a query under this chunking."""
+    if query["kind"] == "heading":
+        prefix = query["section"] + " > "
+        return {
+            row for row, chunk in enumerate(chunks)
+            if chunk["doc"] == query["doc"] and (chunk["section"] == query["section"] or chunk["section"].startswith(prefix))
+        }
+    return {row for row, chunk in enumerate(chunks) if chunk["doc"] == query["doc"] and query["sentence"] in texts[row]}
+
+
+class Embedder:
+    """Fallback (local, deterministic) or Gemini embeddings, the latter cached on disk."""
+
+    def __init__(self, mode: str, cache_path: Path):
+        self.mode = mode
+        self.cache_path = cache_path
+        self.cache: Dict[str, List[float]] = {}
+        if mode == "gemini" and cache_path.exists():
+            with gzip.open(cache_path, "rt", encoding="utf-8") as f:
+                self.cache = json.load(f)
+        self.misses = 0
+
+    def _key(self, text: str) -> str:
+        return hashlib.sha256(f"{EMBEDDING_MODEL}:{text}".encode("utf-8")).hexdigest()
+
+    async def embed(self, texts: List[str], concurrency: int = 4) -> np.ndarray:
+        if self.mode == "fallback":
+            return np.array([create_fallback_embedding(text) for text in texts], dtype=np.float32)
+
+        missing = list(dict.fromkeys(text for text in texts if self._key(text) not in self.cache))
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(text: str):
+            async with semaphore:
+                # strict: a silent hash-embedding fallback mixed in would skew every score
+                vector = await get_embeddings(text, strict=True)
+            self.cache[self._key(text)] = vector
+
+        if missing:
+            print(f"Embedding {len(missing)} texts with Gemini...")
+            self.misses += len(missing)
+            try:
+                await asyncio.gather(*(fetch(text) for text in missing))
+            finally:
+                self.save()
+        return np.array([self.cache[self._key(text)] for text in texts], dtype=np.float32)
+
+    def save(self):
+        if self.mode == "gemini":
+            with gzip.open(self.cache_path, "wt", encoding="utf-8") as f:
+                json.dump(self.cache, f)
+
+
+def percentiles(latencies: List[float]) -> Dict[str, float]:
+    return {f"p{p}": round(float(np.percentile(latencies, p)), 3) for p in (50, 95, 99)}
+
+
+def score(ranked: List[List[int]], relevant: List[Set[int]], ks: List[int]) -> Dict[str, float]:
+    """Mean recall@k (relevant found out of at most k) and MRR over the top max(ks)."""
+    result: Dict[str, float] = {}
+    for k in ks:
+        result[f"recall@{k}"] = float(np.mean([
+            len(rel & set(rows[:k])) / min(len(rel), k) if rel else 0.0
+            for rows, rel in zip(ranked, relevant)
+        ]))
+    result["mrr"] = float(np.mean([
+        next((1.0 / rank for rank, row in enumerate(rows[:max(ks)], 1) if row in rel), 0.0)
+        for rows, rel in zip(ranked, relevant)
+    ]))
+    return {name: round(value, 4) for name, value in result.items()}
+
+
+async def evaluate(
+    label: str,
+    chunks: List[Dict],
+    queries: List[Dict],
+    query_vectors: np.ndarray,
+    search,
+    rerank: bool,
+    ks: List[int],
+) -> Dict:
+    """Run every query through one configuration and score it."""
+    texts = [normalize(chunk["text"]) for chunk in chunks]
+    relevant = [relevant_chunks(query, chunks, texts) for query in queries]
+    depth = max(ks)
+    ranked: List[List[int]] = []
+    latencies: List[float] = []
+    for query, vector in zip(queries, query_vectors):
+        started = time.perf_counter()
+        hits = await search(vector, max(RETRIEVAL_CANDIDATES, depth) if rerank else depth)
+        if rerank and hits:
+            # The order chat uses; the prompt's character budget is left out so every config is scored at the same k
+            order = np.argsort(-score_candidates(query["query"], hits), kind="stable")
+            hits = [hits[i] for i in order]
+        latencies.append((time.perf_counter() - started) * 1000)
+        ranked.append([hit["row"] for hit in hits[:depth]])
+
+    by_kind = {}
+    for kind in sorted({q["kind"] for q in queries}):
+        rows = [i for i, q in enumerate(queries) if q["kind"] == kind]
+        by_kind[kind] = score([ranked[i] for i in rows], [relevant[i] for i in rows], ks)
+    return {
+        "label": label,
+        "chunks": len(chunks),
+        **score(ranked, relevant, ks),
+        "unanswerable": sum(1 for rel in relevant if not rel),
+        "latency_ms": percentiles(latencies),
+        "by_kind": by_kind,
+    }
+
+
+def local_search(chunks: List[Dict], vectors: np.ndarray, quantization: str):
+    index = LocalVectorIndex(dim=vectors.shape[1], quantization=quantization,
+                             oversampling=2.0, rescore=quantization != "none")
+    index.add([str(row) for row in range(len(chunks))], vectors, [{"text": chunk["text"]} for chunk in chunks])
+
+    async def search(vector, limit: int) -> List[Dict]:
+        return [dict(hit, row=int(hit["id"])) for hit in index.search(vector, limit)]
+
+    return search
+
+
+async def qdrant_search(chunks: List[Dict]):
+    from app.qdrant_client import get_qdrant_client, search_vectors  # type: ignore
+
+    client = await get_qdrant_client()
+    rows = {seed.point_id(chunk): row for row, chunk in enumerate(chunks)}
+
+    async def search(vector, limit: int) -> List[Dict]:
+        hits = await search_vectors(client, vector.tolist(), limit=limit)
+        # Points from content that changed since the last seed match no local chunk
+        return [dict(hit, row=rows.get(hit["id"], -1)) for hit in hits]
+
+    return search
+
+
+def print_table(results: List[Dict], ks: List[int]):
+    header = f"{'config':<30} {'chunks':>6} " + " ".join(f"{'R@' + str(k):>6}" for k in ks)
+    print(header + f" {'MRR':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for r in results:
+        print(
+            f"{r['label']:<30} {r['chunks']:>6} " + " ".join(f"{r[f'recall@{k}']:>6.3f}" for k in ks)
+            + f" {r['mrr']:>6.3f} {r['latency_ms']['p50']:>8.2f} {r['latency_ms']['p95']:>8.2f} {r['latency_ms']['p99']:>8.2f}"
+        )
+
+
+def regressions(results: List[Dict], baseline: Dict, max_regression: float) -> List[str]:
+    """Metrics that got worse than the baseline run by more than max_regression."""
+    previous = {r["label"]: r for r in baseline.get("configs", [])}
+    found = []
+    for result in results:
+        before = previous.get(result["label"])
+        if before is None:
+            continue
+        for metric in [m for m in result if m.startswith("recall@")] + ["mrr"]:
+            if metric in before and result[metric] < before[metric] - max_regression:
+                found.append(f"{result['label']}: {metric} {before[metric]:.3f} -> {result[metric]:.3f}")
+    return found
+
+
+# Report fields that must match for a baseline comparison to mean anything
+COMPARABLE_FIELDS = ("docs_sha256", "queries", "seed", "ks", "sentences_per_page", "max_queries", "embeddings", "backend")
+
+
+def incomparable(report: Dict, baseline: Dict) -> List[str]:
+    """Why a baseline cannot be compared with this run (same docs, query set and cutoffs are required)."""
+    return [
+        f"{field}: baseline {baseline.get(field)!r}, this run {report[field]!r}"
+        for field in COMPARABLE_FIELDS
+        if baseline.get(field) != report[field]
+    ]
+
+
+def docs_fingerprint(pages: List[Dict]) -> str:
+    digest = hashlib.sha256()
+    for page in pages:
+        digest.update("\x1f".join([page["module"], page["section"], page["raw"]]).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def parse_list(value: str) -> List[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+async def run(args) -> int:
+    ks = sorted({int(k) for k in parse_list(args.k)})
+    rng = np.random.default_rng(args.seed)
+    pages = load_pages()
+    queries = heading_queries(pages) + sentence_queries(pages, args.sentences_per_page, rng)
+    if args.max_queries and len(queries) > args.max_queries:
+        queries = [queries[i] for i in sorted(rng.choice(len(queries), args.max_queries, replace=False))]
+    if not queries:
+        print("❌ No queries could be built from the docs")
+        return 1
+    kinds = {kind: sum(1 for q in queries if q["kind"] == kind) for kind in ("heading", "sentence")}
+    print(f"{len(pages)} pages, {len(queries)} queries ({kinds['heading']} heading, {kinds['sentence']} sentence), "
+          f"{args.embeddings} embeddings, {args.backend} backend\n")
+
+    embedder = Embedder(args.embeddings, Path(args.embedding_cache))
+    started = time.perf_counter()
+    query_vectors = await embedder.embed([q["query"] for q in queries])
+    embed_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+    chunk_sizes = [int(size) for size in parse_list(args.chunk_sizes)]
+    quantizations = parse_list(args.quantization)
+    reranks = [value == "on" for value in parse_list(args.rerank)]
+    if args.backend == "qdrant":
+        if chunk_sizes != [seed.CHUNK_MAX_TOKENS] or quantizations != ["none"]:
+            print("⚠️  The qdrant backend serves the seeded chunking and its own quantization; "
+                  "--chunk-sizes and --quantization are ignored\n")
+        chunk_sizes, quantizations = [seed.CHUNK_MAX_TOKENS], ["server"]
+
+    results = []
+    for size in chunk_sizes:
+        chunks = chunk_pages(pages, size, args.overlap)
+        if args.backend == "qdrant":
+            searches = {"server": await qdrant_search(chunks)}
+        else:
+            vectors = await embedder.embed([chunk["text"] for chunk in chunks])
+            searches = {quantization: local_search(chunks, vectors, quantization) for quantization in quantizations}
+        for quantization, rerank in itertools.product(quantizations, reranks):
+            label = f"chunk{size}/{quantization}" + ("/rerank" if rerank else "")
+            result = await evaluate(label, chunks, queries, query_vectors, searches[quantization], rerank, ks)
+            result.update({"chunk_tokens": size, "overlap_tokens": args.overlap,
+                           "quantization": quantization, "rerank": rerank})
+            results.append(result)
+
+    print_table(results, ks)
+    print(f"\nQuery embedding: {embed_ms:.2f} ms/query ({args.embeddings}, not included above)")
+
+    report = {
+        "backend": args.backend,
+        "embeddings": args.embeddings,
+        "pages": len(pages),
+        "docs_sha256": docs_fingerprint(pages),
+        "queries": kinds,
+        "seed": args.seed,
+        "sentences_per_page": args.sentences_per_page,
+        "max_queries": args.max_queries,
+        "ks": ks,
+        "configs": results,
+    }
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+        print(f"📝 Wrote {args.output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        mismatched = incomparable(report, baseline)
+        if mismatched:
+            # Scores over a different query set differ by noise, not by retrieval quality
+            print("\n❌ Baseline is not comparable with this run; regenerate it with the same options:")
+            for line in mismatched:
+                print(f"   {line}")
+            return 1
+        found = regressions(results, baseline, args.max_regression)
+        if found:
+            print("\n❌ Retrieval quality regressed against the baseline:")
+            for line in found:
+                print(f"   {line}")
+            return 1
+        print("\n✅ No regressions against the baseline")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure retrieval recall@k, MRR and latency over the book")
+    parser.add_argument("--docs", help=f"Docusaurus docs directory (default: {seed.DOCS_ROOT})")
+    parser.add_argument("--backend", choices=["local", "qdrant"], default="local",
+                        help="In-process index (default) or the live Qdrant collection")
+    parser.add_argument("--embeddings", choices=["fallback", "gemini"], default="fallback",
+                        help="Local hash embedding (default) or cached Gemini embeddings")
+    parser.add_argument("--embedding-cache", default=str(EMBEDDING_CACHE_PATH),
+                        help="Gemini embedding cache file (default: .eval_embeddings.json.gz)")
+    parser.add_argument("--chunk-sizes", default=str(seed.CHUNK_MAX_TOKENS),
+                        help="Comma-separated chunk sizes in tokens (default: CHUNK_MAX_TOKENS)")
+    parser.add_argument("--overlap", type=int, default=seed.CHUNK_OVERLAP_TOKENS,
+                        help="Chunk overlap in tokens (default: CHUNK_OVERLAP_TOKENS)")
+    parser.add_argument("--quantization", default="none,int8,binary",
+                        help="Comma-separated local index quantizations (default: none,int8,binary)")
+    parser.add_argument("--rerank", default="off,on", help="Comma-separated: off, on (default: both)")
+    parser.add_argument("--k", default=",".join(str(k) for k in DEFAULT_KS), help="Cutoffs (default: 1,3,5,10)")
+    parser.add_argument("--sentences-per-page", type=int, default=SENTENCES_PER_PAGE)
+    parser.add_argument("--max-queries", type=int, default=0, help="Sample at most this many queries (default: all)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the full report as JSON")
+    parser.add_argument("--baseline", help="Earlier --output report to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.02,
+                        help="Allowed drop in recall@k / MRR against the baseline (default: 0.02)")
+    args = parser.parse_args()
+
+    if args.docs:
+        seed.DOCS_ROOT = Path(args.docs).resolve()
+    try:
+        sys.exit(asyncio.run(run(args)))
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Script to warm the translations cache for the whole book.
+
+Walks the same Docusaurus markdown as seed_vectors.py, splits every page into
+the blocks the frontend sends to /api/translate, and translates them with
+bounded concurrency (Gemini quota is enforced by app.scheduler). Results are
+bulk-loaded into the translations table keyed by content hash, so
+get_cached_translation hits for reader requests.
+
+Runs are resumable and incremental: blocks whose hash is already cached for the
+target language are skipped, so a rerun continues where the last one stopped and
+only edited content is translated again.
+
+Usage (from project root or backend folder):
+
+    python -m scripts.pretranslate --language ur
+    python -m scripts.pretranslate --granularity paragraph --concurrency 2 --dry-run
+
+Make sure DATABASE_URL and GEMINI_API_KEY are set.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+# Add backend directory to path so "app" imports work
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_ROOT))
+
+from app.deadline import TRANSLATE_DEADLINE_SECONDS, deadline_scope  # type: ignore
+from app.openai_client import translate_text  # type: ignore
+from app.scheduler import RateLimited  # type: ignore
+from app.translation import bulk_cache_translations, get_cached_hashes, hash_text  # type: ignore
+from scripts.seed_vectors import DOCS_ROOT, infer_module_and_section, read_markdown  # type: ignore
+
+MAX_ATTEMPTS = 5
+
+
+def split_blocks(text: str, granularity: str) -> List[str]:
+    """
+    Split a page the way the frontend requests it:
+    'page' sends the whole page, 'paragraph' sends each blank-line separated block.
+    """
+    if granularity == "page":
+        return [text] if text else []
+    return [p.strip() for p in text.split("\n\n") if p.strip()]
+
+
+def iter_blocks(granularity: str) -> Iterator[Dict[str, str]]:
+    """Yield every translatable block of the book with its module."""
+    if not DOCS_ROOT.exists():
+        raise RuntimeError(f"Docs root not found at {DOCS_ROOT}. Make sure the frontend repo is present.")
+
+    for md_path in sorted(DOCS_ROOT.rglob("*.md")):
+        raw = read_markdown(md_path)
+        module = infer_module_and_section(md_path)["module"]
+        for block in split_blocks(raw, granularity):
+            yield {"text": block, "module": module}
+
+
+async def translate_with_retry(text: str, language: str) -> Optional[str]:
+    """Translate one block, backing off between attempts; None if it cannot be translated.
+
+    strict: a failed call raises instead of echoing the source, so any returned string is
+    a real translation, including blocks (code, numbers, names) that translate to themselves.
+    """
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        try:
+            with deadline_scope(TRANSLATE_DEADLINE_SECONDS):
+                return await translate_text(text, language, strict=True)
+        except RateLimited as e:
+            if attempt < MAX_ATTEMPTS:
+                await asyncio.sleep(min(e.retry_after, TRANSLATE_DEADLINE_SECONDS))
+        except Exception:
+            # Deadline overruns and API errors back off too, instead of hammering the model
+            if attempt < MAX_ATTEMPTS:
+                await asyncio.sleep(2 * attempt)
+    return None
+
+
+async def pretranslate(
+    language: str,
+    granularity: str,
+    concurrency: int,
+    batch_size: int,
+    dry_run: bool = False,
+):
+    """Translate every uncached block of the book and bulk-load the results."""
+    print(f"📚 Loading markdown from: {DOCS_ROOT}")
+    unique: Dict[str, Dict[str, str]] = {}
+    for block in iter_blocks(granularity):
+        unique.setdefault(hash_text(block["text"]), block)
+
+    cached = await get_cached_hashes(language, unique.keys())
+    todo = [block for text_hash, block in unique.items() if text_hash not in cached]
+    print(f"Blocks: {len(unique)} unique, {len(cached)} already cached, {len(todo)} to translate")
+    if dry_run or not todo:
+        return
+
+    semaphore = asyncio.Semaphore(concurrency)
+    pending: List[Dict] = []
+    stats = {"translated": 0, "failed": 0}
+    started = time.perf_counter()
+
+    async def flush():
+        if not pending:
+            return
+        entries = pending[:]
+        pending.clear()
+        await bulk_cache_translations(entries, language)
+
+    async def worker(block: Dict[str, str]):
+        async with semaphore:
+            translated = await translate_with_retry(block["text"], language)
+        if translated is None:
+            stats["failed"] += 1
+            print(f"  ⚠️  Failed: {block['module']}: {block['text'][:60]!r}")
+            return
+        pending.append({"original_text": block["text"], "translated_text": translated, "module": block["module"]})
+        stats["translated"] += 1
+        done = stats["translated"] + stats["failed"]
+        print(f"[{done}/{len(todo)}] {block['module']} ✓ ({time.perf_counter() - started:.0f}s)")
+        if len(pending) >= batch_size:
+            await flush()
+
+    try:
+        await asyncio.gather(*(worker(block) for block in todo))
+    finally:
+        # Whatever finished is kept, so an interrupted run resumes from here
+        await flush()
+
+    print(f"\n✅ Pre-translation complete: {stats['translated']} translated, {stats['failed']} failed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Warm the translations cache for the whole book")
+    parser.add_argument("--language", default="ur", help="Target language code (default: ur)")
+    parser.add_argument("--granularity", choices=["page", "paragraph"], default="page",
+                        help="Block size the frontend requests (default: page)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Translations in flight (default: 4)")
+    parser.add_argument("--batch-size", type=int, default=20, help="Rows per bulk insert (default: 20)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be translated")
+    args = parser.parse_args()
+    asyncio.run(pretranslate(args.language, args.granularity, args.concurrency, args.batch_size, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
@@ -8,15 +8,40 @@ your textbook content.
 Usage (from project root or backend folder):
 
     python -m scripts.seed_vectors
-
-Make sure QDRANT_URL, QDRANT_API_KEY and GEMINI_API_KEY are set.
+    python -m scripts.seed_vectors --fresh --batch-size 64
+    python -m scripts.seed_vectors --profile
+
+Every run builds a new physical collection (book_content_v1, _v2, ...) while
+the API keeps reading the live one through the book_content alias. Once all
+points are in, the new collection is validated (point count plus a smoke
+query), the alias is swapped to it atomically, and older versions are
+deleted (the previously live one is kept for rollback unless
+SEED_KEEP_PREVIOUS=0). Reindexing never touches what the API is serving.
+
+The run is checkpointed after every batch: if it dies (rate limit, network,
+Ctrl-C), running it again resumes building the same collection.
+Point IDs are derived from the chunk content, so rewrites are idempotent.
+Chunks that still fail after retries are written to seed_quarantine.jsonl
+and retried on the next run.
+
+Pages are split by scripts/chunker.py along their heading structure
+(CHUNK_MAX_TOKENS / CHUNK_OVERLAP_TOKENS), parsed in parallel processes.
+
+Chunk text is written to the content_chunks table, and Qdrant points carry
+only the module/section/page filter fields; the API resolves text by point ID.
+Without DATABASE_URL the text goes into the Qdrant payload instead.
+
+Make sure QDRANT_URL, QDRANT_API_KEY, GEMINI_API_KEY and DATABASE_URL are set.
 """
 
+import argparse
 import asyncio
+import json
 import os
 import sys
+import time
 from pathlib import Path
-from typing import List, Dict
+from typing import Iterator, List, Dict, Optional, Set
 import uuid
 
 # Add backend directory to path so "app" imports work
@@ -25,44 +50,41 @@ sys.path.append(str(BACKEND_ROOT))
 
 from app.qdrant_client import (  # type: ignore
     get_qdrant_client,
-    add_vector,
     COLLECTION_NAME,
-    ensure_collection,
+    alias_target,
+    collection_versions,
+    create_collection,
+    swap_alias,
+    versioned_name,
 )
 from app.openai_client import get_embeddings  # type: ignore
+from app.chunk_store import fetch_chunks, prune_chunks, save_chunks  # type: ignore
+from app.profiling import run_profiled  # type: ignore
+from app.database import SessionLocal  # type: ignore
+from scripts.chunker import chunk_markdown, load_documents  # type: ignore
 
 # Path to the Docusaurus markdown docs in the frontend project
 FRONTEND_ROOT = BACKEND_ROOT.parent / "ai-book-frontend"
 DOCS_ROOT = FRONTEND_ROOT / "book" / "docs"
 
-# Control whether we wipe and recreate the collection before seeding
-RESET_COLLECTION = True
+# Keep the collection that was live before the swap, so the alias can be pointed back at it
+KEEP_PREVIOUS = os.getenv("SEED_KEEP_PREVIOUS", "1").lower() not in ("0", "false", "no")
 
+# Progress is checkpointed after every committed batch; failed chunks go to the quarantine file
+CHECKPOINT_PATH = Path(os.getenv("SEED_CHECKPOINT", str(BACKEND_ROOT / ".seed_checkpoint.json")))
+QUARANTINE_PATH = Path(os.getenv("SEED_QUARANTINE", str(BACKEND_ROOT / "seed_quarantine.jsonl")))
+SEED_BATCH_SIZE = int(os.getenv("SEED_BATCH_SIZE", "32"))
+MAX_ATTEMPTS = 4
+RETRY_BASE_DELAY = 2.0
 
-def chunk_text(text: str, max_chars: int = 1400) -> List[str]:
-  """
-  Simple paragraph-based chunker.
-  Keeps paragraphs together up to max_chars to preserve structure.
-  """
-  paragraphs = [p.strip() for p in text.split("\n\n") if p.strip()]
-  chunks: List[str] = []
-  current: List[str] = []
-  current_len = 0
+# Namespace for deterministic (uuid5) point IDs
+SEED_NAMESPACE = uuid.UUID("6b7f3c1e-9d2a-4e8b-a5f0-3c1d2e4f6a7b")
 
-  for p in paragraphs:
-      if current_len + len(p) + 2 <= max_chars:
-          current.append(p)
-          current_len += len(p) + 2
-      else:
-          if current:
-              chunks.append("\n\n".join(current))
-          current = [p]
-          current_len = len(p)
-
-  if current:
-      chunks.append("\n\n".join(current))
-
-  return chunks
+# Chunk size and overlap in (approximate) tokens, see scripts/chunker.py
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "350"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+# Processes used to parse and chunk markdown (default: all cores)
+CHUNK_WORKERS = int(os.getenv("CHUNK_WORKERS", "0")) or None
 
 
 def infer_module_and_section(md_path: Path) -> Dict[str, str]:
@@ -87,86 +109,345 @@ def infer_module_and_section(md_path: Path) -> Dict[str, str]:
   return {"module": module, "section": section}
 
 
-def load_book_chunks() -> List[Dict[str, str]]:
+def read_markdown(md_path: Path) -> str:
   """
-  Walk the docs directory and build a list of text chunks with metadata.
+  Read a markdown doc with simple front-matter stripped.
+  """
+  raw = md_path.read_text(encoding="utf-8")
+
+  # Strip simple front-matter if present
+  if raw.startswith("---"):
+      parts = raw.split("---", 2)
+      if len(parts) == 3:
+          raw = parts[2]
+
+  return raw.strip()
+
+
+def chunk_document(md_path: Path) -> List[Dict[str, str]]:
+  """
+  Chunk one markdown doc (runs in a worker process).
+  section is the heading path inside the page, or the page name before any heading.
+  """
+  raw = read_markdown(md_path)
+  if not raw:
+      return []
+
+  meta = infer_module_and_section(md_path)
+  return [
+      {
+          "text": chunk["text"],
+          "module": meta["module"],
+          "section": chunk["section"] or meta["section"],
+          "page": meta["section"],
+      }
+      for chunk in chunk_markdown(raw, CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS)
+  ]
+
+
+def iter_book_chunks(workers: Optional[int] = CHUNK_WORKERS) -> Iterator[Dict[str, str]]:
+  """
+  Walk the docs directory and stream text chunks with metadata, parsing files in parallel.
   """
   if not DOCS_ROOT.exists():
       raise RuntimeError(f"Docs root not found at {DOCS_ROOT}. Make sure the frontend repo is present.")
 
-  chunks: List[Dict[str, str]] = []
+  yield from load_documents(sorted(DOCS_ROOT.rglob("*.md")), chunk_document, workers)
 
-  for md_path in sorted(DOCS_ROOT.rglob("*.md")):
-      raw = md_path.read_text(encoding="utf-8")
 
-      # Strip simple front-matter if present
-      if raw.startswith("---"):
-          parts = raw.split("---", 2)
-          if len(parts) == 3:
-              raw = parts[2]
+def load_book_chunks() -> List[Dict[str, str]]:
+  """
+  Walk the docs directory and build a list of text chunks with metadata.
+  """
+  started = time.perf_counter()
+  chunks = list(iter_book_chunks())
+  print(f"Chunked book into {len(chunks)} chunks in {time.perf_counter() - started:.2f}s")
+  return chunks
 
-      raw = raw.strip()
-      if not raw:
-          continue
 
-      meta = infer_module_and_section(md_path)
-      text_chunks = chunk_text(raw)
+def point_id(chunk: Dict[str, str]) -> str:
+  """
+  Deterministic point ID for a chunk, so reruns overwrite instead of duplicating.
+  """
+  key = "\x1f".join([chunk["module"], chunk["page"], chunk["section"], chunk["text"]])
+  return str(uuid.uuid5(SEED_NAMESPACE, key))
 
-      for chunk_text_value in text_chunks:
-          chunks.append(
-              {
-                  "text": chunk_text_value,
-                  "module": meta["module"],
-                  "section": meta["section"],
-              }
-          )
 
-  return chunks
+def load_checkpoint(qdrant_client) -> Optional[Dict]:
+  """
+  Checkpoint of the interrupted run, or None when starting fresh.
+  Only valid while its collection still exists and has not been published.
+  """
+  if not CHECKPOINT_PATH.exists():
+      return None
+  try:
+      checkpoint = json.loads(CHECKPOINT_PATH.read_text())
+  except (OSError, ValueError) as e:
+      print(f"⚠️  Ignoring unreadable checkpoint {CHECKPOINT_PATH}: {e}")
+      return None
+  collection = checkpoint.get("collection")
+  building = {versioned_name(version) for version in collection_versions(qdrant_client)}
+  if collection not in building or collection == alias_target(qdrant_client):
+      print(f"⚠️  Checkpoint is for collection '{collection}', which is not being built; ignoring it")
+      return None
+  return checkpoint
+
+
+def save_checkpoint(collection: str, done: Set[str], total: int):
+  """
+  Atomically persist the IDs committed so far.
+  """
+  tmp_path = CHECKPOINT_PATH.with_suffix(".tmp")
+  tmp_path.write_text(json.dumps({
+      "collection": collection,
+      "total": total,
+      "updated_at": time.time(),
+      "done": sorted(done),
+  }))
+  os.replace(tmp_path, CHECKPOINT_PATH)
 
 
-async def seed_vectors():
-  """Seed Qdrant with book content from markdown docs."""
+def quarantine(chunk: Dict[str, str], vector_id: str, error: str):
+  """
+  Record a chunk that could not be seeded; it is retried on the next run.
+  """
+  with open(QUARANTINE_PATH, "a", encoding="utf-8") as f:
+      f.write(json.dumps({
+          "id": vector_id,
+          "module": chunk["module"],
+          "section": chunk["section"],
+          "error": error[:500],
+          "text": chunk["text"][:200],
+          "at": time.time(),
+      }, ensure_ascii=False) + "\n")
+
+
+async def embed_with_retry(text: str) -> Optional[List[float]]:
+  """
+  Embed one chunk, retrying with backoff; None if every attempt failed.
+  """
+  for attempt in range(MAX_ATTEMPTS):
+      try:
+          return await get_embeddings(text, strict=True)
+      except Exception:
+          await asyncio.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+  return None
+
+
+async def upsert_with_retry(qdrant_client, collection: str, points: List[Dict]):
+  """
+  Upsert a batch of points, retrying transient failures with backoff.
+  """
+  for attempt in range(MAX_ATTEMPTS):
+      try:
+          await asyncio.to_thread(qdrant_client.upsert, collection_name=collection, points=points)
+          return
+      except Exception:
+          if attempt == MAX_ATTEMPTS - 1:
+              raise
+          await asyncio.sleep(RETRY_BASE_DELAY * 2 ** attempt)
+
+
+def validate_collection(qdrant_client, collection: str, expected_ids: Set[str]) -> Optional[str]:
+  """
+  Check a freshly built collection before it goes live; returns the problem, or None if it is fine.
+  """
+  count = qdrant_client.count(collection_name=collection, exact=True).count
+  if count != len(expected_ids):
+      return f"expected {len(expected_ids)} points, found {count}"
+  if not expected_ids:
+      return "collection is empty"
+
+  # Smoke query: a stored vector must find its own point first, and its text must resolve
+  sample_id = sorted(expected_ids)[0]
+  sample = qdrant_client.retrieve(collection_name=collection, ids=[sample_id], with_vectors=True, with_payload=True)
+  if not sample:
+      return f"point {sample_id} is missing"
+  hits = qdrant_client.search(collection_name=collection, query_vector=sample[0].vector, limit=1)
+  if not hits or str(hits[0].id) != sample_id:
+      return f"smoke query for {sample_id} returned {[str(hit.id) for hit in hits]}"
+  if SessionLocal is not None and sample_id not in fetch_chunks([sample_id]):
+      return f"chunk text for {sample_id} is missing from content_chunks"
+  if SessionLocal is None and not (sample[0].payload or {}).get("text"):
+      return f"point {sample_id} has no text"
+  return None
+
+
+def collection_ids(qdrant_client, collection: str) -> Set[str]:
+  """
+  Every point ID in a collection.
+  """
+  ids: Set[str] = set()
+  offset = None
+  while True:
+      points, offset = qdrant_client.scroll(
+          collection_name=collection, limit=1000, offset=offset, with_payload=False, with_vectors=False,
+      )
+      ids.update(str(point.id) for point in points)
+      if offset is None:
+          return ids
+
+
+async def publish_collection(qdrant_client, collection: str, previous: Optional[str], ids: Set[str]):
+  """
+  Swap the alias to the new collection, then drop versions (and chunk text) nothing reads any more.
+  """
+  existing = {c.name for c in qdrant_client.get_collections().collections}
+  if COLLECTION_NAME in existing:
+      # A pre-alias collection occupies the alias name; it has to go before the alias can exist
+      print(f"⚠️  Replacing legacy collection '{COLLECTION_NAME}' with an alias (reads fail for a moment)")
+      qdrant_client.delete_collection(COLLECTION_NAME)
+      previous = None
+  swap_alias(qdrant_client, collection)
+  print(f"🔀 Alias '{COLLECTION_NAME}' -> '{collection}' (was '{previous or 'none'}')")
+
+  keep = {collection} | ({previous} if previous and KEEP_PREVIOUS else set())
+  for version in collection_versions(qdrant_client):
+      name = versioned_name(version)
+      if name not in keep:
+          qdrant_client.delete_collection(name)
+          print(f"🗑️  Deleted old collection '{name}'")
+
+  if SessionLocal is not None:
+      keep_ids = set(ids)
+      for name in keep - {collection}:
+          keep_ids |= collection_ids(qdrant_client, name)
+      pruned = await asyncio.to_thread(prune_chunks, keep_ids)
+      print(f"🗑️  Pruned {pruned} unreferenced chunks from content_chunks")
+
+
+def format_eta(seconds: float) -> str:
+  minutes, seconds = divmod(int(seconds), 60)
+  hours, minutes = divmod(minutes, 60)
+  return f"{hours}h{minutes:02d}m" if hours else f"{minutes}m{seconds:02d}s"
+
+
+async def seed_vectors(batch_size: int = SEED_BATCH_SIZE, fresh: bool = False):
+  """Seed Qdrant with book content from markdown docs, resuming from the last checkpoint."""
   print(f"📚 Loading markdown from: {DOCS_ROOT}")
   book_chunks = load_book_chunks()
-  print(f"Starting vector seeding...")
-  print(f"Total chunks to process: {len(book_chunks)}")
+
+  # Identical chunks map to one point
+  pending: Dict[str, Dict[str, str]] = {}
+  for chunk in book_chunks:
+      pending.setdefault(point_id(chunk), chunk)
+  total = len(pending)
 
   qdrant_client = await get_qdrant_client()
+  live = alias_target(qdrant_client)
 
-  if RESET_COLLECTION:
-      print(f"🧹 Resetting Qdrant collection '{COLLECTION_NAME}'...")
-      try:
-          qdrant_client.delete_collection(COLLECTION_NAME)
-      except Exception as e:
-          print(f"  (Skipping delete, may not exist yet): {e}")
-      await ensure_collection()
-
-  for i, chunk in enumerate(book_chunks, 1):
-      print(f"[{i}/{len(book_chunks)}] {chunk['module']}/{chunk['section']}...")
-
-      # Get embedding
-      embedding = await get_embeddings(chunk["text"])
-      if not embedding:
-          print("  ⚠️  Failed to get embedding")
-          continue
-
-      vector_id = str(uuid.uuid4())
-      await add_vector(
-          qdrant_client,
-          vector_id,
-          embedding,
-          {
-              "text": chunk["text"],
+  if fresh and CHECKPOINT_PATH.exists():
+      CHECKPOINT_PATH.unlink()
+  checkpoint = load_checkpoint(qdrant_client)
+  done: Set[str] = set(checkpoint["done"]) & set(pending) if checkpoint else set()
+
+  if checkpoint:
+      target = checkpoint["collection"]
+      print(f"↩️  Resuming '{target}' from checkpoint: {len(done)}/{total} chunks already seeded")
+  else:
+      # Build next to the live collection; the API keeps serving from the alias meanwhile
+      versions = collection_versions(qdrant_client)
+      target = versioned_name((versions[-1] if versions else 0) + 1)
+      print(f"🏗️  Building '{target}' (live: '{live or 'none'}')...")
+      create_collection(qdrant_client, target)
+      save_checkpoint(target, done, total)
+
+  if SessionLocal is None:
+      print("⚠️  DATABASE_URL is not set: chunk text will be stored in the Qdrant payloads")
+
+  todo = [(vector_id, chunk) for vector_id, chunk in pending.items() if vector_id not in done]
+  print(f"Starting vector seeding: {len(todo)} of {total} chunks to process (batches of {batch_size})")
+
+  started = time.perf_counter()
+  processed = 0
+  failed = 0
+
+  for start in range(0, len(todo), batch_size):
+      batch = todo[start:start + batch_size]
+      points = []
+      for vector_id, chunk in batch:
+          embedding = await embed_with_retry(chunk["text"])
+          if embedding is None:
+              failed += 1
+              quarantine(chunk, vector_id, "embedding failed")
+              continue
+          payload = {
               "module": chunk["module"],
               "section": chunk["section"],
-          },
+              "page": chunk["page"],
+          }
+          if SessionLocal is None:
+              payload["text"] = chunk["text"]
+          points.append({"id": vector_id, "vector": embedding, "payload": payload})
+
+      if points and SessionLocal is not None:
+          # Text goes in first, so a point never references a chunk the API cannot resolve
+          try:
+              await asyncio.to_thread(save_chunks, [{"id": point["id"], **pending[point["id"]]} for point in points])
+          except Exception as e:
+              for point in points:
+                  failed += 1
+                  quarantine(pending[point["id"]], point["id"], f"saving chunk text failed: {e}")
+              points = []
+
+      if points:
+          try:
+              await upsert_with_retry(qdrant_client, target, points)
+              done.update(point["id"] for point in points)
+          except Exception:
+              # Isolate the bad point(s) instead of losing the whole batch
+              for point in points:
+                  try:
+                      await upsert_with_retry(qdrant_client, target, [point])
+                      done.add(point["id"])
+                  except Exception as e:
+                      failed += 1
+                      quarantine(pending[point["id"]], point["id"], str(e))
+
+      save_checkpoint(target, done, total)
+
+      processed += len(batch)
+      elapsed = time.perf_counter() - started
+      rate = processed / elapsed if elapsed else 0.0
+      eta = (len(todo) - processed) / rate if rate else 0.0
+      print(
+          f"[{len(done)}/{total}] {100 * len(done) / max(total, 1):.1f}% "
+          f"| {rate:.1f} chunks/s | ETA {format_eta(eta)} | failed {failed}"
       )
 
-      print(f"  ✓ Added vector ({len(embedding)} dimensions)")
-
-  print(f"\n✅ Vector seeding complete! Added {len(book_chunks)} chunks to Qdrant")
+  if failed:
+      print(f"\n⚠️  Seeding finished with {failed} failed chunks (see {QUARANTINE_PATH}); rerun to retry them")
+      print(f"   '{target}' was not published; the API still reads '{live or 'none'}'")
+      return
+
+  problem = await asyncio.to_thread(validate_collection, qdrant_client, target, set(pending))
+  if problem:
+      print(f"\n❌ Validation of '{target}' failed: {problem}")
+      print(f"   Not published; the API still reads '{live or 'none'}'")
+      sys.exit(1)
+
+  await publish_collection(qdrant_client, target, live, set(pending))
+  CHECKPOINT_PATH.unlink(missing_ok=True)
+  print(f"\n✅ Vector seeding complete! {total} chunks in '{target}', now live")
+
+
+def main():
+  parser = argparse.ArgumentParser(description="Seed Qdrant with the book (resumable)")
+  parser.add_argument("--batch-size", type=int, default=SEED_BATCH_SIZE,
+                      help=f"Points per upsert and checkpoint (default: {SEED_BATCH_SIZE})")
+  parser.add_argument("--fresh", action="store_true",
+                      help="Discard any checkpoint and build a new collection from scratch")
+  parser.add_argument("--profile", action="store_true",
+                      help="Profile the run (wall and CPU, including awaits); written to PROFILE_DIR")
+  args = parser.parse_args()
+  run = seed_vectors(args.batch_size, args.fresh)
+  if not args.profile:
+    asyncio.run(run)
+    return
+  _, report, path = asyncio.run(run_profiled(run, "seed_vectors"))
+  print(f"🔬 Profile: {report['wall_ms'] / 1000:.1f}s wall, {report['cpu_ms'] / 1000:.1f}s CPU -> {path}")
+  print(f"   Collapsed stacks: {path.with_suffix('.collapsed')}")
 
 
 if __name__ == "__main__":
-  asyncio.run(seed_vectors())
-
+  main()
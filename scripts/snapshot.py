@@ -0,0 +1,288 @@
+"""
+Export and import warm-cache snapshots: the translations and content_chunks
+tables and the Qdrant book_content points (vectors plus payloads).
+
+A snapshot is a directory:
+
+    manifest.json            format version, counts, vector size, file checksums
+    translations.jsonl.gz    one translation row per line
+    chunks.jsonl.gz          one content_chunks row (point ID, text, module, section) per line
+    points/vectors.f32       raw row-major float32 vectors
+    points/payloads.jsonl    {"id", "payload"} per point, same order as the vectors
+    points/meta.json         dimension and count
+
+points/ uses the app.local_index save format, so a snapshot can also be opened
+offline with LocalVectorIndex.load(snapshot / "points").
+
+Export and import both stream in batches, so memory stays flat regardless of
+size, and import never calls Gemini: a fresh deployment goes from empty to warm
+with one command.
+
+Usage (from project root or backend folder):
+
+    python -m scripts.snapshot export snapshots/2026-01-15
+    python -m scripts.snapshot import snapshots/2026-01-15
+    python -m scripts.snapshot import snapshots/2026-01-15 --only translations
+
+Make sure DATABASE_URL and QDRANT_URL / QDRANT_API_KEY are set.
+"""
+
+import argparse
+import asyncio
+import gzip
+import hashlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import numpy as np
+
+# Add backend directory to path so "app" imports work
+BACKEND_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(BACKEND_ROOT))
+
+from app.local_index import INDEX_FORMAT_VERSION  # type: ignore
+from app.qdrant_client import COLLECTION_NAME, VECTOR_SIZE, ensure_collection, get_qdrant_client  # type: ignore
+
+SNAPSHOT_FORMAT_VERSION = 1
+BATCH_SIZE = 500
+POINT_BATCH_SIZE = 256
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def export_translations(path: Path) -> int:
+    """Stream the translations table into gzipped JSON lines."""
+    from app.database import SessionLocal, Translation  # type: ignore
+    from app.translation import hash_text  # type: ignore
+
+    if SessionLocal is None:
+        raise RuntimeError("DATABASE_URL is not configured")
+    count = 0
+    db = SessionLocal()
+    try:
+        query = db.query(
+            Translation.original_text, Translation.translated_text,
+            Translation.language, Translation.module, Translation.text_hash,
+        ).yield_per(BATCH_SIZE)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for row in query:
+                f.write(json.dumps({
+                    "original_text": row.original_text,
+                    "translated_text": row.translated_text,
+                    "language": row.language,
+                    "module": row.module,
+                    "text_hash": row.text_hash or hash_text(row.original_text),
+                }, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        db.close()
+    return count
+
+
+def export_points(qdrant_client, directory: Path) -> int:
+    """Scroll the whole collection into vectors.f32 + payloads.jsonl."""
+    directory.mkdir(parents=True, exist_ok=True)
+    count = 0
+    offset = None
+    with open(directory / "vectors.f32", "wb") as vectors, \
+            open(directory / "payloads.jsonl", "w", encoding="utf-8") as payloads:
+        while True:
+            points, offset = qdrant_client.scroll(
+                collection_name=COLLECTION_NAME,
+                limit=POINT_BATCH_SIZE,
+                offset=offset,
+                with_payload=True,
+                with_vectors=True,
+            )
+            if points:
+                np.asarray([point.vector for point in points], dtype=np.float32).tofile(vectors)
+                for point in points:
+                    payloads.write(json.dumps({"id": str(point.id), "payload": point.payload}, ensure_ascii=False) + "\n")
+                count += len(points)
+                print(f"  points: {count}")
+            if offset is None:
+                break
+    (directory / "meta.json").write_text(json.dumps({"version": INDEX_FORMAT_VERSION, "dim": VECTOR_SIZE, "count": count}))
+    return count
+
+
+def export_chunks(path: Path) -> int:
+    """Stream the content_chunks table (the text behind each point) into gzipped JSON lines."""
+    from app.database import ContentChunk, SessionLocal  # type: ignore
+
+    if SessionLocal is None:
+        raise RuntimeError("DATABASE_URL is not configured")
+    count = 0
+    db = SessionLocal()
+    try:
+        query = db.query(
+            ContentChunk.id, ContentChunk.content, ContentChunk.module, ContentChunk.section,
+        ).yield_per(BATCH_SIZE)
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for row in query:
+                f.write(json.dumps({
+                    "id": row.id, "text": row.content, "module": row.module, "section": row.section,
+                }, ensure_ascii=False) + "\n")
+                count += 1
+    finally:
+        db.close()
+    return count
+
+
+async def export_snapshot(directory: Path, only: str):
+    directory.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    manifest: Dict = {
+        "format_version": SNAPSHOT_FORMAT_VERSION,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "collection": COLLECTION_NAME,
+        "vector_size": VECTOR_SIZE,
+        "counts": {},
+        "files": {},
+    }
+
+    if only in ("all", "translations"):
+        print("📤 Exporting translations...")
+        manifest["counts"]["translations"] = export_translations(directory / "translations.jsonl.gz")
+        print(f"  translations: {manifest['counts']['translations']}")
+
+    if only in ("all", "points"):
+        print("📤 Exporting chunk text...")
+        manifest["counts"]["chunks"] = export_chunks(directory / "chunks.jsonl.gz")
+        print(f"  chunks: {manifest['counts']['chunks']}")
+        print(f"📤 Exporting Qdrant collection '{COLLECTION_NAME}'...")
+        qdrant_client = await get_qdrant_client()
+        manifest["counts"]["points"] = export_points(qdrant_client, directory / "points")
+
+    for path in sorted(p for p in directory.rglob("*") if p.is_file() and p.name != "manifest.json"):
+        manifest["files"][str(path.relative_to(directory))] = file_sha256(path)
+    (directory / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    print(f"\n✅ Snapshot written to {directory} in {time.perf_counter() - started:.1f}s: {manifest['counts']}")
+
+
+def read_manifest(directory: Path) -> Dict:
+    """Load and verify a snapshot's manifest and file checksums."""
+    manifest = json.loads((directory / "manifest.json").read_text())
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        raise RuntimeError(f"Unsupported snapshot format version: {manifest.get('format_version')}")
+    for name, checksum in manifest["files"].items():
+        if file_sha256(directory / name) != checksum:
+            raise RuntimeError(f"Checksum mismatch for {name}; the snapshot is corrupt or incomplete")
+    return manifest
+
+
+def iter_batches(lines: Iterator[str], size: int) -> Iterator[List[Dict]]:
+    batch: List[Dict] = []
+    for line in lines:
+        batch.append(json.loads(line))
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def import_translations(path: Path) -> Dict[str, int]:
+    """Stream translations in, skipping (language, text hash) pairs that are already cached."""
+    from app.translation import bulk_cache_translations, get_cached_hashes  # type: ignore
+
+    stats = {"imported": 0, "skipped": 0}
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for batch in iter_batches(f, BATCH_SIZE):
+            by_language: Dict[str, List[Dict]] = {}
+            for row in batch:
+                by_language.setdefault(row["language"], []).append(row)
+            for language, rows in by_language.items():
+                cached = await get_cached_hashes(language, [row["text_hash"] for row in rows])
+                new_rows = [row for row in rows if row["text_hash"] not in cached]
+                await bulk_cache_translations(new_rows, language)
+                stats["imported"] += len(new_rows)
+                stats["skipped"] += len(rows) - len(new_rows)
+            print(f"  translations: {stats['imported']} imported, {stats['skipped']} already cached")
+    return stats
+
+
+def import_chunks(path: Path) -> int:
+    """Insert or replace content_chunks rows in batches."""
+    from app.chunk_store import save_chunks  # type: ignore
+
+    count = 0
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for batch in iter_batches(f, BATCH_SIZE):
+            save_chunks(batch)
+            count += len(batch)
+            print(f"  chunks: {count}")
+    return count
+
+
+async def import_points(qdrant_client, directory: Path) -> int:
+    """Upsert points in batches straight from the memory-mapped vector file."""
+    meta = json.loads((directory / "meta.json").read_text())
+    if meta["dim"] != VECTOR_SIZE:
+        raise RuntimeError(f"Snapshot vectors have {meta['dim']} dimensions, the collection expects {VECTOR_SIZE}")
+    if not meta["count"]:
+        return 0
+    vectors = np.memmap(directory / "vectors.f32", dtype=np.float32, mode="r", shape=(meta["count"], meta["dim"]))
+
+    await ensure_collection()
+    count = 0
+    with open(directory / "payloads.jsonl", encoding="utf-8") as f:
+        for batch in iter_batches(f, POINT_BATCH_SIZE):
+            rows = vectors[count:count + len(batch)]
+            points = [
+                {"id": record["id"], "vector": row.tolist(), "payload": record["payload"]}
+                for record, row in zip(batch, rows)
+            ]
+            await asyncio.to_thread(qdrant_client.upsert, collection_name=COLLECTION_NAME, points=points)
+            count += len(points)
+            print(f"  points: {count}/{meta['count']}")
+    return count
+
+
+async def import_snapshot(directory: Path, only: str):
+    started = time.perf_counter()
+    manifest = read_manifest(directory)
+    print(f"📦 Snapshot from {manifest['created_at']}: {manifest['counts']}")
+
+    if only in ("all", "translations") and "translations" in manifest["counts"]:
+        print("📥 Importing translations...")
+        await import_translations(directory / "translations.jsonl.gz")
+
+    if only in ("all", "points") and "chunks" in manifest["counts"]:
+        # Text before vectors, so no imported point is ever missing its chunk
+        print("📥 Importing chunk text...")
+        import_chunks(directory / "chunks.jsonl.gz")
+
+    if only in ("all", "points") and "points" in manifest["counts"]:
+        print(f"📥 Importing points into '{COLLECTION_NAME}'...")
+        qdrant_client = await get_qdrant_client()
+        await import_points(qdrant_client, directory / "points")
+
+    print(f"\n✅ Snapshot imported in {time.perf_counter() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import translation and vector cache snapshots")
+    parser.add_argument("command", choices=["export", "import"])
+    parser.add_argument("directory", type=Path, help="Snapshot directory")
+    parser.add_argument("--only", choices=["all", "translations", "points"], default="all",
+                        help="Limit to one part of the snapshot (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        asyncio.run(export_snapshot(args.directory, args.only))
+    else:
+        asyncio.run(import_snapshot(args.directory, args.only))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.auth import get_current_user
+from app.database import ChatHistory
+from app.main import app, decode_history_cursor, encode_history_cursor
+
+@pytest.fixture
+def history(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    ChatHistory.__table__.create(engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    monkeypatch.setitem(app.dependency_overrides, get_current_user, lambda: {"id": "u1"})
+    db = session_factory()
+    started = datetime(2026, 1, 1)
+    # Two rows share a timestamp, two legacy rows have none, one row belongs to someone else
+    timestamps = [started, started + timedelta(minutes=1), started + timedelta(minutes=1), None, None]
+    for i, timestamp in enumerate(timestamps):
+        db.add(ChatHistory(id=f"row-{i}", user_id="u1", message=f"question {i}", response="answer", timestamp=timestamp))
+    db.add(ChatHistory(id="other", user_id="u2", message="not mine", response="answer", timestamp=started))
+    db.commit()
+    # The ORM fills in the column default for None, so legacy NULLs are written directly
+    db.execute(ChatHistory.__table__.update().where(ChatHistory.id.in_(["row-3", "row-4"])).values(timestamp=None))
+    db.commit()
+    db.close()
+
+def _get(url):
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(url)
+    return asyncio.run(send())
+
+def test_cursor_round_trips_with_and_without_timestamp():
+    timestamp = datetime(2026, 1, 1, 12, 30, 5, 123456)
+    assert decode_history_cursor(encode_history_cursor(timestamp, "row-1")) == (timestamp, "row-1")
+    assert decode_history_cursor(encode_history_cursor(None, "row-3")) == (None, "row-3")
+
+def test_pages_cover_every_row_once_including_null_timestamps(history):
+    seen = []
+    cursor = None
+    for _ in range(10):
+        response = _get("/api/chat/history?limit=2" + (f"&cursor={cursor}" if cursor else ""))
+        assert response.status_code == 200
+        page = response.json()
+        seen += [item["id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == ["row-2", "row-1", "row-0", "row-4", "row-3"]
+
+def test_malformed_cursor_is_rejected(history):
+    assert _get("/api/chat/history?cursor=not-a-cursor").status_code == 400
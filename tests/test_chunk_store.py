@@ -0,0 +1,48 @@
+import asyncio
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.chunk_store import ChunkStore, fetch_chunks, save_chunks
+from app.database import ContentChunk
+
+@pytest.fixture
+def chunks_db(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    ContentChunk.__table__.create(engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(bind=engine))
+    save_chunks([
+        {"id": "a", "text": "ROS 2 nodes talk over topics.", "module": "module-1", "section": "Nodes"},
+        {"id": "b", "text": "اردو متن", "module": "module-1", "section": "Urdu"},
+    ])
+
+def test_preloaded_chunks_are_served_from_the_buffer(chunks_db):
+    store = ChunkStore()
+    store.load()
+    assert store.get("a") == "ROS 2 nodes talk over topics."
+    assert store.get("b") == "اردو متن"
+    assert store.get("missing") is None
+    assert store.stats()["chunks"] == 2
+
+def test_resolve_fetches_late_chunks_then_falls_back_to_payloads(chunks_db):
+    store = ChunkStore()
+    store.load()
+    save_chunks([{"id": "c", "text": "Seeded after startup.", "module": "module-2"}])
+    requested = []
+
+    async def payload_texts(ids):
+        requested.append(ids)
+        return {"legacy": "Seeded before content_chunks existed."}
+
+    hits = [{"id": chunk_id, "score": 1.0} for chunk_id in ("a", "c", "legacy", "gone")]
+    resolved = asyncio.run(store.resolve(hits, payload_texts))
+    assert [(hit["id"], hit["text"]) for hit in resolved] == [
+        ("a", "ROS 2 nodes talk over topics."),
+        ("c", "Seeded after startup."),
+        ("legacy", "Seeded before content_chunks existed."),
+    ]
+    assert requested == [["legacy", "gone"]]
+    assert fetch_chunks(["c", "gone"]) == {"c": "Seeded after startup."}
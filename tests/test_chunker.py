@@ -0,0 +1,44 @@
+import random
+
+from scripts.chunker import chunk_markdown, count_tokens
+
+WORDS = "robot sensor actuator lidar odometry kinematics controller trajectory localization".split()
+
+def _prose(rng: random.Random, sentences: int) -> str:
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))).capitalize() + "."
+        for _ in range(sentences)
+    )
+
+def _document(rng: random.Random) -> str:
+    parts = []
+    for section in range(4):
+        parts.append(f"## Section {section} on {rng.choice(WORDS)} and {rng.choice(WORDS)}")
+        for _ in range(rng.randint(1, 5)):
+            parts.append(_prose(rng, rng.randint(1, 12)))
+    # A run-on "sentence" only the word-window split can break up
+    parts.append("### Run-on")
+    parts.append(" ".join(rng.choice(WORDS) for _ in range(400)))
+    return "\n\n".join(parts)
+
+def test_chunks_never_exceed_max_tokens():
+    rng = random.Random(7)
+    for max_tokens in (60, 100, 350):
+        for overlap in (0, 20, 40, 200):
+            for _ in range(5):
+                for chunk in chunk_markdown(_document(rng), max_tokens, overlap):
+                    assert chunk["tokens"] == count_tokens(chunk["text"])
+                    assert chunk["tokens"] <= max_tokens, (max_tokens, overlap, chunk["text"])
+
+def test_word_window_splits_carry_overlap():
+    text = "## Run-on\n\n" + " ".join(f"word{i}" for i in range(600))
+    chunks = list(chunk_markdown(text, max_tokens=100, overlap_tokens=20))
+    assert len(chunks) > 2
+    for previous, chunk in zip(chunks, chunks[1:]):
+        last_word = previous["text"].split()[-1]
+        assert last_word in chunk["text"].split()
+
+def test_large_code_blocks_stay_whole():
+    code = "```python\n" + "\n".join(f"x_{i} = {i}" for i in range(200)) + "\n```"
+    chunks = list(chunk_markdown("## Code\n\nIntro sentence here.\n\n" + code, max_tokens=100, overlap_tokens=20))
+    assert any(code in chunk["text"] for chunk in chunks)
@@ -0,0 +1,61 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import database
+from app.conversation import ConversationStore
+from app.database import ChatHistory
+
+@pytest.fixture
+def history(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    ChatHistory.__table__.create(engine)
+    session_factory = sessionmaker(bind=engine)
+    monkeypatch.setattr(database, "SessionLocal", session_factory)
+    queries = []
+    load = database._load_conversation_turns
+
+    def counting_load(*args):
+        queries.append(args)
+        return load(*args)
+
+    monkeypatch.setattr(database, "_load_conversation_turns", counting_load)
+    db = session_factory()
+    started = datetime(2026, 1, 1)
+    for i in range(3):
+        db.add(ChatHistory(
+            id=f"row-{i}", user_id="u1", conversation_id="conv-1",
+            message=f"question {i}", response=f"answer {i}", timestamp=started + timedelta(minutes=i)
+        ))
+    db.commit()
+    db.close()
+    return queries
+
+def test_supplied_conversation_is_reloaded_from_history(history):
+    conversation = asyncio.run(ConversationStore().get("conv-1", "u1"))
+    assert conversation.id == "conv-1"
+    assert list(conversation.turns)[-1] == ("question 2", "answer 2")
+    assert "question 0" in conversation.prompt_block()
+    assert history == [("u1", "conv-1", 20)]
+
+def test_new_conversation_skips_the_history_query(history):
+    store = ConversationStore()
+    for conversation_id in (None, ""):
+        conversation = asyncio.run(store.get(conversation_id, "u1"))
+        assert conversation.id and conversation.id != "conv-1"
+        assert conversation.prompt_block() == ""
+    assert history == []
+
+def test_other_users_cannot_reload_a_conversation(history):
+    conversation = asyncio.run(ConversationStore().get("conv-1", "u2"))
+    assert conversation.prompt_block() == ""
+
+def test_known_conversation_is_served_from_memory(history):
+    store = ConversationStore()
+    first = asyncio.run(store.get("conv-1", "u1"))
+    assert asyncio.run(store.get("conv-1", "u1")) is first
+    assert len(history) == 1
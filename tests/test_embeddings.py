@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from app import openai_client
+from app.deadline import DeadlineExceeded, deadline_scope
+from app.openai_client import EmbeddingBatcher, create_fallback_embedding, get_embeddings
+from app.scheduler import RateLimited
+from app.shared_cache import MemoryCache
+
+@pytest.fixture
+def embed_batch(monkeypatch):
+    """Replaces the upstream call; set .error or .delay to change its behaviour"""
+    class FakeUpstream:
+        error = None
+        delay = 0.0
+        calls = []
+
+        async def __call__(self, texts):
+            self.calls.append(list(texts))
+            await asyncio.sleep(self.delay)
+            if self.error:
+                raise self.error
+            return [[float(len(text))] * 3 for text in texts]
+
+    upstream = FakeUpstream()
+    monkeypatch.setattr(openai_client, "GEMINI_API_KEY", "test-key")
+    monkeypatch.setattr(openai_client, "_embed_batch", upstream)
+    monkeypatch.setattr(openai_client, "get_shared_cache", MemoryCache)
+    monkeypatch.setattr(openai_client, "_batcher", EmbeddingBatcher(window_ms=5))
+    return upstream
+
+def test_concurrent_queries_share_one_upstream_call(embed_batch):
+    async def scenario():
+        return await asyncio.gather(get_embeddings("a"), get_embeddings("bb"), get_embeddings("a"))
+
+    assert asyncio.run(scenario()) == [[1.0] * 3, [2.0] * 3, [1.0] * 3]
+    assert embed_batch.calls == [["a", "bb"]]
+
+def test_rate_limits_propagate_instead_of_falling_back(embed_batch):
+    embed_batch.error = RateLimited("quota", retry_after=3)
+    with pytest.raises(RateLimited):
+        asyncio.run(get_embeddings("what is ROS 2?"))
+
+def test_spent_request_budget_raises_deadline_exceeded(embed_batch):
+    embed_batch.delay = 1.0
+
+    async def scenario():
+        with deadline_scope(0.05):
+            return await get_embeddings("what is ROS 2?")
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(scenario())
+
+def test_other_errors_fall_back_unless_strict(embed_batch):
+    embed_batch.error = ValueError("Gemini embedding result empty or incomplete")
+    text = "what is ROS 2?"
+    assert asyncio.run(get_embeddings(text)) == create_fallback_embedding(text)
+    with pytest.raises(ValueError):
+        asyncio.run(get_embeddings(text, strict=True))
+
+def test_chat_answers_429_when_embeddings_are_rate_limited(monkeypatch):
+    from app import chat_service
+    from app.models import ChatRequest
+
+    async def rate_limited(text, strict=False):
+        raise RateLimited("quota", retry_after=3)
+
+    monkeypatch.setattr(chat_service, "get_embeddings", rate_limited)
+    with pytest.raises(RateLimited):
+        asyncio.run(chat_service.answer_chat(ChatRequest(message="what is ROS 2?")))
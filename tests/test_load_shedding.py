@@ -0,0 +1,125 @@
+import asyncio
+import json
+
+from app.load_shedding import SHED_LOW_IN_FLIGHT, SHED_HIGH_IN_FLIGHT, LoadSheddingMiddleware, LoopMonitor
+from app.models import ChatResponse
+
+def _scope(path: str, method: str = "GET"):
+    return {"type": "http", "method": method, "path": path, "headers": [], "query_string": b""}
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+def test_open_event_streams_do_not_trigger_shedding():
+    async def scenario():
+        release = asyncio.Event()
+        served = []
+
+        async def app(scope, receive, send):
+            if scope["path"].endswith("/events"):
+                # A job event stream stays open until the job finishes
+                await release.wait()
+            served.append(scope["path"])
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        statuses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        monitor = LoopMonitor()
+        middleware = LoadSheddingMiddleware(app, monitor)
+        streams = [
+            asyncio.create_task(middleware(_scope(f"/api/translate/jobs/{i:032x}/events"), _receive, send))
+            for i in range(2 * SHED_HIGH_IN_FLIGHT)
+        ]
+        await asyncio.sleep(0)
+        assert monitor.in_flight == 0
+
+        await middleware(_scope("/api/chat", "POST"), _receive, send)
+        await middleware(_scope("/api/translate", "POST"), _receive, send)
+        assert statuses == [200, 200]
+        assert not monitor.should_shed("low") and not monitor.should_shed("high")
+
+        release.set()
+        await asyncio.gather(*streams)
+        assert len(served) == 2 * SHED_HIGH_IN_FLIGHT + 2
+
+    asyncio.run(scenario())
+
+def test_sheddable_requests_count_towards_in_flight():
+    async def scenario():
+        release = asyncio.Event()
+
+        async def app(scope, receive, send):
+            await release.wait()
+            await send({"type": "http.response.start", "status": 200, "headers": []})
+            await send({"type": "http.response.body", "body": b""})
+
+        statuses = []
+
+        async def send(message):
+            if message["type"] == "http.response.start":
+                statuses.append(message["status"])
+
+        monitor = LoopMonitor()
+        middleware = LoadSheddingMiddleware(app, monitor)
+        pending = [
+            asyncio.create_task(middleware(_scope("/api/translate", "POST"), _receive, send))
+            for _ in range(SHED_LOW_IN_FLIGHT)
+        ]
+        await asyncio.sleep(0)
+        assert monitor.in_flight == SHED_LOW_IN_FLIGHT
+
+        await middleware(_scope("/api/personalize"), _receive, send)
+        assert statuses == [503]
+
+        release.set()
+        await asyncio.gather(*pending)
+        assert monitor.in_flight == 0
+
+    asyncio.run(scenario())
+
+class _FakeSocket:
+    def __init__(self):
+        self.headers = {}
+        self.client = type("Peer", (), {"host": "203.0.113.50"})()
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+def test_websocket_questions_count_and_are_shed(monkeypatch):
+    from app import ws_chat
+
+    async def scenario():
+        release = asyncio.Event()
+
+        async def slow_answer(request, user, on_delta=None):
+            await release.wait()
+            return ChatResponse(response="ok")
+
+        monkeypatch.setattr(ws_chat, "answer_chat", slow_answer)
+        monkeypatch.setattr(ws_chat, "loop_monitor", LoopMonitor())
+        socket = _FakeSocket()
+        session = ws_chat.ChatSession(socket, None)
+        await session.handle(json.dumps({"type": "ask", "id": "q1", "message": "What is ROS 2?"}))
+        await asyncio.sleep(0)
+        assert ws_chat.loop_monitor.in_flight == 1
+
+        # The worker is saturated by other requests: new questions are shed, not queued
+        ws_chat.loop_monitor.in_flight += SHED_HIGH_IN_FLIGHT
+        await session.handle(json.dumps({"type": "ask", "id": "q2", "message": "What is Gazebo?"}))
+        await asyncio.sleep(0)
+        ws_chat.loop_monitor.in_flight -= SHED_HIGH_IN_FLIGHT
+        assert socket.sent[-1]["id"] == "q2" and socket.sent[-1]["status"] == 503
+
+        first = session.tasks["q1"]
+        release.set()
+        await first
+        assert {"type": "done", "id": "q1"}.items() <= socket.sent[-1].items()
+        assert ws_chat.loop_monitor.in_flight == 0
+
+    asyncio.run(scenario())
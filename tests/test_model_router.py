@@ -0,0 +1,13 @@
+from app.gemini_client import FALLBACK_MODELS, PRIMARY_MODEL
+from app.model_router import TIERS
+
+def test_every_tier_falls_back_to_all_models():
+    every_model = set([PRIMARY_MODEL] + FALLBACK_MODELS)
+    for tier, models in TIERS.items():
+        assert every_model <= set(models), tier
+        assert len(models) == len(set(models)), tier
+
+def test_tiers_keep_their_preferred_models_first():
+    assert TIERS["fast"][0] == "gemini-2.0-flash-lite"
+    assert TIERS["standard"][0] == "gemini-2.5-flash"
+    assert TIERS["pro"][0] == PRIMARY_MODEL
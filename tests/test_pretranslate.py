@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from app.deadline import DeadlineExceeded
+from scripts import pretranslate
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+
+    monkeypatch.setattr(pretranslate.asyncio, "sleep", fake_sleep)
+    return slept
+
+def test_blocks_that_translate_to_themselves_succeed_first_time(monkeypatch, sleeps):
+    calls = []
+
+    async def identity(text, language, strict=False):
+        calls.append(strict)
+        return text
+
+    monkeypatch.setattr(pretranslate, "translate_text", identity)
+    assert asyncio.run(pretranslate.translate_with_retry("ros2 launch demo.launch.py", "ur")) == "ros2 launch demo.launch.py"
+    assert calls == [True]
+    assert sleeps == []
+
+def test_deadline_overruns_back_off_before_retrying(monkeypatch, sleeps):
+    outcomes = [DeadlineExceeded("generation"), ValueError("Gemini API error"), "ترجمہ"]
+
+    async def flaky(text, language, strict=False):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(pretranslate, "translate_text", flaky)
+    assert asyncio.run(pretranslate.translate_with_retry("Hello", "ur")) == "ترجمہ"
+    assert sleeps == [2, 4]
+
+def test_gives_up_after_max_attempts(monkeypatch, sleeps):
+    async def failing(text, language, strict=False):
+        raise ValueError("Gemini API error")
+
+    monkeypatch.setattr(pretranslate, "translate_text", failing)
+    assert asyncio.run(pretranslate.translate_with_retry("Hello", "ur")) is None
+    assert len(sleeps) == pretranslate.MAX_ATTEMPTS - 1
@@ -0,0 +1,40 @@
+import pytest
+from starlette.requests import Request
+
+from app import rate_limit
+from app.rate_limit import ClientRateLimiter, check_limits, client_ip
+from app.scheduler import RateLimited
+
+def _request(forwarded=None, peer="10.0.0.1"):
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "POST", "path": "/api/chat", "headers": headers, "client": (peer, 1234)})
+
+def test_client_ip_uses_the_hop_appended_by_the_proxy():
+    assert client_ip(_request("203.0.113.7")) == "203.0.113.7"
+    assert client_ip(_request("1.2.3.4, 203.0.113.7")) == "203.0.113.7"
+    assert client_ip(_request("1.2.3.4, 203.0.113.7, 10.1.1.1"), trusted_hops=2) == "203.0.113.7"
+
+def test_client_ip_falls_back_to_the_peer_address():
+    assert client_ip(_request()) == "10.0.0.1"
+    assert client_ip(_request("1.2.3.4"), trusted_hops=0) == "10.0.0.1"
+
+def test_spoofed_forwarded_for_cannot_escape_the_ip_bucket(monkeypatch):
+    limiter = ClientRateLimiter(per_minute=3)
+    monkeypatch.setitem(
+        rate_limit._limiters,
+        "chat", (ClientRateLimiter(per_minute=0), limiter)
+    )
+    for i in range(3):
+        check_limits("chat", client_ip(_request(f"198.51.100.{i}, 203.0.113.7")), None)
+    with pytest.raises(RateLimited):
+        check_limits("chat", client_ip(_request("198.51.100.99, 203.0.113.7")), None)
+    assert list(limiter.buckets) == ["203.0.113.7"]
+
+def test_logged_in_users_are_also_limited_per_user(monkeypatch):
+    monkeypatch.setitem(
+        rate_limit._limiters,
+        "chat", (ClientRateLimiter(per_minute=1), ClientRateLimiter(per_minute=100))
+    )
+    check_limits("chat", "203.0.113.7", {"id": "u1"})
+    with pytest.raises(RateLimited):
+        check_limits("chat", "203.0.113.8", {"id": "u1"})
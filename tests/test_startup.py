@@ -0,0 +1,50 @@
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from app import startup
+
+HEAVY_MODULES = ("numpy", "sqlalchemy", "qdrant_client", "google.generativeai", "passlib", "app.database", "app.translation")
+
+def test_importing_the_app_leaves_heavy_modules_unloaded():
+    script = (
+        "import sys, app.main; "
+        f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    )
+    env = dict(os.environ, LOG_LEVEL="CRITICAL")
+    result = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True, env=env,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    )
+    assert result.stdout.strip() == ""
+
+def _phases(monkeypatch, **funcs):
+    monkeypatch.setattr(startup, "startup_report", {})
+    for name, func in funcs.items():
+        monkeypatch.setattr(startup, f"_init_{name}", func)
+
+def test_database_and_qdrant_initialize_concurrently(monkeypatch):
+    step = 0.3
+    _phases(
+        monkeypatch,
+        database=lambda: time.sleep(step), chunks=lambda: time.sleep(step), qdrant=lambda: time.sleep(step)
+    )
+    started = time.perf_counter()
+    asyncio.run(startup.initialize_backends())
+    # database then chunks in sequence, qdrant alongside them
+    assert time.perf_counter() - started < 3 * step
+    assert startup.is_ready() and not startup.is_degraded()
+    assert [startup.startup_report[name]["status"] for name in ("database", "chunks", "qdrant")] == ["ready"] * 3
+
+def test_failed_database_skips_chunks_and_reports_degraded(monkeypatch):
+    def broken():
+        raise RuntimeError("connection refused")
+
+    _phases(monkeypatch, database=broken, chunks=broken, qdrant=lambda: None)
+    asyncio.run(startup.initialize_backends())
+    database = startup.startup_report["database"]
+    assert (database["status"], database["error"]) == ("failed", "connection refused")
+    assert "chunks" not in startup.startup_report
+    assert startup.is_ready() and startup.is_degraded()
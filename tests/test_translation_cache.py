@@ -0,0 +1,79 @@
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from app import openai_client, translation
+from app.database import Translation
+from app.main import app, translation_etag
+from app.shared_cache import MemoryCache
+
+@pytest.fixture
+def db(monkeypatch):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Translation.__table__.create(engine)
+    session_factory = sessionmaker(bind=engine)
+    cache = MemoryCache()
+    monkeypatch.setattr(translation, "SessionLocal", session_factory)
+    monkeypatch.setattr(translation, "get_shared_cache", lambda: cache)
+    return session_factory
+
+def _request(method, url, **kwargs):
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.request(method, url, **kwargs)
+    return asyncio.run(send())
+
+def _rows(session_factory):
+    db = session_factory()
+    try:
+        return db.query(Translation.text_hash, Translation.translated_text).all()
+    finally:
+        db.close()
+
+def test_first_cached_translation_wins(db):
+    asyncio.run(translation.cache_translation("Hello", "first", "ur"))
+    asyncio.run(translation.cache_translation("Hello", "second", "ur"))
+    asyncio.run(translation.bulk_cache_translations(
+        [{"original_text": "Hello", "translated_text": "third"}, {"original_text": "Bye", "translated_text": "a"},
+         {"original_text": "Bye", "translated_text": "b"}],
+        "ur"
+    ))
+    assert sorted(text for _, text in _rows(db)) == ["a", "first"]
+    assert asyncio.run(translation.get_translation_by_hash(translation.hash_text("Hello"), "ur")) == "first"
+    assert asyncio.run(translation.get_cached_translation("Hello", "ur")) == "first"
+
+def test_get_serves_cached_translation_with_etag_and_304(db):
+    asyncio.run(translation.cache_translation("Hello", "ہیلو", "ur"))
+    text_hash = translation.hash_text("Hello")
+
+    response = _request("GET", f"/api/translate/{text_hash}?language=ur")
+    assert response.status_code == 200
+    assert response.json()["translated_text"] == "ہیلو"
+    etag = response.headers["etag"]
+    assert etag == translation_etag(text_hash, "ur") and etag.startswith("W/")
+    assert "immutable" in response.headers["cache-control"]
+
+    for if_none_match in (etag, etag[2:], f'"other", {etag}'):
+        response = _request("GET", f"/api/translate/{text_hash}?language=ur", headers={"If-None-Match": if_none_match})
+        assert response.status_code == 304
+        assert response.headers["etag"] == etag
+
+    missing = _request("GET", f"/api/translate/{'0' * 64}?language=ur")
+    assert missing.status_code == 404
+    assert missing.headers["cache-control"] == "no-store"
+
+def test_failed_translation_returns_source_uncached(db, monkeypatch):
+    async def failing(text, language, strict=False):
+        assert strict
+        raise ValueError("Gemini API error")
+
+    monkeypatch.setattr(openai_client, "translate_text", failing)
+    response = _request("POST", "/api/translate", json={"text": "Hello", "language": "ur"})
+    assert response.status_code == 200
+    assert response.json() == {"translated_text": "Hello", "text_hash": None}
+    assert _rows(db) == []
+    assert _request("GET", f"/api/translate/{translation.hash_text('Hello')}?language=ur").status_code == 404